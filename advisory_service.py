@@ -0,0 +1,438 @@
+import argparse
+import base64
+import io
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pandas as pd
+import yaml
+from PIL import UnidentifiedImageError
+
+import agent_planner
+import vision_classifier
+from epirules.engine import evaluate_rule_set
+from knowledge_querier import get_farm_data
+from literature_searcher import search_literature, get_literature_index, SEARCH_MODES
+from metrics import summarize
+
+RULES_PATH = "rules.yaml"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# Image micro-batching: wait at most this long for more images to join a batch
+MAX_BATCH_WAIT_S = 0.01
+MAX_IMAGE_QUEUE = 64
+# Per endpoint: (requests running at once, requests allowed to wait); anything beyond is rejected with 503
+LANE_LIMITS = {
+    "advisory": (8, 32),
+    "rules": (4, 32),
+    "classify": (16, 64),
+    "literature": (8, 64),
+}
+LATENCY_WINDOW = 1000  # latencies kept per endpoint for /health percentiles
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# Directory `image_path` requests may read from; None (the default) accepts only uploaded images
+IMAGE_DIR = None
+
+class Overloaded(Exception):
+    """A bounded queue is full; the client should back off and retry."""
+
+class HTTPError(Exception):
+    """A request the service refuses; `status` is the HTTP status sent back."""
+    status = 500
+
+class BadRequest(HTTPError):
+    status = 400
+
+class Forbidden(HTTPError):
+    status = 403
+
+class NotFound(HTTPError):
+    status = 404
+
+class PayloadTooLarge(HTTPError):
+    status = 413
+
+# Weather columns a posted /rules table must carry (as for read_weather_csv)
+REQUIRED_WEATHER_COLUMNS = ("timestamp", "temp_c", "rh")
+
+def _field(body, name):
+    if name not in body:
+        raise BadRequest(f"Missing field '{name}'")
+    return body[name]
+
+class Lane:
+    """
+    Admission control for one endpoint: at most `concurrency` requests run while up to
+    `backlog` more wait; further requests are rejected immediately instead of queueing forever.
+    """
+
+    def __init__(self, name, concurrency, backlog):
+        self.name = name
+        self.concurrency = concurrency
+        self.backlog = backlog
+        self._running = threading.Semaphore(concurrency)
+        self._admitted = threading.Semaphore(concurrency + backlog)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @contextmanager
+    def enter(self):
+        if not self._admitted.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(f"{self.name} queue is full")
+        try:
+            with self._lock:
+                self.waiting += 1
+            self._running.acquire()
+            with self._lock:
+                self.waiting -= 1
+                self.in_flight += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                self._running.release()
+        finally:
+            self._admitted.release()
+
+    def snapshot(self):
+        return {"in_flight": self.in_flight, "queued": self.waiting, "capacity": self.concurrency + self.backlog,
+                "rejected": self.rejected}
+
+class MicroBatcher:
+    """
+    Groups single-item requests into batches: a worker takes the first waiting item, collects
+    more for up to `max_wait_s` (or until `max_batch`), and runs `run_batch(items) -> results`
+    once for all of them. The queue holds at most `max_queue` items; submit() raises Overloaded beyond that.
+    """
+
+    def __init__(self, run_batch, max_batch=vision_classifier.DEFAULT_BATCH_SIZE, max_wait_s=MAX_BATCH_WAIT_S,
+                 max_queue=MAX_IMAGE_QUEUE, workers=1):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"batches": 0, "items": 0, "rejected": 0}
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, daemon=True, name=f"batcher-{i}") for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise Overloaded("image queue is full")
+        return future
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put((None, None))
+
+    def _work(self):
+        while True:
+            item, future = self._queue.get()
+            if future is None:
+                return
+            batch = [(item, future)]
+            deadline = time.monotonic() + self.max_wait_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt[1] is None:
+                    self._queue.put(nxt)  # leave the stop signal for this worker's next loop
+                    break
+                batch.append(nxt)
+            try:
+                results = self.run_batch([i for i, _ in batch])
+                for (_, f), result in zip(batch, results):
+                    f.set_result(result)
+            except Exception as e:
+                for _, f in batch:
+                    f.set_exception(e)
+            with self._lock:
+                self.stats["batches"] += 1
+                self.stats["items"] += len(batch)
+
+class AdvisoryService:
+    """
+    Holds the warm tools (field table, literature index, TFLite interpreters, rules) for the
+    lifetime of the process and implements the endpoints on top of them.
+    """
+
+    def __init__(self, rules_path=RULES_PATH, warm=True, max_batch=vision_classifier.DEFAULT_BATCH_SIZE,
+                 max_wait_s=MAX_BATCH_WAIT_S, max_queue=MAX_IMAGE_QUEUE, lane_limits=LANE_LIMITS, image_dir=IMAGE_DIR):
+        self.started = time.time()
+        self.rules_path = rules_path
+        self.image_dir = os.path.realpath(image_dir) if image_dir else None
+        self._rules, self._rules_mtime = None, None
+        self.lanes = {name: Lane(name, *limits) for name, limits in lane_limits.items()}
+        self.latencies = {name: deque(maxlen=LATENCY_WINDOW) for name in lane_limits}
+        self._latency_lock = threading.Lock()
+        self.warm = {}
+        if warm:
+            self.warm_up()
+        self.batcher = MicroBatcher(vision_classifier.classify_batch, max_batch=max_batch, max_wait_s=max_wait_s,
+                                    max_queue=max_queue, workers=self._vision_workers())
+
+    def _vision_workers(self):
+        # One batch in flight per interpreter; if the model failed to load, one worker reports the error
+        return vision_classifier.get_interpreter_pool().size if self.warm.get("vision") is True else 1
+
+    def warm_up(self):
+        """Loads every tool once; a tool that fails to load is reported by /health and fails its requests."""
+        for name, load in (("knowledge", get_farm_data), ("literature", get_literature_index),
+                           ("vision", lambda: (vision_classifier.get_interpreter_pool(), vision_classifier.get_class_names())),
+                           ("rules", self.rules)):
+            t0 = time.perf_counter()
+            try:
+                load()
+                self.warm[name] = True
+            except Exception as e:
+                self.warm[name] = f"{type(e).__name__}: {e}"
+            self.warm[f"{name}_load_s"] = round(time.perf_counter() - t0, 3)
+
+    def rules(self):
+        """rules.yaml, re-read when the file changes."""
+        mtime = os.stat(self.rules_path).st_mtime_ns
+        if self._rules is None or mtime != self._rules_mtime:
+            with open(self.rules_path, "r", encoding="utf-8") as f:
+                self._rules, self._rules_mtime = yaml.safe_load(f), mtime
+        return self._rules
+
+    @contextmanager
+    def _serving(self, endpoint):
+        with self.lanes[endpoint].enter():
+            t0 = time.perf_counter()
+            try:
+                yield
+            finally:
+                with self._latency_lock:
+                    self.latencies[endpoint].append((time.perf_counter() - t0) * 1000)
+
+    # --- Endpoints ---
+    def classify_image(self, image, timeout=None):
+        """Preprocesses on the calling thread, then joins the next inference micro-batch."""
+        return self.batcher.submit(vision_classifier.preprocess_image(image, fast_decode=True)).result(timeout=timeout)
+
+    def classify(self, body):
+        with self._serving("classify"):
+            try:
+                return self.classify_image(self._image_source(body))
+            except UnidentifiedImageError as e:
+                raise BadRequest(f"Not a readable image: {e}") from e
+
+    def advisory(self, body):
+        with self._serving("advisory"):
+            field_id = _field(body, "field_id")
+            record = agent_planner.run_agent(field_id, self._image_source(body), classify=self.classify_image, verbose=False)
+            if record is None:
+                raise NotFound(f"No advisory for {field_id}: unknown field or no weather risk")
+            return record
+
+    def rules_only(self, body):
+        with self._serving("rules"):
+            rules = self.rules()
+            rule_set = body.get("rule_set", "Hutton")
+            if not isinstance(rule_set, str) or rule_set not in rules:
+                raise NotFound(f"Unknown rule set {rule_set!r}")
+            if "weather" in body:
+                weather = self._weather_table(body["weather"])
+            else:
+                weather = agent_planner._fetch_weather()
+                if weather is None:
+                    raise NotFound("Weather data unavailable")
+            return evaluate_rule_set(weather, rules, rule_set, cache=agent_planner.get_result_cache())
+
+    def literature(self, body):
+        with self._serving("literature"):
+            query, top_k, mode = _field(body, "query"), body.get("top_k"), body.get("mode", "lexical")
+            if not isinstance(query, str):
+                raise BadRequest("query must be a string")
+            if mode not in SEARCH_MODES:
+                raise BadRequest(f"mode must be one of {', '.join(SEARCH_MODES)}")
+            if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1):
+                raise BadRequest("top_k must be a positive integer")
+            return search_literature(query, top_k=top_k, mode=mode)
+
+    @staticmethod
+    def _weather_table(records):
+        try:
+            weather = pd.DataFrame(records)
+            missing = [c for c in REQUIRED_WEATHER_COLUMNS if c not in weather]
+            if missing:
+                raise BadRequest(f"weather must include {', '.join(REQUIRED_WEATHER_COLUMNS)} (missing {', '.join(missing)})")
+            weather["timestamp"] = pd.to_datetime(weather["timestamp"], utc=True)
+            weather[["temp_c", "rh"]] = weather[["temp_c", "rh"]].astype(float)
+        except (ValueError, TypeError) as e:
+            raise BadRequest(f"Invalid weather: {e}") from e
+        return weather.sort_values("timestamp").reset_index(drop=True)
+
+    def _image_source(self, body):
+        # Raw image bytes, base64 in JSON, or a path under image_dir (when the service has one)
+        if isinstance(body, (bytes, bytearray)):
+            return io.BytesIO(body)
+        if "image_b64" in body:
+            try:
+                return io.BytesIO(base64.b64decode(body["image_b64"], validate=True))
+            except (ValueError, TypeError) as e:
+                raise BadRequest(f"image_b64 is not valid base64: {e}") from e
+        if "image_path" not in body:
+            raise BadRequest("Missing field 'image_b64'")
+        if self.image_dir is None:
+            raise Forbidden("image_path is disabled; send image_b64 or start the service with --image-dir")
+        if not isinstance(body["image_path"], str):
+            raise BadRequest("image_path must be a string")
+        path = os.path.realpath(os.path.join(self.image_dir, body["image_path"]))
+        if os.path.commonpath([self.image_dir, path]) != self.image_dir:
+            raise Forbidden("image_path must be inside the service's image directory")
+        if not os.path.isfile(path):
+            raise NotFound(f"No image {body['image_path']}")
+        return path
+
+    def health(self):
+        with self._latency_lock:
+            latency = {name: summarize(list(values)) for name, values in self.latencies.items() if values}
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started, 1),
+            "warm": self.warm,
+            "queues": {
+                **{name: lane.snapshot() for name, lane in self.lanes.items()},
+                "image_batches": {"depth": self.batcher.depth, **self.batcher.stats},
+            },
+            "latency_ms": latency,
+        }
+
+def make_handler(service):
+    routes = {
+        ("GET", "/health"): lambda body: service.health(),
+        ("POST", "/advisory"): service.advisory,
+        ("POST", "/rules"): service.rules_only,
+        ("POST", "/classify"): service.classify,
+        ("POST", "/literature"): service.literature,
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload, headers=None):
+            data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self, images_ok):
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                self.close_connection = True  # the body's end is unknown
+                raise BadRequest("Invalid Content-Length")
+            if length > MAX_BODY_BYTES:
+                # Read and drop the body so the next request on this connection starts where expected
+                while length > 0:
+                    chunk = self.rfile.read(min(length, 1 << 16))
+                    if not chunk:
+                        break
+                    length -= len(chunk)
+                raise PayloadTooLarge(f"Request body over {MAX_BODY_BYTES} bytes")
+            raw = self.rfile.read(length) if length else b""
+            if self.headers.get("Content-Type", "").startswith("image/"):
+                if not images_ok:
+                    raise BadRequest(f"{self.path} expects a JSON body")
+                return raw
+            try:
+                body = json.loads(raw or b"{}")
+            except ValueError as e:
+                raise BadRequest(f"Invalid JSON body: {e}") from e
+            if not isinstance(body, dict):
+                raise BadRequest("JSON body must be an object")
+            return body
+
+        def _dispatch(self, method):
+            route = routes.get((method, urlparse(self.path).path))
+            if route is None:
+                return self._send(404, {"error": f"No route {method} {self.path}"})
+            try:
+                return self._send(200, route(self._body(route == service.classify) if method == "POST" else None))
+            except Overloaded as e:
+                return self._send(503, {"error": str(e)}, {"Retry-After": "1"})
+            except HTTPError as e:
+                return self._send(e.status, {"error": str(e)})
+            except ImportError as e:
+                # Tool runtime not installed (e.g. no TFLite for /classify)
+                return self._send(503, {"error": f"{type(e).__name__}: {e}"})
+            except Exception as e:
+                traceback.print_exc()
+                return self._send(500, {"error": f"Internal error: {type(e).__name__}"})
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+    return Handler
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+# --- Main part of the script ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Advisory HTTP/JSON service with warm tools")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=vision_classifier.DEFAULT_BATCH_SIZE,
+                        help="Images per inference micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_BATCH_WAIT_S * 1000,
+                        help="How long the first image of a batch waits for others")
+    parser.add_argument("--image-queue", type=int, default=MAX_IMAGE_QUEUE, help="Images allowed to wait for inference")
+    parser.add_argument("--image-dir", default=IMAGE_DIR,
+                        help="Let requests name an image_path relative to this directory (default: uploads only)")
+    args = parser.parse_args()
+
+    service = AdvisoryService(max_batch=args.max_batch, max_wait_s=args.max_wait_ms / 1000, max_queue=args.image_queue,
+                              image_dir=args.image_dir)
+    for key, value in service.warm.items():
+        print(f"{key}: {value}")
+    server = make_server(service, args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port} (GET /health; POST /advisory, /rules, /classify, /literature)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.batcher.close()
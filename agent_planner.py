@@ -1,63 +1,155 @@
-from datetime import datetime
+import time
+_IMPORT_STARTED = time.perf_counter()
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timezone
 import pandas as pd
 
 # --- 1. Import all the tools you have built ---
+# Heavy resources (TFLite interpreters, farm_data.csv, the literature index) load on first use,
+# so a rules-only run never pays for them.
 from epirules.engine import evaluate_rule_set
+from epirules.cache import ResultCache
 from fetch_weather import get_weather_data # Assuming your failover logic is in this function
-from knowledge_querier import query_field_details
-from literature_searcher import search_literature
-from vision_classifier import classify_leaf
+from knowledge_querier import query_field_details, get_farm_data, days_since_spray
+from literature_searcher import search_literature, get_literature_index
+from vision_classifier import classify_leaf, get_interpreter_pool
+from weather_cache import WeatherCache
+from metrics import record_run, span, current_run, propagate
 
-def run_agent(field_id: str, image_path: str):
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+WEATHER_CACHE_PATH = "weather_cache.sqlite"
+# Memoized rule evaluations (see epirules.cache); entries are keyed by weather content, rules and code
+RESULT_CACHE_PATH = "result_cache.sqlite"
+VC_API_KEY = "YOUR_VC_KEY_HERE"
+# NOTE: For a real application, you'd get lat/lon from field_info. We'll use the hardcoded ones.
+DEMO_LOCATION = {"latitude": 46.40, "longitude": -63.79, "start_date": "2025-08-25", "end_date": "2025-08-31"}
+# We need the rules config to run the rules checker
+RULES_CONFIG = {'Hutton': {'min_temp_c': 10, 'rh_threshold': 90, 'min_hours_per_day': 6, 'consecutive_days': 2}}
+
+# Per-tool latency budgets (seconds). A tool that overruns is abandoned and counted as a failure.
+TOOL_BUDGETS_S = {
+    "vision": 10.0,
+    "kg": 2.0,
+    "weather": 20.0,
+    "rules": 5.0,
+    "rag_disease": 2.0,
+    "rag_variety": 2.0,
+}
+# Runs that can have every tool in flight at once; beyond that, tools queue for the shared pools
+MAX_CONCURRENT_RUNS = 8
+
+# Worker pools shared by every run, sized once (threads start on demand). A tool that overruns
+# its budget is abandoned, not cancelled: it keeps its tool worker until it returns, and the
+# interpreter waits for it at exit.
+_TOOL_POOL = ThreadPoolExecutor(max_workers=len(TOOL_BUDGETS_S) * MAX_CONCURRENT_RUNS, thread_name_prefix="tool")
+_GRAPH_POOL = ThreadPoolExecutor(max_workers=len(TOOL_BUDGETS_S) * MAX_CONCURRENT_RUNS, thread_name_prefix="planner")
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache() -> ResultCache:
+    """Returns the shared result cache for RESULT_CACHE_PATH, opening it on first use."""
+    global _result_cache
+    cache = _result_cache
+    if cache is None or cache.path != RESULT_CACHE_PATH:
+        with _result_cache_lock:
+            if _result_cache is None or _result_cache.path != RESULT_CACHE_PATH:
+                _result_cache = ResultCache(RESULT_CACHE_PATH)
+            cache = _result_cache
+    return cache
+
+class ToolFailure(Exception):
+    """A tool raised, returned nothing usable, overran its budget, or depended on a tool that did."""
+
+def _fetch_weather():
+    weather_cache = WeatherCache(WEATHER_CACHE_PATH)
+    try:
+        return get_weather_data(vc_api_key=VC_API_KEY, cache=weather_cache, **DEMO_LOCATION)
+    finally:
+        weather_cache.close()
+
+def _tool_graph(field_id, image_path, classify=None):
+    # name -> (dependencies, function of the dependency results)
+    classify = classify or classify_leaf
+    return {
+        "vision": ((), lambda: classify(image_path)),
+        "kg": ((), lambda: query_field_details(field_id)),
+        "weather": ((), _fetch_weather),
+        "rules": (("weather",), lambda weather_df: evaluate_rule_set(weather_df, RULES_CONFIG, 'Hutton', cache=get_result_cache())),
+        "rag_disease": (("vision",), lambda finding: search_literature(finding['diagnosis'])),
+        "rag_variety": (("kg",), lambda field_info: search_literature(field_info['potato_variety'])),
+    }
+
+def run_tool_graph(graph, budgets=TOOL_BUDGETS_S):
     """
-    Orchestrates the tools to produce a risk assessment for a given field and leaf image.
+    Runs a dependency graph of tools concurrently. Each tool starts as soon as its
+    dependencies finish and gets its own budget from `budgets`.
+
+    Tools run on the module's shared pools. A budget counts from submission, so time spent
+    queued behind other runs counts too. A tool that overruns is reported as failed but
+    keeps running in the background (Python threads cannot be cancelled) and holds its
+    worker until it returns.
+
+    Returns (results, failures, latencies_ms): results hold the tools that succeeded,
+    failures map the others to a reason.
     """
-    print(f"--- AGENT-RUNNING: Analyzing risk for {field_id} ---")
-    
-    # --- STEP 1: VISUAL ANALYSIS (Vision Tool) ---
-    print("\n[1] Analyzing leaf image...")
-    visual_finding = classify_leaf(image_path)
-    print(f"-> Diagnosis: {visual_finding['diagnosis']} (Confidence: {visual_finding['confidence']:.2%})")
-    
-    # --- STEP 2: FIELD HISTORY (Knowledge Querier Tool) ---
-    print("\n[2] Retrieving field history...")
-    field_info = query_field_details(field_id)
-    if not field_info:
-        print(f"-> ERROR: Field '{field_id}' not found in knowledge base.")
-        return
-    
-    days_since_spray = (datetime.now() - datetime.strptime(field_info['last_spray_date'], '%Y-%m-%d')).days
-    print(f"-> Variety: {field_info['potato_variety']}, Last Sprayed: {days_since_spray} days ago")
+    futures, latencies = {}, {}
+    metrics_run = current_run()
 
-    # --- STEP 3: WEATHER ANALYSIS (Weather + Rules Tools) ---
-    print("\n[3] Fetching and analyzing recent weather data...")
-    # NOTE: For a real application, you'd get lat/lon from field_info. We'll use the hardcoded ones.
-    weather_df = get_weather_data(latitude=46.40, longitude=-63.79, start_date="2025-08-25", end_date="2025-08-31", vc_api_key="YOUR_VC_KEY_HERE")
-    
-    if weather_df is None:
-        print("-> ERROR: Could not fetch weather data.")
-        return
+    def run(name, deps, fn):
+        inputs = []
+        for dep in deps:
+            try:
+                inputs.append(futures[dep].result())
+            except ToolFailure:
+                raise ToolFailure(f"skipped: {dep} failed")
+        t0 = time.perf_counter()
+        try:
+            value = _TOOL_POOL.submit(propagate(fn), *inputs).result(timeout=budgets.get(name))
+        except FutureTimeout:
+            raise ToolFailure(f"timeout after {budgets.get(name)}s")
+        except Exception as e:
+            raise ToolFailure(f"{type(e).__name__}: {e}")
+        finally:
+            latencies[name] = round((time.perf_counter() - t0) * 1000, 1)
+            if metrics_run is not None:
+                metrics_run.add_span(f"tool.{name}", latencies[name])
+        if value is None:
+            raise ToolFailure("no result")
+        return value
 
-    # We need the rules config to run the rules checker
-    rules_config = {'Hutton': {'min_temp_c': 10, 'rh_threshold': 90, 'min_hours_per_day': 6, 'consecutive_days': 2}}
-    weather_risk = evaluate_rule_set(weather_df, rules_config, 'Hutton')
-    print(f"-> Weather Risk (Hutton): Triggered = {weather_risk['result']['triggered']}")
+    # Submitting in dependency order (FIFO pool) means every waited-on future started before its waiter
+    pending = dict(graph)
+    while pending:
+        for name, (deps, fn) in list(pending.items()):
+            if all(d in futures for d in deps):
+                futures[name] = _GRAPH_POOL.submit(propagate(run), name, deps, fn)
+                del pending[name]
 
-    # --- STEP 4: LITERATURE SEARCH (RAG Tool) ---
-    print("\n[4] Searching literature for context...")
-    # Search for info on the diagnosed disease and the potato variety
-    disease_info = search_literature(visual_finding['diagnosis'])
-    variety_info = search_literature(field_info['potato_variety'])
-    print(f"-> Found {len(disease_info)} sections on the disease and {len(variety_info)} on the variety.")
+    results, failures = {}, {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except ToolFailure as e:
+            failures[name] = str(e)
+        if metrics_run is not None:
+            metrics_run.tool(name, failures.get(name))
+    return results, failures, latencies
 
-    # --- STEP 5: SYNTHESIS (The "Planner's Decision") ---
-    print("\n[5] Synthesizing final recommendation...")
+def synthesize(weather_risk, visual_finding=None, days_since_last_spray=None):
+    """
+    Turns the collected evidence into (urgency, recommendation).
+    Without a visual finding this is the degraded Weather -> Rules advice.
+    """
     recommendation = "No action needed at this time."
     urgency = "Low"
 
     # A simple rule-based synthesis (simulating an LLM's reasoning)
-    if weather_risk['result']['triggered'] and visual_finding['diagnosis'] == 'late_blight':
-        if days_since_spray > 7:
+    if weather_risk['result']['triggered'] and visual_finding and visual_finding['diagnosis'] == 'late_blight':
+        if days_since_last_spray is None or days_since_last_spray > 7:
             recommendation = "IMMEDIATE ACTION RECOMMENDED: High weather risk and visible late blight symptoms detected. Last spray was over a week ago. Consult literature on effective fungicides."
             urgency = "High"
         else:
@@ -66,19 +158,152 @@ def run_agent(field_id: str, image_path: str):
     elif weather_risk['result']['triggered']:
         recommendation = "PRECAUTIONARY ALERT: Weather conditions are favorable for late blight. Scout fields, especially susceptible varieties."
         urgency = "Medium"
+    return urgency, recommendation
 
-    print(f"\n--- AGENT-COMPLETE ---")
-    print(f"  Urgency: {urgency}")
-    print(f"  Recommendation: {recommendation}")
-    # The final JSON record would include all the evidence collected in the steps above
-    # print(f"  Evidence: visual={visual_finding}, field={field_info}, etc...")
+def make_advisory_record(field_id, urgency, recommendation, weather_risk, field_info, visual_finding, rag_results, planner):
+    """
+    Builds the machine-readable advisory record (see "Outputs" in the README).
+    """
+    return {
+        "field_id": field_id,
+        "timestamp": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "risk": {
+            "label": urgency,
+            "rule_set": weather_risk['rule_set'],
+            "triggered": weather_risk['result']['triggered'],
+            "evidence": weather_risk['result']['details'],
+        },
+        "knowledge": {
+            "variety": field_info['potato_variety'],
+            "organic": field_info.get('is_organic_compliant'),
+            "last_spray": field_info.get('last_spray_date'),
+        } if field_info else None,
+        "rag": [{"doc": r["citation"], "content": r["content"]} for r in rag_results],
+        "vision": visual_finding,
+        "recommendation": recommendation,
+        "planner": planner,
+    }
+
+def run_agent(field_id: str, image_path: str, budgets=TOOL_BUDGETS_S, classify=None, verbose=True):
+    """
+    Orchestrates the tools to produce a risk assessment for a given field and leaf image.
+
+    Independent tools run concurrently (see run_tool_graph), so latency is about that of
+    the slowest chain rather than the sum of all tools. If a tool other than weather/rules
+    fails or blows its budget, the run falls back to the degraded Weather -> Rules advice.
+
+    Each call appends one record (per-tool spans, failures, total latency) to metrics.jsonl.
+
+    Args:
+        classify: Replacement for classify_leaf (e.g. a micro-batching classifier in the service).
+        verbose: Print the step-by-step progress.
+
+    Returns:
+        The advisory record (dict), or None if the field is unknown or no weather risk could be computed.
+    """
+    with record_run("advisory", field_id=field_id) as metrics_run:
+        record = _run_agent(field_id, image_path, budgets, classify, print if verbose else _quiet)
+        metrics_run.extra["outcome"] = record["risk"]["label"] if record else None
+        return record
+
+def _quiet(*args, **kwargs):
+    pass
+
+def _run_agent(field_id, image_path, budgets, classify, log):
+    log(f"--- AGENT-RUNNING: Analyzing risk for {field_id} ---")
+    started = time.perf_counter()
+    results, failures, latencies = run_tool_graph(_tool_graph(field_id, image_path, classify), budgets)
+
+    # --- STEP 1: VISUAL ANALYSIS (Vision Tool) ---
+    log("\n[1] Analyzing leaf image...")
+    visual_finding = results.get("vision")
+    if visual_finding:
+        log(f"-> Diagnosis: {visual_finding['diagnosis']} (Confidence: {visual_finding['confidence']:.2%})")
+    else:
+        log(f"-> Vision unavailable ({failures.get('vision')})")
+
+    # --- STEP 2: FIELD HISTORY (Knowledge Querier Tool) ---
+    log("\n[2] Retrieving field history...")
+    field_info = results.get("kg")
+    days_since_last_spray = None
+    if field_info:
+        days_since_last_spray = days_since_spray(field_info)
+        log(f"-> Variety: {field_info['potato_variety']}, Last Sprayed: {days_since_last_spray} days ago")
+    elif failures.get("kg") == "no result":
+        log(f"-> ERROR: Field '{field_id}' not found in knowledge base.")
+        return None
+    else:
+        log(f"-> Field history unavailable ({failures.get('kg')})")
+
+    # --- STEP 3: WEATHER ANALYSIS (Weather + Rules Tools) ---
+    log("\n[3] Fetching and analyzing recent weather data...")
+    weather_risk = results.get("rules")
+    if weather_risk is None:
+        log(f"-> ERROR: Could not compute weather risk ({failures.get('weather') or failures.get('rules')}).")
+        return None
+    log(f"-> Weather Risk (Hutton): Triggered = {weather_risk['result']['triggered']}")
+
+    # --- STEP 4: LITERATURE SEARCH (RAG Tool) ---
+    log("\n[4] Searching literature for context...")
+    # Search for info on the diagnosed disease and the potato variety
+    disease_info = results.get("rag_disease", [])
+    variety_info = results.get("rag_variety", [])
+    log(f"-> Found {len(disease_info)} sections on the disease and {len(variety_info)} on the variety.")
+
+    # --- STEP 5: SYNTHESIS (The "Planner's Decision") ---
+    log("\n[5] Synthesizing final recommendation...")
+    degraded = bool(set(failures) & {"vision", "kg"})
+    with span("planner.synthesize"):
+        if degraded:
+            # Degraded Weather -> Rules mode: ignore partial evidence, lower confidence
+            urgency, recommendation = synthesize(weather_risk)
+        else:
+            urgency, recommendation = synthesize(weather_risk, visual_finding, days_since_last_spray)
+
+    record = make_advisory_record(
+        field_id, urgency, recommendation, weather_risk, field_info, visual_finding, disease_info + variety_info,
+        planner={
+            "mode": "degraded" if degraded else "full",
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "tools_called": list(results),
+            "failures": failures,
+            "tool_latency_ms": latencies,
+        })
+
+    log(f"\n--- AGENT-COMPLETE{' (DEGRADED: Weather -> Rules only)' if degraded else ''} ---")
+    log(f"  Urgency: {urgency}")
+    log(f"  Recommendation: {recommendation}")
+    return record
+
+def measure_startup() -> dict:
+    """
+    Reports how long importing the planner took and how long each tool takes to warm up on first use.
+    """
+    timings = {"import_s": round(IMPORT_SECONDS, 4)}
+    for name, warm_up in (("knowledge", get_farm_data), ("literature", get_literature_index), ("vision", get_interpreter_pool)):
+        t0 = time.perf_counter()
+        try:
+            warm_up()
+        except Exception as e:
+            timings[f"{name}_error"] = str(e)
+        timings[f"{name}_init_s"] = round(time.perf_counter() - t0, 4)
+    return timings
 
 # --- Main part of the script to demonstrate a run ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agentic agronomist planner demo")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="Print import time and per-tool first-use load times, then exit")
+    args = parser.parse_args()
+
+    if args.startup_time:
+        for key, value in measure_startup().items():
+            print(f"{key}: {value}")
+        raise SystemExit(0)
+
     # Define the inputs for this specific run
     target_field = "FIELD_002"  # A field with a 'Kennebec' potato
     target_image = "test_leaf.jpg" # Your test image of a blighted leaf
     
-    # Make sure you have your Visual Crossing API key in your fetch_weather.py file,
-    # or pass it into the run_agent function.
+    # Make sure you have your Visual Crossing API key in VC_API_KEY above.
     run_agent(field_id=target_field, image_path=target_image)
\ No newline at end of file
@@ -0,0 +1,183 @@
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import yaml
+
+from agent_planner import (DEMO_LOCATION, VC_API_KEY, WEATHER_CACHE_PATH, synthesize,
+                           make_advisory_record, get_result_cache)
+from epirules.engine import evaluate_rule_set
+from fetch_weather import fetch_weather_bulk, GRID_DEGREES, _grid_key
+from knowledge_querier import find_fields, days_since_spray
+from literature_searcher import search_literature
+from metrics import record_run, span, propagate
+from weather_cache import WeatherCache
+
+IMAGE_SUFFIXES = (".jpg", ".JPG", ".jpeg", ".png")
+DEFAULT_WORKERS = 8
+# Every rule set in this file is evaluated per weather cell; `rule_set` picks the one that drives the advice
+RULES_PATH = "rules.yaml"
+
+def load_rules(path=RULES_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+def field_location(field):
+    """(latitude, longitude) from the field record, or the demo location if the table has no coordinates."""
+    lat, lon = field.get("latitude"), field.get("longitude")
+    if lat is None or lon is None:
+        return DEMO_LOCATION["latitude"], DEMO_LOCATION["longitude"]
+    return float(lat), float(lon)
+
+def find_field_images(field_ids, images_dir):
+    """Maps field_id -> <images_dir>/<field_id>.<jpg|png> for the fields that have one."""
+    images = {}
+    for fid in field_ids:
+        for suffix in IMAGE_SUFFIXES:
+            path = Path(images_dir) / f"{fid}{suffix}"
+            if path.exists():
+                images[fid] = str(path)
+                break
+    return images
+
+def _fetch_cells(cells, start_date, end_date):
+    cache = WeatherCache(WEATHER_CACHE_PATH)
+    try:
+        frames = fetch_weather_bulk([(lat, lon, start_date, end_date) for lat, lon in cells],
+                                    vc_api_key=VC_API_KEY, cache=cache)
+    finally:
+        cache.close()
+    return dict(zip(cells, frames))
+
+def _classify(images):
+    # Imported here so a run without images never touches the vision stack
+    from vision_classifier import classify_leaves
+    by_path = {r["image"]: r for r in classify_leaves(images.values())}
+    return {fid: by_path.get(path) for fid, path in images.items()}
+
+def run_region(fields, out_path, images=None, start_date=DEMO_LOCATION["start_date"], end_date=DEMO_LOCATION["end_date"],
+               rules=None, rule_set="Hutton", workers=DEFAULT_WORKERS, fetch_cells=_fetch_cells):
+    """
+    Produces one advisory record per field and writes them to `out_path` as JSON lines.
+
+    Fields are grouped by weather grid cell: weather is fetched once per cell and every
+    rule set is evaluated once per cell; literature searches are deduplicated across
+    fields and images are classified in one batched pass.
+
+    Args:
+        fields: Field records (e.g. from knowledge_querier.find_fields()).
+        out_path: JSONL output path.
+        images: Optional {field_id: image path}.
+        rules: Rule sets to evaluate (default: loaded from RULES_PATH). Each record lists
+            every verdict under "rule_sets"; `rule_set` is the one behind "risk" and the advice.
+        fetch_cells: Callable (cells, start, end) -> {cell: weather DataFrame or None}; injectable for offline runs.
+
+    Returns:
+        A summary dict with counts and elapsed time. The same summary, with per-stage
+        latency percentiles, is appended to metrics.jsonl.
+    """
+    rules = load_rules() if rules is None else rules
+    if rule_set not in rules:
+        raise ValueError(f"Rule set '{rule_set}' is not among the configured rule sets ({', '.join(rules)})")
+    with record_run("batch", out_path=str(out_path)) as metrics_run:
+        summary = _run_region(fields, out_path, images, start_date, end_date, rules, rule_set, workers, fetch_cells)
+        metrics_run.extra.update(summary)
+    print(f"Wrote {summary['written']} advisories to '{out_path}' ({summary})")
+    return summary
+
+def _run_region(fields, out_path, images, start_date, end_date, rules, rule_set, workers, fetch_cells):
+    started = time.perf_counter()
+    images = images or {}
+    cell_of = {}
+    for field in fields:
+        key = _grid_key(*field_location(field), start_date, end_date, GRID_DEGREES)
+        cell_of[field["field_id"]] = (key[0], key[1])
+    cells = sorted(set(cell_of.values()))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        vision_future = pool.submit(propagate(_classify), images) if images else None
+        with span("batch.weather"):
+            weather = fetch_cells(cells, start_date, end_date)
+        cell_risks = dict(zip(cells, pool.map(propagate(
+            lambda c: {rs: evaluate_rule_set(weather[c], rules, rs, cache=get_result_cache()) for rs in rules}
+            if weather.get(c) is not None else None), cells)))
+
+        vision_failure = None
+        visual = {}
+        if vision_future is not None:
+            try:
+                visual = vision_future.result()
+            except Exception as e:
+                vision_failure = f"{type(e).__name__}: {e}"
+
+        queries = {f["potato_variety"] for f in fields if f.get("potato_variety")}
+        queries |= {v["diagnosis"] for v in visual.values() if v and "diagnosis" in v}
+        queries = sorted(queries)
+        literature = dict(zip(queries, pool.map(propagate(search_literature), queries)))
+
+    written = skipped = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        for field in fields:
+            fid = field["field_id"]
+            risks = cell_risks.get(cell_of[fid])
+            if risks is None:
+                skipped += 1
+                continue
+            weather_risk = risks[rule_set]
+            failures = {}
+            visual_finding = visual.get(fid)
+            if fid in images and (visual_finding is None or "error" in visual_finding):
+                failures["vision"] = vision_failure or (visual_finding or {}).get("error", "no result")
+                visual_finding = None
+            degraded = bool(failures)
+            if degraded:
+                urgency, recommendation = synthesize(weather_risk)
+            else:
+                urgency, recommendation = synthesize(weather_risk, visual_finding, days_since_spray(field))
+            rag = list(literature.get(visual_finding["diagnosis"], [])) if visual_finding else []
+            rag += literature.get(field.get("potato_variety"), [])
+            tools = ["weather", "rules", "kg", "rag"] + (["vision"] if visual_finding else [])
+            record = make_advisory_record(
+                fid, urgency, recommendation, weather_risk, field,
+                {k: visual_finding[k] for k in ("diagnosis", "confidence")} if visual_finding else None, rag,
+                planner={"mode": "degraded" if degraded else "batch", "tools_called": tools, "failures": failures,
+                         "weather_cell": list(cell_of[fid])})
+            record["rule_sets"] = {rs: {"triggered": r["result"]["triggered"], "label": r["result"].get("risk_label")}
+                                   for rs, r in risks.items()}
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            written += 1
+
+    summary = {
+        "fields": len(fields),
+        "written": written,
+        "skipped_no_weather": skipped,
+        "weather_cells": len(cells),
+        "rule_sets": len(rules),
+        "literature_queries": len(queries),
+        "images": len(images),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+    return summary
+
+# --- Main part of the script ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Region-wide batch advisory runner")
+    parser.add_argument("--out", default="advisories.jsonl", help="Output JSONL path")
+    parser.add_argument("--farm", help="Only fields of this farm_name")
+    parser.add_argument("--variety", help="Only fields of this potato_variety")
+    parser.add_argument("--organic", choices=["true", "false"], help="Only (non-)organic compliant fields")
+    parser.add_argument("--images-dir", help="Folder with <field_id>.jpg leaf images")
+    parser.add_argument("--start", default=DEMO_LOCATION["start_date"], help="Weather start date (YYYY-MM-DD)")
+    parser.add_argument("--end", default=DEMO_LOCATION["end_date"], help="Weather end date (YYYY-MM-DD)")
+    parser.add_argument("--rules", default=RULES_PATH, help="Rule sets to evaluate (YAML)")
+    parser.add_argument("--rule-set", default="Hutton", help="Rule set behind each record's risk and recommendation")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    organic = None if args.organic is None else args.organic == "true"
+    selected = find_fields(farm=args.farm, variety=args.variety, organic=organic)
+    field_images = find_field_images([f["field_id"] for f in selected], args.images_dir) if args.images_dir else {}
+    run_region(selected, args.out, images=field_images, start_date=args.start, end_date=args.end,
+               rules=load_rules(args.rules), rule_set=args.rule_set, workers=args.workers)
@@ -0,0 +1,46 @@
+"""
+Throughput (images/sec, CPU) of one-at-a-time classify_leaf versus the
+batched, multi-threaded classify_leaves pipeline.
+
+Usage (from the repository root, so model.tflite and labels.txt resolve):
+    python benchmarks/bench_vision.py --images 200 --batch-size 16
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import vision_classifier
+from benchmarks.generators import synthetic_leaf_images
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Leaf classification throughput benchmark')
+    ap.add_argument('--images', type=int, default=100)
+    ap.add_argument('--batch-size', type=int, default=vision_classifier.DEFAULT_BATCH_SIZE)
+    ap.add_argument('--workers', type=int, default=None, help='Preprocessing threads (default: CPU count)')
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = synthetic_leaf_images(Path(tmp), args.images)
+
+        t0 = time.perf_counter()
+        sequential = [vision_classifier.classify_leaf(p) for p in paths]
+        t_seq = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        batched = list(vision_classifier.classify_leaves(paths, batch_size=args.batch_size, workers=args.workers))
+        t_batch = time.perf_counter() - t0
+
+    agree = sum(a['diagnosis'] == b.get('diagnosis') for a, b in zip(sequential, batched))
+    print(f"{args.images} images, batch size {args.batch_size}, "
+          f"{vision_classifier.get_interpreter_pool().size} interpreters")
+    print(f"  classify_leaf (sequential) : {args.images / t_seq:8.1f} images/sec")
+    print(f"  classify_leaves (batched)  : {args.images / t_batch:8.1f} images/sec")
+    print(f"  same diagnosis             : {agree}/{args.images}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Seeded synthetic data for the benchmarks: hourly weather, literature corpora,
+leaf images and field tables. The same seed always produces the same data.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+VARIETIES = ('Russet Burbank', 'Kennebec', 'Yukon Gold', 'Ranger Russet', 'Amarilis', 'Canchan')
+FUNGICIDES = ('Copper Hydroxide', 'Mancozeb', 'Chlorothalonil', 'Cymoxanil')
+CORPUS_VOCABULARY = (
+    'late blight lesions spread humid weather spores sporangia foliage tuber infection copper organic '
+    'mancozeb chlorothalonil cymoxanil interval rotation resistance variety kennebec russet yukon amarilis '
+    'canchan scouting threshold hutton smith forecast rainfall irrigation canopy leaf wetness temperature '
+    'fungicide protectant systemic label dose residue harvest storage rot oospores inoculum volunteer cull'
+).split()
+
+
+def synthetic_hourly_weather(years: float, seed: int = 0, start='2020-01-01') -> pd.DataFrame:
+    """Hourly temperature/RH series with daily and seasonal cycles plus noise."""
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range(start, periods=int(years * 365 * 24), freq='h', tz='UTC')
+    hours = np.arange(len(ts))
+    temp = 10 + 8 * np.sin(2 * np.pi * hours / (365 * 24)) + 5 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 1.5, len(ts))
+    rh = np.clip(75 + 15 * np.cos(2 * np.pi * hours / 24) + rng.normal(0, 8, len(ts)), 0, 100)
+    return pd.DataFrame({'timestamp': ts, 'temp_c': temp, 'rh': rh, 'rain_mm': 0.0})
+
+
+def synthetic_field_weather(n_fields: int, years: float, seed: int = 0, key: str = 'field_id') -> pd.DataFrame:
+    """Long-format hourly weather for n fields (one series per `key` value)."""
+    frames = [synthetic_hourly_weather(years, seed=seed + i).assign(**{key: f'FIELD_{i:05d}'}) for i in range(n_fields)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_weather_csv(path, years: float, seed: int = 0) -> Path:
+    """Writes one synthetic series in the sample_data/sample_weather.csv format."""
+    df = synthetic_hourly_weather(years, seed)
+    df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    df.to_csv(path, index=False)
+    return Path(path)
+
+
+def synthetic_corpus(folder, n_docs: int, paragraphs: int = 20, words: int = 60, seed: int = 0) -> Path:
+    """Writes n_docs .txt files of blank-line separated paragraphs drawn from CORPUS_VOCABULARY."""
+    rng = np.random.default_rng(seed)
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    vocab = np.array(CORPUS_VOCABULARY)
+    # Zipf-like word frequencies, like real text
+    weights = 1 / np.arange(1, len(vocab) + 1)
+    weights /= weights.sum()
+    for d in range(n_docs):
+        paras = [' '.join(rng.choice(vocab, size=words, p=weights)).capitalize() + '.' for _ in range(paragraphs)]
+        (folder / f'doc_{d:05d}.txt').write_text('\n\n'.join(paras), encoding='utf-8')
+    return folder
+
+
+def synthetic_leaf_images(folder, n: int, size=(1600, 1200), seed: int = 0) -> list:
+    """Writes n drone-sized noisy green JPEGs and returns their paths."""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(n):
+        base = np.array([40, 120, 40], dtype=np.int16)
+        pixels = np.clip(base + rng.normal(0, 35, (size[1], size[0], 3)), 0, 255).astype(np.uint8)
+        path = folder / f"leaf_{i:04d}.jpg"
+        Image.fromarray(pixels).save(path, quality=90)
+        paths.append(str(path))
+    return paths
+
+
+def synthetic_field_table(path, n_fields: int, n_farms: int = 50, seed: int = 0) -> Path:
+    """Writes a farm_data.csv-shaped table with n_fields rows."""
+    rng = np.random.default_rng(seed)
+    last_spray = pd.Timestamp('2025-06-01') + pd.to_timedelta(rng.integers(0, 90, n_fields), unit='D')
+    frame = pd.DataFrame({
+        'field_id': [f'FIELD_{i:05d}' for i in range(n_fields)],
+        'farm_name': [f'Farm {i:03d}' for i in rng.integers(0, n_farms, n_fields)],
+        'potato_variety': rng.choice(VARIETIES, n_fields),
+        'last_spray_date': last_spray.strftime('%Y-%m-%d'),
+        'fungicide_sprayed': rng.choice(FUNGICIDES, n_fields),
+        'is_organic_compliant': rng.random(n_fields) < 0.2,
+    })
+    frame.to_csv(path, index=False)
+    return Path(path)
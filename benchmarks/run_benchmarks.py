@@ -0,0 +1,323 @@
+"""
+Benchmark suite for the hot paths: weather CSV parsing, daily aggregation, rule
+evaluation, literature search, leaf classification, field lookups and an offline
+end-to-end planner run.
+
+Every case runs on seeded synthetic data (see generators.py). Results are written
+as JSON and compared with a stored baseline; a case whose median time grows by
+more than --tolerance is flagged as a regression and the exit status is 1.
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py                      # full scale, compare with baseline.json
+    python benchmarks/run_benchmarks.py --scale quick --only rules
+    python benchmarks/run_benchmarks.py --update-baseline    # record this machine's numbers as the baseline
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.generators import (synthetic_corpus, synthetic_field_table, synthetic_field_weather,
+                                   synthetic_hourly_weather, synthetic_leaf_images, write_weather_csv)
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = BENCH_DIR / 'baseline.json'
+RESULTS_PATH = BENCH_DIR / 'results' / 'latest.json'
+DEFAULT_TOLERANCE = 0.25
+# Differences below this are timer noise, never regressions
+NOISE_FLOOR_MS = 1.0
+# Each case is timed at least `repeat` times and for at least this long in total
+MIN_TIMED_MS = 500.0
+
+# Problem sizes per scale
+SCALES = {
+    'quick': {'years': 0.5, 'fields': 4, 'docs': 40, 'images': 4, 'table_rows': 2_000, 'lookups': 1_000, 'queries': 20,
+              'repeat': 3},
+    'full': {'years': 5, 'fields': 50, 'docs': 2_000, 'images': 32, 'table_rows': 200_000, 'lookups': 20_000,
+             'queries': 200, 'repeat': 5},
+}
+
+RULES = {
+    'Hutton': {'min_temp_c': 10, 'rh_threshold': 90, 'min_hours_per_day': 6, 'consecutive_days': 2},
+    'Smith': {'min_temp_c': 10, 'rh_threshold': 90, 'min_hours_per_day': 11, 'consecutive_days': 2},
+}
+QUERIES = ('late blight', 'copper organic', 'mancozeb interval', 'tuber rot storage', 'kennebec resistance')
+
+CASES = {}
+
+
+class Skip(Exception):
+    """A case that cannot run here (e.g. no TFLite runtime)."""
+
+
+def case(name, unit):
+    """Registers `setup(size, workdir, stack) -> (fn, n_items)` as a case; each call of fn is one timed run."""
+    def register(setup):
+        CASES[name] = (setup, unit)
+        return setup
+    return register
+
+
+@contextlib.contextmanager
+def _patched(module, **attrs):
+    saved = {k: getattr(module, k) for k in attrs}
+    for k, v in attrs.items():
+        setattr(module, k, v)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            setattr(module, k, v)
+
+
+# --- Cases ---
+@case('weather.read_csv', 'rows')
+def _read_csv(size, workdir, stack):
+    from epirules.io import read_weather_csv
+    path = write_weather_csv(workdir / 'weather.csv', size['years'])
+    n = sum(1 for _ in open(path)) - 1
+    return lambda: read_weather_csv(str(path)), n
+
+
+@case('rules.daily_aggregates', 'rows')
+def _daily_aggregates(size, workdir, stack):
+    from epirules.io import daily_aggregates
+    df = synthetic_hourly_weather(size['years'])
+    return lambda: daily_aggregates(df), len(df)
+
+
+@case('rules.evaluate_rule_set', 'rows')
+def _evaluate_rule_set(size, workdir, stack):
+    from epirules.engine import evaluate_rule_set
+    df = synthetic_hourly_weather(size['years'])
+    return lambda: evaluate_rule_set(df, RULES, 'Hutton'), len(df)
+
+
+@case('rules.evaluate_batch', 'rows')
+def _evaluate_batch(size, workdir, stack):
+    from epirules.engine import evaluate_batch
+    df = synthetic_field_weather(size['fields'], size['years'])
+    return lambda: evaluate_batch(df, RULES), len(df)
+
+
+@case('rules.risk_series', 'rows')
+def _risk_series(size, workdir, stack):
+    from epirules.engine import risk_series
+    df = synthetic_field_weather(size['fields'], size['years'])
+    return lambda: risk_series(df, RULES, key='field_id'), len(df)
+
+
+@case('rag.search_literature', 'queries')
+def _search_literature(size, workdir, stack):
+    import literature_searcher
+    folder = synthetic_corpus(workdir / 'Literature', size['docs'])
+    stack.enter_context(_patched(literature_searcher, LITERATURE_PATH=folder, INDEX_PATH=workdir / 'index.pkl',
+                                 _INDEX=None, REFRESH_INTERVAL_S=float('inf')))
+    literature_searcher.get_literature_index()  # build once, outside the timed loop
+    queries = [QUERIES[i % len(QUERIES)] for i in range(size['queries'])]
+    return lambda: [literature_searcher.search_literature(q, top_k=5) for q in queries], len(queries)
+
+
+@case('vision.preprocess_image', 'images')
+def _preprocess_image(size, workdir, stack):
+    try:
+        import vision_classifier
+    except ImportError as e:
+        raise Skip(str(e))
+    paths = synthetic_leaf_images(workdir / 'leaves', size['images'])
+    return lambda: [vision_classifier.preprocess_image(p, fast_decode=True) for p in paths], len(paths)
+
+
+@case('vision.classify_leaf', 'images')
+def _classify_leaf(size, workdir, stack):
+    try:
+        import vision_classifier
+        vision_classifier.get_interpreter_pool()
+    except Exception as e:
+        raise Skip(f"{type(e).__name__}: {e}")
+    paths = synthetic_leaf_images(workdir / 'leaves', size['images'])
+    return lambda: [vision_classifier.classify_leaf(p) for p in paths], len(paths)
+
+
+@case('kg.query_field_details', 'lookups')
+def _query_field_details(size, workdir, stack):
+    import knowledge_querier
+    path = synthetic_field_table(workdir / 'farm_data.csv', size['table_rows'])
+    stack.enter_context(_patched(knowledge_querier, FARM_DATA_PATH=str(path), _STORE=None))
+    knowledge_querier.get_field_store()
+    rng = np.random.default_rng(0)
+    ids = [f'FIELD_{i:05d}' for i in rng.integers(0, size['table_rows'], size['lookups'])]
+    return lambda: [knowledge_querier.query_field_details(fid) for fid in ids], len(ids)
+
+
+@case('planner.run_agent_offline', 'runs')
+def _run_agent(size, workdir, stack):
+    # Real rules, knowledge and literature tools; weather is synthetic and vision degrades if no runtime
+    import agent_planner
+    import knowledge_querier
+    import literature_searcher
+    import metrics
+    weather = synthetic_hourly_weather(size['years'])
+    folder = synthetic_corpus(workdir / 'Literature', size['docs'])
+    table = synthetic_field_table(workdir / 'farm_data.csv', size['table_rows'])
+    leaf, = synthetic_leaf_images(workdir / 'leaves', 1)
+    stack.enter_context(_patched(agent_planner, _fetch_weather=lambda: weather))
+    stack.enter_context(_patched(literature_searcher, LITERATURE_PATH=folder, INDEX_PATH=workdir / 'index.pkl',
+                                 _INDEX=None, REFRESH_INTERVAL_S=float('inf')))
+    stack.enter_context(_patched(knowledge_querier, FARM_DATA_PATH=str(table), _STORE=None))
+    stack.enter_context(_patched(metrics, METRICS_PATH=str(workdir / 'metrics.jsonl')))
+    # Load the tables up front so the first run stays within the per-tool budgets
+    knowledge_querier.get_field_store()
+    literature_searcher.get_literature_index()
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return agent_planner.run_agent('FIELD_00001', leaf)
+    return run, 1
+
+
+# --- Running and comparing ---
+def environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_case(name, size, repeat):
+    setup, unit = CASES[name]
+    with tempfile.TemporaryDirectory() as tmp, contextlib.ExitStack() as stack:
+        try:
+            fn, n_items = setup(size, Path(tmp), stack)
+        except Skip as e:
+            return {'skipped': str(e)}
+        fn()  # warm-up
+        times = []
+        # As timeit does: garbage left by earlier cases must not trigger a collection inside this one's timings
+        gc.collect()
+        gc.disable()
+        try:
+            # Short cases keep sampling until MIN_TIMED_MS, so a brief stall on the machine moves few samples
+            while len(times) < repeat or sum(times) < MIN_TIMED_MS:
+                t0 = time.perf_counter()
+                fn()
+                times.append((time.perf_counter() - t0) * 1000)
+        finally:
+            gc.enable()
+    median = statistics.median(times)
+    return {
+        'unit': unit,
+        'n': n_items,
+        'repeat': len(times),
+        'min_ms': round(min(times), 3),
+        'median_ms': round(median, 3),
+        'stdev_ms': round(statistics.stdev(times), 3) if len(times) > 1 else 0.0,
+        'per_second': round(n_items / (median / 1000), 1) if median else None,
+    }
+
+
+def run_suite(scale='full', only=None, repeat=None) -> dict:
+    """
+    Runs every case (or those whose name contains one of `only`) at `scale`.
+
+    Returns:
+        {"scale", "timestamp", "environment", "results": {case: timings or {"skipped": reason}}}
+    """
+    size = SCALES[scale]
+    names = [n for n in CASES if not only or any(o in n for o in only)]
+    results = {}
+    for name in names:
+        results[name] = run_case(name, size, repeat or size['repeat'])
+    return {
+        'scale': scale,
+        'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'environment': environment(),
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance=DEFAULT_TOLERANCE) -> list:
+    """
+    Compares median times case by case (only when both runs used the same scale).
+
+    Returns:
+        One {"case", "baseline_ms", "current_ms", "ratio", "status"} per comparable case,
+        with status "regression", "improved" or "ok".
+    """
+    if baseline.get('scale') != current.get('scale'):
+        return []
+    rows = []
+    for name, res in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base or 'median_ms' not in base or 'median_ms' not in res:
+            continue
+        ratio = res['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+        delta = abs(res['median_ms'] - base['median_ms'])
+        status = 'ok'
+        if delta > NOISE_FLOOR_MS and ratio > 1 + tolerance:
+            status = 'regression'
+        elif delta > NOISE_FLOOR_MS and ratio < 1 / (1 + tolerance):
+            status = 'improved'
+        rows.append({'case': name, 'baseline_ms': base['median_ms'], 'current_ms': res['median_ms'],
+                     'ratio': round(ratio, 3), 'status': status})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Agronomist benchmark suite')
+    ap.add_argument('--scale', choices=sorted(SCALES), default='full')
+    ap.add_argument('--only', action='append', help='Run cases whose name contains this (repeatable)')
+    ap.add_argument('--repeat', type=int, help='Minimum timed repetitions per case (default depends on --scale)')
+    ap.add_argument('--out', default=str(RESULTS_PATH), help='Where to write the JSON results')
+    ap.add_argument('--baseline', default=str(BASELINE_PATH))
+    ap.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                    help='Allowed median slowdown before a case is flagged (0.25 = 25%%)')
+    ap.add_argument('--update-baseline', action='store_true', help='Write these results as the new baseline')
+    args = ap.parse_args()
+
+    report = run_suite(args.scale, args.only, args.repeat)
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists() and not args.update_baseline:
+        report['comparison'] = compare(report, json.loads(baseline_path.read_text()), args.tolerance)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2))
+
+    statuses = {row['case']: row for row in report.get('comparison', [])}
+    print(f"scale={args.scale}  ({report['environment']['platform']}, {report['environment']['cpus']} CPUs)")
+    for name, res in report['results'].items():
+        if 'skipped' in res:
+            print(f"  {name:28s} skipped: {res['skipped']}")
+            continue
+        row = statuses.get(name)
+        flag = f"  {row['status']} ({row['ratio']:.2f}x baseline)" if row else ''
+        print(f"  {name:28s} {res['median_ms']:10.1f} ms  {res['per_second']:>12,.1f} {res['unit']}/s{flag}")
+    print(f"Results written to {out}")
+
+    regressions = [row['case'] for row in report.get('comparison', []) if row['status'] == 'regression']
+    if regressions:
+        print(f"REGRESSIONS: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
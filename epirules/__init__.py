@@ -1 +1,2 @@
-from .engine import evaluate_rule_set
+from .engine import evaluate_rule_set, evaluate_batch, risk_series, set_span_hook
+from .stream import IncrementalEvaluator
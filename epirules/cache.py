@@ -0,0 +1,139 @@
+from __future__ import annotations
+import hashlib, json, os, pickle, sqlite3, threading, time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Content-addressed memo for rule evaluations.
+# Keys hash the normalized inputs, the rule parameters and the source of the code that computes
+# the result, so editing rules.yaml or the engine never serves a stale entry.
+
+MAX_MEMORY_ENTRIES = 512
+MAX_DISK_BYTES = 64 * 1024 * 1024
+ENGINE_SOURCES = tuple(os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+                       for name in ('io.py', 'rules.py', 'engine.py'))
+WEATHER_COLUMNS = ('temp_c', 'rh', 'rain_mm')
+
+_code_versions: Dict[Tuple, str] = {}
+
+def code_version(paths: Iterable[str] = ENGINE_SOURCES) -> str:
+    """Hash of the given source files; recomputed only when one of them changes on disk."""
+    paths = tuple(paths)
+    signature = tuple((p, os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+    if signature not in _code_versions:
+        h = hashlib.sha256()
+        for p in paths:
+            with open(p, 'rb') as f:
+                h.update(f.read())
+        _code_versions[signature] = h.hexdigest()[:16]
+    return _code_versions[signature]
+
+def weather_digest(weather_df: pd.DataFrame) -> str:
+    """Hash of the hourly records the rules read: UTC timestamps plus temp_c/rh/rain_mm as float64."""
+    h = hashlib.sha256()
+    ts = weather_df['timestamp']
+    if getattr(ts.dt, 'tz', None) is not None:
+        # Same instants, same digest, whatever the display time zone; the zone itself is hashed
+        # too since it decides the local day boundaries
+        h.update(str(ts.dt.tz).encode('utf-8'))
+    h.update(np.ascontiguousarray(ts.to_numpy(dtype='datetime64[ns]').astype(np.int64)).tobytes())
+    for column in WEATHER_COLUMNS:
+        h.update(column.encode('utf-8'))
+        if column in weather_df:
+            h.update(np.ascontiguousarray(weather_df[column].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+def result_key(namespace: str, *parts: Any) -> str:
+    payload = json.dumps([namespace, *parts], sort_keys=True, default=str)
+    return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+class ResultCache:
+    """
+    Two-tier memo: an in-process LRU of up to `max_entries` results in front of an
+    optional SQLite file (`path`), trimmed least-recently-used to `max_bytes`.
+
+    Values are stored pickled, so callers always get their own copy.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = MAX_MEMORY_ENTRIES,
+                 max_bytes: int = MAX_DISK_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS results ('
+                             ' key TEXT PRIMARY KEY, created_at REAL, last_access REAL, size INTEGER, payload BLOB)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)')
+            self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, payload: bytes) -> None:
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return payload
+            if self._db is not None:
+                row = self._db.execute('SELECT payload FROM results WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    self._db.execute('UPDATE results SET last_access = ? WHERE key = ?', (time.time(), key))
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.stats['disk_hits'] += 1
+                    return row[0]
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(key, payload)
+            if self._db is not None:
+                now = time.time()
+                self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                                 (key, now, now, len(payload), payload))
+                self._evict()
+                self._db.commit()
+
+    def _evict(self) -> None:
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute('SELECT key, size FROM results ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+            total -= size
+            self.stats['evictions'] += 1
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        payload = self._load(key)
+        if payload is not None:
+            return pickle.loads(payload)
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM results')
+                self._db.commit()
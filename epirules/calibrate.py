@@ -0,0 +1,190 @@
+from __future__ import annotations
+import argparse, itertools, json, os
+from multiprocessing import Pool
+from typing import Dict, Any, List, Optional
+import numpy as np
+import pandas as pd
+import yaml
+from .io import read_weather_csv, daily_aggregates
+from .store import WeatherStore
+from .engine import run_lengths
+from .rules import compile_rule, aggregates_for, configured_rule_sets
+
+# Phase 1 target in the README: >= 80% agreement on risk labels
+TARGET_ACCURACY = 0.8
+DEFAULT_LEAD_DAYS = 7
+
+def parse_values(text: str) -> List[float]:
+    # "80,85,90" or an inclusive range "12:18:2"
+    if ':' in text:
+        start, stop, step = (float(x) for x in text.split(':'))
+        values = np.arange(start, stop + step / 2, step)
+    else:
+        values = [float(x) for x in text.split(',')]
+    return [int(v) if float(v).is_integer() else round(float(v), 6) for v in values]
+
+def parameter_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    names = list(grid)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(grid[n] for n in names))]
+
+def agreement(predicted: np.ndarray, observed: np.ndarray) -> Dict[str, Any]:
+    """Confusion counts, accuracy and Cohen's kappa of two boolean arrays."""
+    n = len(observed)
+    tp = int((predicted & observed).sum())
+    tn = int((~predicted & ~observed).sum())
+    fp = int((predicted & ~observed).sum())
+    fn = n - tp - tn - fp
+    accuracy = (tp + tn) / n if n else None
+    expected = ((tp + fp) * (tp + fn) + (fn + tn) * (fp + tn)) / n ** 2 if n else None
+    kappa = (accuracy - expected) / (1 - expected) if n and expected < 1 else None
+    return {
+        'n': n, 'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'accuracy': None if accuracy is None else round(accuracy, 4),
+        'kappa': None if kappa is None else round(kappa, 4),
+        'sensitivity': round(tp / (tp + fn), 4) if tp + fn else None,
+        'specificity': round(tn / (tn + fp), 4) if tn + fp else None,
+    }
+
+def observed_outbreaks(days: pd.DataFrame, labels: pd.DataFrame, key: str, lead_days: int) -> tuple:
+    """
+    Aligns outbreak labels with the (key, day) rows in `days`.
+
+    With an `outbreak` column, only the labelled (field, date) rows are scored, against that value.
+    Otherwise every listed date is an outbreak and every day is scored: a day counts as positive
+    when an outbreak was recorded within `lead_days` after it (risk precedes symptoms).
+
+    Returns (row mask of scored days, observed outbreak flag per scored day).
+    """
+    labels = labels.assign(date=pd.to_datetime(labels['date']).dt.normalize())
+    day = days['day'].dt.normalize()
+    if key not in labels:
+        labels = labels.merge(pd.DataFrame({key: days[key].unique()}), how='cross')
+    labels[key] = labels[key].astype(str)
+    fields = days[key].astype(str)
+    if 'outbreak' in labels:
+        flag = labels.set_index([key, 'date'])['outbreak'].astype(bool)
+        flag = flag[~flag.index.duplicated(keep='last')]
+        index = pd.MultiIndex.from_arrays([fields, day])
+        scored = index.isin(flag.index)
+        return scored, flag.reindex(index[scored]).to_numpy(dtype=bool)
+    observed = np.zeros(len(days), dtype=bool)
+    for lead in range(lead_days + 1):
+        index = pd.MultiIndex.from_arrays([fields, day + pd.Timedelta(days=lead)])
+        observed |= index.isin(pd.MultiIndex.from_frame(labels[[key, 'date']]))
+    return np.ones(len(days), dtype=bool), observed
+
+# Per-worker sweep state, set once by the pool initializer instead of being pickled per task
+_SWEEP: Dict[str, Any] = {}
+
+def _init_sweep(daily, starts, scored, observed, base, rule_set):
+    _SWEEP.update(daily=daily, starts=starts, scored=scored, observed=observed, base=base, rule_set=rule_set)
+
+def _score(params: Dict[str, Any]) -> Dict[str, Any]:
+    rule = compile_rule({_SWEEP['rule_set']: {**_SWEEP['base'], **params}}, _SWEEP['rule_set'])
+    daily = _SWEEP['daily']
+    cond = rule.day_flags(daily).fillna(False).to_numpy(dtype=bool)
+    skip = rule.bridged(daily, cond)
+    triggered, _ = rule.levels(run_lengths(cond, _SWEEP['starts'], None if skip is None else np.asarray(skip, dtype=bool)))
+    scored = _SWEEP['scored']
+    return {**params, **agreement(np.asarray(triggered, dtype=bool)[scored], _SWEEP['observed'])}
+
+def calibrate(weather_df: pd.DataFrame, labels: pd.DataFrame, rules: Dict[str, Any], rule_set: str,
+              grid: Dict[str, List[Any]], key: str = 'field_id', lead_days: int = DEFAULT_LEAD_DAYS,
+              workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Scores every combination of `grid` (parameter -> values) applied to `rule_set` against outbreak labels.
+
+    Daily aggregates are computed once per field for every threshold the grid needs;
+    each combination then only re-applies the day conditions and the run-length scan.
+    Combinations are spread over `workers` processes (default: CPU count; 1 runs inline).
+
+    Returns one row per combination with the parameters, confusion counts, accuracy and
+    kappa, best kappa first.
+    """
+    if rule_set not in configured_rule_sets(rules):
+        raise ValueError(f'Unknown rule_set: {rule_set}')
+    base = {k: v for k, v in rules[rule_set].items()}
+    unknown = [name for name in grid if name not in base]
+    if unknown:
+        raise ValueError(f"Rule set {rule_set} has no parameter(s) {', '.join(unknown)} to sweep")
+    combos = parameter_grid(grid)
+    needed = {'rh_thresholds': [], 'mean_temp_thresholds': [], 'stats': []}
+    for params in combos:
+        for k, v in aggregates_for({rule_set: compile_rule({rule_set: {**base, **params}}, rule_set)}).items():
+            needed[k] += [x for x in v if x not in needed[k]]
+
+    if key not in weather_df:
+        weather_df = weather_df.assign(**{key: 'field'})
+    frames = [daily_aggregates(g, **needed).assign(**{key: str(field)})
+              for field, g in weather_df.groupby(key, sort=True)]
+    daily = pd.concat(frames, ignore_index=True)
+    starts = np.zeros(len(daily), dtype=bool)
+    starts[np.cumsum([0] + [len(f) for f in frames[:-1]])] = True
+    scored, observed = observed_outbreaks(daily, labels, key, lead_days)
+
+    workers = workers or os.cpu_count() or 1
+    init = (daily, starts, scored, observed, base, rule_set)
+    if workers == 1 or len(combos) < 2:
+        _init_sweep(*init)
+        rows = [_score(params) for params in combos]
+    else:
+        with Pool(min(workers, len(combos)), initializer=_init_sweep, initargs=init) as pool:
+            rows = pool.map(_score, combos, chunksize=max(1, len(combos) // (workers * 4)))
+    table = pd.DataFrame(rows)
+    return table.sort_values(['kappa', 'accuracy'], ascending=False, na_position='last', kind='stable').reset_index(drop=True)
+
+def main():
+    ap = argparse.ArgumentParser(description='Calibrate rule thresholds against observed outbreaks')
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument('--weather', help='Weather CSV (one series, or long format with --key)')
+    src.add_argument('--store', help='Columnar weather store (see epirules.store)')
+    ap.add_argument('--station', action='append', help='With --store: station(s) to use (default: all)')
+    ap.add_argument('--start', help='With --store: first timestamp (inclusive)')
+    ap.add_argument('--end', help='With --store: last timestamp (exclusive)')
+    ap.add_argument('--key', default='field_id', help='Field/station column (default: field_id)')
+    ap.add_argument('--labels', required=True,
+                    help="CSV of outbreaks: date (and the --key column); optional 'outbreak' 0/1 to score only those rows")
+    ap.add_argument('--rules', required=True, help='Path to rules.yaml')
+    ap.add_argument('--rule-set', default='LocalAndes', help='Rule set to calibrate (default: LocalAndes)')
+    ap.add_argument('--param', action='append', required=True, metavar='NAME=VALUES',
+                    help="Grid axis, e.g. rh_threshold=80,85,90 or min_temp_c=12:18:1 (repeat per parameter)")
+    ap.add_argument('--lead-days', type=int, default=DEFAULT_LEAD_DAYS,
+                    help='Days before a recorded outbreak that count as positive (default: 7)')
+    ap.add_argument('--workers', type=int, help='Processes (default: CPU count)')
+    ap.add_argument('--top', type=int, default=10, help='Rows to print')
+    ap.add_argument('--out', required=True, help='Output table (.csv or .json)')
+    args = ap.parse_args()
+
+    grid = {}
+    for spec in args.param:
+        name, _, values = spec.partition('=')
+        if not values:
+            ap.error(f"argument --param: expected NAME=VALUES, got '{spec}'")
+        grid[name.strip()] = parse_values(values)
+    if args.weather:
+        df = read_weather_csv(args.weather)
+    else:
+        df = WeatherStore(args.store).read_many(args.station, args.start, args.end, key=args.key)
+    with open(args.rules, 'r', encoding='utf-8') as f:
+        rules = yaml.safe_load(f)
+    labels = pd.read_csv(args.labels, dtype={args.key: str})
+
+    try:
+        table = calibrate(df, labels, rules, args.rule_set, grid, key=args.key, lead_days=args.lead_days,
+                          workers=args.workers)
+    except ValueError as e:
+        ap.error(str(e))
+    if args.out.endswith('.csv'):
+        table.to_csv(args.out, index=False)
+    else:
+        table.to_json(args.out, orient='records', indent=2)
+
+    print(table.head(args.top).to_string(index=False))
+    best = table.head(1).to_dict('records')[0]
+    met = pd.notna(best['accuracy']) and best['accuracy'] >= TARGET_ACCURACY
+    print(json.dumps({'combinations': len(table), 'best': {k: best[k] for k in grid},
+                      'accuracy': best['accuracy'], 'kappa': best['kappa'],
+                      'meets_target': bool(met)}, default=str))
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,87 @@
 from __future__ import annotations
 import argparse, json, yaml, pandas as pd
 from .io import read_weather_csv
-from .engine import evaluate_rule_set
+from .store import WeatherStore
+from .cache import ResultCache
+from .engine import evaluate_rule_set, evaluate_batch, risk_series, configured_rule_sets
+
+def _summary(rs):
+    if 'risk_label' in rs:
+        return f"{rs['rule']} risk: {rs.get('risk_label','n/a')} (days meeting criteria: {len(rs['details']['days_meeting_criteria'])})"
+    return f"{rs['rule']} triggered: {rs['triggered']} (run={rs['details']['consecutive_true_max']}/{rs['details']['required_consecutive_days']})"
+
+def _write_table(table, path, json_orient):
+    # .parquet needs pyarrow (or fastparquet); .csv; anything else is JSON
+    if path.endswith('.parquet'):
+        table.to_parquet(path, index=False)
+    elif path.endswith('.csv'):
+        table.to_csv(path, index=False)
+    elif json_orient == 'columnar':
+        # {column: [values...]}: one list per column, no per-row keys
+        columns = {c: [None if pd.isna(v) else v for v in table[c].tolist()] for c in table}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(columns, f, ensure_ascii=False)
+    else:
+        table.to_json(path, orient=json_orient, indent=2)
 
 def main():
     ap = argparse.ArgumentParser(description='Epidemiological rules checker (late blight)')
-    ap.add_argument('--weather', required=True, help='Path to weather CSV')
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument('--weather', help='Path to weather CSV')
+    src.add_argument('--store', help='Path to a columnar weather store (see epirules.store)')
+    ap.add_argument('--station', action='append',
+                    help='Station/field in --store; repeat in --batch mode (default: every station)')
+    ap.add_argument('--start', help='With --store: first timestamp to read (inclusive)')
+    ap.add_argument('--end', help='With --store: last timestamp to read (exclusive)')
     ap.add_argument('--rules', required=True, help='Path to rules.yaml')
-    ap.add_argument('--rule-set', required=True, choices=['Hutton','Smith','LocalAndes'])
-    ap.add_argument('--out', required=True, help='Path to output JSON')
+    ap.add_argument('--rule-set', action='append',
+                    help='Rule set to evaluate (e.g. Hutton, Smith, LocalAndes); repeat in --batch mode. '
+                         'Batch mode defaults to every configured rule set')
+    ap.add_argument('--batch', action='store_true',
+                    help='Treat --weather as a long-format table with one series per --key and evaluate every field')
+    ap.add_argument('--series', action='store_true',
+                    help='Write the day-by-day risk history (run length, triggered, risk label, days since trigger) '
+                         'for every selected rule set instead of a season verdict')
+    ap.add_argument('--key', default='field_id', help='Field/station column for --batch (default: field_id)')
+    ap.add_argument('--cache', help='SQLite result cache; reruns on identical weather and rule parameters are served from it')
+    ap.add_argument('--out', required=True,
+                    help='Path to output JSON (--batch/--series: .csv, .parquet or column-oriented .json)')
     args = ap.parse_args()
 
-    df = read_weather_csv(args.weather)
+    if args.weather:
+        df = read_weather_csv(args.weather)
+    elif args.batch:
+        df = WeatherStore(args.store).read_many(args.station, args.start, args.end, key=args.key)
+    elif args.station and len(args.station) == 1:
+        df = WeatherStore(args.store).read(args.station[0], args.start, args.end)
+    else:
+        ap.error('exactly one --station is required with --store unless --batch is given')
     with open(args.rules, 'r', encoding='utf-8') as f:
         rules = yaml.safe_load(f)
-    result = evaluate_rule_set(df, rules, args.rule_set)
+    available = configured_rule_sets(rules)
+    for name in args.rule_set or []:
+        if name not in available:
+            ap.error(f"argument --rule-set: invalid choice: '{name}' (choose from {', '.join(available)})")
+
+    if args.series:
+        table = risk_series(df, rules, args.rule_set, key=args.key if args.batch else None)
+        _write_table(table.assign(day=table['day'].dt.strftime('%Y-%m-%d')), args.out, 'columnar')
+        return
+    if args.batch:
+        _write_table(evaluate_batch(df, rules, args.rule_set, key=args.key), args.out, 'records')
+        return
+
+    if not args.rule_set or len(args.rule_set) != 1:
+        ap.error('exactly one --rule-set is required unless --batch is given')
+    cache = ResultCache(args.cache) if args.cache else None
+    try:
+        result = evaluate_rule_set(df, rules, args.rule_set[0], cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
 
     # Add simple human summary
-    rs = result['result']
-    if rs['rule'] == 'LocalAndes':
-        summary = f"{rs['rule']} risk: {rs.get('risk_label','n/a')} (days meeting criteria: {len(rs['details']['days_meeting_criteria'])})"
-    else:
-        summary = f"{rs['rule']} triggered: {rs['triggered']} (run={rs['details']['consecutive_true_max']}/{rs['details']['required_consecutive_days']})"
-    result['summary'] = summary
+    result['summary'] = _summary(result['result'])
 
     with open(args.out, 'w', encoding='utf-8') as f:
         json.dump(result, f, ensure_ascii=False, indent=2, default=str)
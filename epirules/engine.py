@@ -1,85 +1,157 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, Any, List
+from contextlib import nullcontext
+from typing import Dict, Any, Callable, List, Optional
+import numpy as np
 import pandas as pd
 from .io import daily_aggregates
+from .rules import CompiledRule, compile_rule, compile_rules, aggregates_for, configured_rule_sets
+from .cache import ResultCache, code_version, result_key, weather_digest
+
+_span_hook: Optional[Callable[[str], Any]] = None
+
+def set_span_hook(hook: Optional[Callable[[str], Any]]) -> None:
+    """
+    Installs `hook(name)`, a context-manager factory that times the 'rules.aggregate' and
+    'rules.evaluate' stages (e.g. the app's metrics.span). None turns timing off.
+    """
+    global _span_hook
+    _span_hook = hook
+
+def _span(name: str):
+    return _span_hook(name) if _span_hook is not None else nullcontext()
 
 @dataclass
 class RuleParams:
     name: str
     params: Dict[str, Any]
 
-def _consecutive_true_days(flags: List[bool], min_run: int) -> int:
-    run = best = 0
-    for f in flags:
-        run = run + 1 if f else 0
-        if run > best: best = run
-    return best
+SERIES_COLUMNS = ['rule_set', 'day', 'meets_criteria', 'run_length', 'triggered', 'risk_label', 'days_since_trigger']
+
+def run_lengths(flags, starts=None, skip=None) -> np.ndarray:
+    """
+    Length of the run of consecutive True values ending at each position (0 where False).
+    `starts` optionally marks where independent series begin in a concatenated array.
+    `skip` optionally marks positions that hold the current run without extending or breaking it.
+    """
+    flags = np.asarray(flags, dtype=bool)
+    count = np.cumsum(flags, dtype=np.int64)
+    # At each False, remember the count so far; subtracting the latest one resets the run
+    hold = flags if skip is None else flags | np.asarray(skip, dtype=bool)
+    reset = np.where(hold, 0, count)
+    if starts is not None:
+        reset = np.where(np.asarray(starts, dtype=bool), count - flags, reset)
+    return count - np.maximum.accumulate(reset)
+
+def _rule_runs(daily: pd.DataFrame, rule: CompiledRule):
+    # (day flags, run length per day), bridging incomplete days for rules that ask for it
+    cond = rule.day_flags(daily).fillna(False).to_numpy(dtype=bool)
+    skip = rule.bridged(daily, cond)
+    return cond, run_lengths(cond, skip=None if skip is None else np.asarray(skip, dtype=bool))
+
+def _evidence_days(daily: pd.DataFrame, cond: np.ndarray) -> List[str]:
+    return daily.loc[cond, 'day'].dt.strftime('%Y-%m-%d').tolist()
+
+def evaluate_daily(daily: pd.DataFrame, rule: CompiledRule) -> Dict[str, Any]:
+    """Season verdict of one compiled rule over precomputed daily aggregates."""
+    cond, runs = _rule_runs(daily, rule)
+    return rule.result(int(runs.max()) if len(runs) else 0, _evidence_days(daily, cond))
+
+def evaluate_rule_set(weather_df: pd.DataFrame, rules: Dict[str, Any], rule_set: str,
+                      cache: Optional[ResultCache] = None) -> Dict[str, Any]:
+    if cache is not None:
+        # Keyed by the weather content, this rule set's parameters and the engine source
+        key = result_key('evaluate_rule_set', code_version(), rule_set, rules.get(rule_set), weather_digest(weather_df))
+        return cache.get_or_compute(key, lambda: evaluate_rule_set(weather_df, rules, rule_set))
+    rule = compile_rule(rules, rule_set)
+    with _span('rules.aggregate'):
+        daily = daily_aggregates(weather_df, **aggregates_for({rule_set: rule}))
+    with _span('rules.evaluate'):
+        return {'rule_set': rule_set, 'days': len(daily), 'result': evaluate_daily(daily, rule)}
+
+def evaluate_batch(weather_df: pd.DataFrame, rules: Dict[str, Any], rule_sets: Optional[List[str]] = None,
+                   key: str = 'field_id') -> pd.DataFrame:
+    """
+    Evaluates several rule sets over a long-format weather table with one series per `key`.
 
-def eval_hutton(daily: pd.DataFrame, p: Dict[str, Any]) -> Dict[str, Any]:
-    cond = (daily['min_temp_c'] >= p['min_temp_c']) & (daily['hours_rh_ge_90'] >= p['min_hours_per_day'])
-    best_run = _consecutive_true_days(cond.tolist(), p['consecutive_days'])
-    triggered = best_run >= p['consecutive_days']
-    evidence_days = daily.loc[cond, 'day'].dt.strftime('%Y-%m-%d').tolist()
-    return {
-        'rule': 'Hutton',
-        'triggered': bool(triggered),
-        'details': {
-            'consecutive_true_max': int(best_run),
-            'required_consecutive_days': int(p['consecutive_days']),
-            'days_meeting_criteria': evidence_days,
-        }
-    }
+    Daily aggregates (only those the selected rule sets read) are computed once per
+    field and shared by every rule set. Returns one row per (field, rule set).
+    """
+    if key not in weather_df:
+        raise ValueError(f"Weather table must include a '{key}' column")
+    compiled = compile_rules(rules, rule_sets)
+    needed = aggregates_for(compiled)
+    rows = []
+    for field, g in weather_df.groupby(key, sort=True):
+        with _span('rules.aggregate'):
+            daily = daily_aggregates(g, **needed)
+        for rule_set, rule in compiled.items():
+            with _span('rules.evaluate'):
+                rs = evaluate_daily(daily, rule)
+            evidence = rs['details']['days_meeting_criteria']
+            rows.append({
+                key: field,
+                'rule_set': rule_set,
+                'days': len(daily),
+                'triggered': rs['triggered'],
+                'risk_label': rs.get('risk_label'),
+                'consecutive_true_max': rs['details']['consecutive_true_max'],
+                'required_consecutive_days': rs['details'].get('required_consecutive_days'),
+                'n_days_meeting_criteria': len(evidence),
+                'last_day_meeting_criteria': evidence[-1] if evidence else None,
+            })
+    return pd.DataFrame(rows, columns=[key, 'rule_set', 'days', 'triggered', 'risk_label', 'consecutive_true_max',
+                                       'required_consecutive_days', 'n_days_meeting_criteria', 'last_day_meeting_criteria']
+                        ).astype({'required_consecutive_days': 'Int64'})
 
-def eval_smith(daily: pd.DataFrame, p: Dict[str, Any]) -> Dict[str, Any]:
-    cond = (daily['min_temp_c'] >= p['min_temp_c']) & (daily['hours_rh_ge_90'] >= p['min_hours_per_day'])
-    best_run = _consecutive_true_days(cond.tolist(), p['consecutive_days'])
-    triggered = best_run >= p['consecutive_days']
-    evidence_days = daily.loc[cond, 'day'].dt.strftime('%Y-%m-%d').tolist()
-    return {
-        'rule': 'Smith',
-        'triggered': bool(triggered),
-        'details': {
-            'consecutive_true_max': int(best_run),
-            'required_consecutive_days': int(p['consecutive_days']),
-            'days_meeting_criteria': evidence_days,
-        }
-    }
+def _daily_series(daily: pd.DataFrame, rule: CompiledRule, risk_labels: List[str]) -> pd.DataFrame:
+    cond, runs = _rule_runs(daily, rule)
+    triggered, labels = rule.levels(runs)
+    # Days since the latest triggered day (daily_aggregates emits every calendar day, so positions are days)
+    pos = np.arange(len(runs))
+    last = np.maximum.accumulate(np.where(triggered, pos, -1)) if len(runs) else pos
+    since = pd.array(np.where(last >= 0, pos - last, 0), dtype='Int32')
+    since[last < 0] = pd.NA
+    return pd.DataFrame({
+        'rule_set': rule.name,
+        'day': daily['day'].to_numpy(),
+        'meets_criteria': cond,
+        'run_length': runs.astype(np.int32),
+        'triggered': triggered,
+        'risk_label': pd.Categorical(labels if labels is not None else [None] * len(runs), categories=risk_labels),
+        'days_since_trigger': since,
+    })
 
-def eval_local_andes(daily: pd.DataFrame, p: Dict[str, Any]) -> Dict[str, Any]:
-    # Day is positive if >= threshold RH hours AND mean temp during those hours >= min_temp_c
-    cond = (daily['hours_rh_ge_80'] >= p['min_hours_per_day']) & (daily['mean_temp_when_rh_ge_80'] >= p['min_temp_c'])
-    best_run = _consecutive_true_days(cond.tolist(), max(p['consecutive_days_high'], p['consecutive_days_mod']))
-    risk = 'Low'
-    if best_run >= p['consecutive_days_high']:
-        risk = 'High'
-    elif best_run >= p['consecutive_days_mod']:
-        risk = 'Moderate'
-    evidence_days = daily.loc[cond, 'day'].dt.strftime('%Y-%m-%d').tolist()
-    return {
-        'rule': 'LocalAndes',
-        'triggered': risk in ('Moderate','High'),
-        'risk_label': risk,
-        'details': {
-            'consecutive_true_max': int(best_run),
-            'days_meeting_criteria': evidence_days,
-            'thresholds': {
-                'rh_threshold': int(p['rh_threshold']),
-                'min_temp_c': float(p['min_temp_c']),
-                'min_hours_per_day': int(p['min_hours_per_day'])
-            }
-        }
-    }
+def risk_series(weather_df: pd.DataFrame, rules: Dict[str, Any], rule_sets: Optional[List[str]] = None,
+                key: Optional[str] = None) -> pd.DataFrame:
+    """
+    Day-by-day risk history: for every day and rule set, whether the day met the criteria,
+    the consecutive run ending that day, triggered/risk label as of that day and days since
+    the last triggered day (NA before the first trigger).
 
-def evaluate_rule_set(weather_df: pd.DataFrame, rules: Dict[str, Any], rule_set: str) -> Dict[str, Any]:
-    daily = daily_aggregates(weather_df)
-    out = {'rule_set': rule_set, 'days': len(daily)}
-    if rule_set == 'Hutton':
-        out['result'] = eval_hutton(daily, rules['Hutton'])
-    elif rule_set == 'Smith':
-        out['result'] = eval_smith(daily, rules['Smith'])
-    elif rule_set == 'LocalAndes':
-        out['result'] = eval_local_andes(daily, rules['LocalAndes'])
-    else:
-        raise ValueError(f'Unknown rule_set: {rule_set}')
-    return out
+    One linear pass per rule set; with `key`, one series per field of a long-format table.
+    Returns a long table (rule_set/risk_label as categoricals), one row per (field, rule set, day).
+    """
+    compiled = compile_rules(rules, rule_sets)
+    needed = aggregates_for(compiled)
+    # Label categories ordered low -> high across the tiered rule sets
+    risk_labels = list(dict.fromkeys(label for rule in compiled.values() for label in rule.labels))
+    if key is not None and key not in weather_df:
+        raise ValueError(f"Weather table must include a '{key}' column")
+    groups = weather_df.groupby(key, sort=True) if key is not None else [(None, weather_df)]
+    frames = []
+    for field, g in groups:
+        with _span('rules.aggregate'):
+            daily = daily_aggregates(g, **needed)
+        with _span('rules.evaluate'):
+            for rule in compiled.values():
+                frame = _daily_series(daily, rule, risk_labels)
+                frames.append(frame.assign(**{key: field}) if key is not None else frame)
+    columns = ([key] if key is not None else []) + SERIES_COLUMNS
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    table = pd.concat(frames, ignore_index=True)[columns]
+    table['rule_set'] = pd.Categorical(table['rule_set'], categories=list(compiled))
+    if key is not None:
+        table[key] = table[key].astype('category')
+    return table
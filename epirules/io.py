@@ -1,28 +1,186 @@
 from __future__ import annotations
+import re
+from typing import Iterable, Optional
+import numpy as np
 import pandas as pd
 
-def read_weather_csv(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
-    if 'timestamp' not in df or 'temp_c' not in df or 'rh' not in df:
-        raise ValueError("CSV must include 'timestamp', 'temp_c', 'rh' columns")
-    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, errors='coerce')
-    if df['timestamp'].isna().any():
+DEFAULT_RH_THRESHOLDS = (90, 80)
+DEFAULT_MEAN_TEMP_THRESHOLDS = (80,)
+# Plain per-day statistics daily_aggregates can add besides the RH-threshold columns
+DAILY_STATS = ('min_temp_c', 'max_temp_c', 'mean_temp_c', 'rain_mm', 'hours_observed')
+DEFAULT_STATS = ('min_temp_c',)
+NS_PER_DAY = 86_400_000_000_000
+NS_PER_HOUR = 3_600_000_000_000
+# A record stands for the time since the previous one, up to this many hours; longer gaps are missing data
+MAX_RECORD_HOURS = 1.0
+
+WEATHER_DTYPES = {'timestamp': str, 'temp_c': np.float64, 'rh': np.float64, 'rain_mm': np.float64}
+KEY_COLUMNS = ('field_id', 'station')  # identifiers stay strings ("007" is not 7)
+CHUNK_ROWS = 500_000
+# One fixed ISO-8601 layout: date, 'T' or ' ', HH:MM[:SS], then 'Z', '+HH:MM'/'+HHMM' or nothing (UTC)
+FIXED_TIMESTAMP_RE = re.compile(r'^(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2})?)(Z|[+-]\d{2}:?\d{2})?$')
+
+def hours_rh_col(threshold: float) -> str:
+    return f'hours_rh_ge_{threshold:g}'
+
+def mean_temp_col(threshold: float) -> str:
+    return f'mean_temp_when_rh_ge_{threshold:g}'
+
+def _fixed_layout_ns(values: np.ndarray) -> Optional[np.ndarray]:
+    # UTC ns for a column where every value has the first value's fixed layout; None otherwise
+    try:
+        raw = values.astype('S')
+    except (UnicodeEncodeError, ValueError, TypeError):
+        return None
+    width = raw.dtype.itemsize
+    m = FIXED_TIMESTAMP_RE.match(raw[0].decode('ascii'))
+    if m is None or (np.char.str_len(raw) != width).any():
+        return None
+    base_len, offset = len(m.group(1)), m.group(2)
+    try:
+        ns = raw.astype(f'S{base_len}').astype('datetime64[s]').astype('datetime64[ns]').astype(np.int64)
+    except ValueError:
+        return None
+    if not offset:
+        return ns
+    chars = raw.view(np.uint8).reshape(len(raw), width)[:, base_len:]
+    if offset == 'Z':
+        return ns if (chars[:, 0] == ord('Z')).all() else None
+    digits = chars[:, [1, 2, -2, -1]].astype(np.int64) - ord('0')
+    sign = np.where(chars[:, 0] == ord('-'), -1, 1)
+    if not (np.isin(chars[:, 0], (ord('+'), ord('-'))).all() and ((digits >= 0) & (digits <= 9)).all()):
+        return None
+    minutes = (digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 2] * 10 + digits[:, 3]
+    return ns - sign * minutes * 60_000_000_000
+
+def parse_timestamps(values) -> pd.DatetimeIndex:
+    """
+    UTC timestamps from ISO-8601 text; naive values are taken as UTC.
+
+    A column written in one fixed layout (e.g. '2025-03-10T00:00:00+00:00' or
+    '2025-03-10 00:00', every row alike) is parsed with numpy in a single vectorized
+    pass; anything else goes through pandas' general parser.
+    """
+    values = np.asarray(values, dtype=object)
+    ns = _fixed_layout_ns(values) if len(values) else None
+    if ns is not None:
+        return pd.DatetimeIndex(ns.view('datetime64[ns]')).tz_localize('UTC')
+    ts = pd.to_datetime(values, utc=True, errors='coerce', format='mixed')
+    if ts.isna().any():
         raise ValueError("Invalid timestamps in CSV")
-    # Coerce RH bounds
-    df['rh'] = df['rh'].clip(lower=0, upper=100)
-    # Normalize to hourly; if sub-hourly present, keep native freq
-    df = df.sort_values('timestamp').reset_index(drop=True)
-    return df
-
-def daily_aggregates(df: pd.DataFrame) -> pd.DataFrame:
-    # Compute daily stats needed for rules
-    g = df.set_index('timestamp').groupby(pd.Grouper(freq='D'))
-    agg = g.apply(lambda x: pd.Series({
-        'min_temp_c': x['temp_c'].min(),
-        'hours_rh_ge_90': (x['rh'] >= 90).sum(),
-        'hours_rh_ge_80': (x['rh'] >= 80).sum(),
-        'mean_temp_when_rh_ge_80': x.loc[x['rh'] >= 80, 'temp_c'].mean() if (x['rh'] >= 80).any() else float('nan'),
-        'n_records': len(x),
-    }))
-    agg.index = agg.index.tz_localize(None)  # strip tz for cleaner keys
-    return agg.reset_index().rename(columns={'timestamp':'day'})
+    return ts.as_unit('ns')
+
+def read_weather_csv(path: str, chunksize: int = CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Reads an hourly (or finer) weather CSV with timestamp, temp_c, rh and optional rain_mm.
+
+    Weather columns are read as float64 and key columns (field_id, station) as strings.
+    The file is read `chunksize` rows at a time, so the raw timestamp text of a large
+    station export is never held all at once. Records keep their native frequency;
+    daily_aggregates weighs each by the time it covers.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    if 'timestamp' not in header or 'temp_c' not in header or 'rh' not in header:
+        raise ValueError("CSV must include 'timestamp', 'temp_c', 'rh' columns")
+    dtype = {**WEATHER_DTYPES, **{c: str for c in KEY_COLUMNS}}
+    frames = []
+    for chunk in pd.read_csv(path, dtype={c: t for c, t in dtype.items() if c in header}, chunksize=chunksize):
+        chunk['timestamp'] = parse_timestamps(chunk['timestamp'])
+        # Coerce RH bounds
+        chunk['rh'] = chunk['rh'].clip(lower=0, upper=100)
+        frames.append(chunk)
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if not df['timestamp'].is_monotonic_increasing:
+        df = df.sort_values('timestamp', kind='stable')
+    return df.reset_index(drop=True)
+
+def record_hours(ts: pd.Series) -> np.ndarray:
+    """
+    Hours of observation each record stands for: the time since the previous record,
+    capped at MAX_RECORD_HOURS so a gap counts as missing data rather than one long
+    reading. The first record takes the series' first interval. Hourly records weigh 1,
+    10-minute records 1/6.
+    """
+    ns = ts.to_numpy(dtype='datetime64[ns]').astype(np.int64)  # UTC instants for tz-aware stamps
+    if len(ns) < 2:
+        return np.full(len(ns), MAX_RECORD_HOURS)
+    order = None if (np.diff(ns) >= 0).all() else np.argsort(ns, kind='stable')
+    step = np.diff(ns if order is None else ns[order]) / NS_PER_HOUR
+    hours = np.minimum(np.r_[step[0], step], MAX_RECORD_HOURS)
+    if order is None:
+        return hours
+    out = np.empty_like(hours)
+    out[order] = hours
+    return out
+
+def _day_codes(ts: pd.Series) -> tuple[np.ndarray, np.datetime64]:
+    # Wall-clock day index relative to the first day; tz-aware stamps keep their local day
+    if getattr(ts.dt, 'tz', None) is not None:
+        ts = ts.dt.tz_localize(None)
+    ns = ts.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    days = ns // NS_PER_DAY
+    first = days.min()
+    return (days - first).astype(np.intp), np.datetime64(int(first), 'D')
+
+def daily_aggregates(df: pd.DataFrame,
+                     rh_thresholds: Iterable[float] = DEFAULT_RH_THRESHOLDS,
+                     mean_temp_thresholds: Iterable[float] = DEFAULT_MEAN_TEMP_THRESHOLDS,
+                     stats: Iterable[str] = DEFAULT_STATS) -> pd.DataFrame:
+    # Compute daily stats needed for rules in one vectorized pass over the records.
+    # Every calendar day between the first and last record gets a row, as with pd.Grouper(freq='D').
+    # Hour counts and means are weighted by the hours each record covers (record_hours), so
+    # sub-hourly data is not over-counted; hours_observed is the day's coverage by records with
+    # both temp_c and rh, for telling a dry day from a day with missing data.
+    rh_thresholds = list(dict.fromkeys(rh_thresholds))
+    mean_temp_thresholds = list(dict.fromkeys(mean_temp_thresholds))
+    stats = set(stats)
+    if stats - set(DAILY_STATS):
+        raise ValueError(f"Unknown daily stats: {sorted(stats - set(DAILY_STATS))} (choose from {', '.join(DAILY_STATS)})")
+    stats = [s for s in DAILY_STATS if s in stats]
+    columns = (['day'] + stats + [hours_rh_col(t) for t in rh_thresholds]
+               + [mean_temp_col(t) for t in mean_temp_thresholds] + ['n_records'])
+    if df.empty:
+        return pd.DataFrame({c: pd.Series(dtype='datetime64[ns]' if c == 'day' else 'float64') for c in columns})
+
+    codes, first_day = _day_codes(df['timestamp'])
+    n_days = int(codes.max()) + 1
+    temp = df['temp_c'].to_numpy(dtype=np.float64)
+    rh = df['rh'].to_numpy(dtype=np.float64)
+    temp_ok = ~np.isnan(temp)
+    hours = record_hours(df['timestamp'])
+
+    out = {'day': first_day + np.arange(n_days)}
+    if 'min_temp_c' in stats:
+        min_temp = np.full(n_days, np.inf)
+        np.minimum.at(min_temp, codes[temp_ok], temp[temp_ok])
+        min_temp[np.isinf(min_temp)] = np.nan
+        out['min_temp_c'] = min_temp
+    if 'max_temp_c' in stats:
+        max_temp = np.full(n_days, -np.inf)
+        np.maximum.at(max_temp, codes[temp_ok], temp[temp_ok])
+        max_temp[np.isinf(max_temp)] = np.nan
+        out['max_temp_c'] = max_temp
+    if 'mean_temp_c' in stats:
+        total = np.bincount(codes[temp_ok], weights=(hours * temp)[temp_ok], minlength=n_days)
+        count = np.bincount(codes[temp_ok], weights=hours[temp_ok], minlength=n_days)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out['mean_temp_c'] = np.where(count > 0, total / count, np.nan)
+    if 'rain_mm' in stats:
+        rain = df['rain_mm'].to_numpy(dtype=np.float64) if 'rain_mm' in df else np.zeros(len(df))
+        out['rain_mm'] = np.bincount(codes, weights=np.nan_to_num(rain), minlength=n_days)
+    if 'hours_observed' in stats:
+        observed = temp_ok & ~np.isnan(rh)
+        out['hours_observed'] = np.bincount(codes[observed], weights=hours[observed], minlength=n_days)
+    for t in rh_thresholds:
+        out[hours_rh_col(t)] = np.bincount(codes, weights=hours * (rh >= t), minlength=n_days)
+    for t in mean_temp_thresholds:
+        sel = (rh >= t) & temp_ok
+        total = np.bincount(codes[sel], weights=(hours * temp)[sel], minlength=n_days)
+        count = np.bincount(codes[sel], weights=hours[sel], minlength=n_days)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[mean_temp_col(t)] = np.where(count > 0, total / count, np.nan)
+    out['n_records'] = np.bincount(codes, minlength=n_days).astype(np.float64)
+
+    agg = pd.DataFrame(out, columns=columns)
+    agg['day'] = agg['day'].astype(f'datetime64[{df["timestamp"].dt.unit}]')
+    return agg
@@ -0,0 +1,238 @@
+from __future__ import annotations
+import json, operator, re
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple, Callable
+import numpy as np
+from .io import DAILY_STATS, hours_rh_col, mean_temp_col
+
+# Compiles rule sets from rules.yaml into vectorized evaluators.
+#
+# A rule set is either a built-in kind (Hutton, Smith, LocalAndes; a set may reuse one under
+# its own name with `evaluator:`) or declarative:
+#
+#   EarlyBlight:
+#     days:                        # a day is positive when every condition holds
+#       - min_temp_c >= 13
+#       - hours_rh_ge_90 >= 10
+#     consecutive_days: 3          # triggered once 3 positive days in a row...
+#     # ...or risk tiers by run length (label for shorter runs: base_label, default Low)
+#     # tiers: {High: 3, Moderate: 1}
+#     min_hours_observed: 20       # optional, any rule set: a day with fewer observed hours that
+#                                  # fails the conditions neither extends nor breaks a run
+#
+# Condition columns are the daily aggregates: min_temp_c, max_temp_c, mean_temp_c, rain_mm,
+# hours_observed, n_records, hours_rh_ge_<RH> and mean_temp_when_rh_ge_<RH>.
+
+OPS = {'>=': operator.ge, '>': operator.gt, '<=': operator.le, '<': operator.lt, '==': operator.eq, '!=': operator.ne}
+CONDITION_RE = re.compile(r'^\s*([a-z_][a-z0-9_.]*)\s*(>=|<=|==|!=|>|<)\s*(-?\d+(?:\.\d+)?)\s*$')
+HOURS_RH_RE = re.compile(r'^hours_rh_ge_(\d+(?:\.\d+)?)$')
+MEAN_TEMP_RE = re.compile(r'^mean_temp_when_rh_ge_(\d+(?:\.\d+)?)$')
+BASE_LABEL = 'Low'
+
+@dataclass(frozen=True)
+class Condition:
+    column: str
+    op: str
+    value: float
+
+    def __call__(self, daily):
+        # Works on the daily DataFrame or on a single day's aggregates (dict of scalars); NaN never passes
+        return OPS[self.op](daily[self.column], self.value)
+
+    def __str__(self) -> str:
+        return f'{self.column} {self.op} {self.value:g}'
+
+@dataclass(frozen=True)
+class CompiledRule:
+    name: str
+    conditions: Tuple[Condition, ...]
+    consecutive_days: Optional[int] = None
+    tiers: Tuple[Tuple[str, int], ...] = ()  # (label, minimum run), highest tier first
+    base_label: str = BASE_LABEL
+    build: Optional[Callable[..., Dict[str, Any]]] = None  # (rule, best_run, evidence_days) -> result
+    min_hours_observed: Optional[float] = None
+
+    def day_flags(self, daily):
+        cond = self.conditions[0](daily)
+        for c in self.conditions[1:]:
+            cond = cond & c(daily)
+        return cond
+
+    def bridged(self, daily, cond):
+        # Days too incomplete to call negative (see min_hours_observed); None when the rule is strict
+        if self.min_hours_observed is None:
+            return None
+        return np.logical_and(np.logical_not(cond), daily['hours_observed'] < self.min_hours_observed)
+
+    def label_for(self, run: int) -> str:
+        for label, min_run in self.tiers:
+            if run >= min_run:
+                return label
+        return self.base_label
+
+    def levels(self, runs: np.ndarray):
+        # Per-day (triggered, risk label) from the current run length; trigger-style rules have no label
+        if not self.tiers:
+            return runs >= self.consecutive_days, None
+        labels = np.full(len(runs), self.base_label, dtype=object)
+        for label, min_run in reversed(self.tiers):
+            labels[runs >= min_run] = label
+        return labels != self.base_label, labels
+
+    @property
+    def labels(self) -> List[str]:
+        # Lowest to highest
+        return [self.base_label] + [label for label, _ in reversed(self.tiers)] if self.tiers else []
+
+    @property
+    def columns(self) -> List[str]:
+        return list(dict.fromkeys(c.column for c in self.conditions))
+
+    def result(self, best_run: int, evidence_days: List[str]) -> Dict[str, Any]:
+        return (self.build or declarative_result)(self, best_run, evidence_days)
+
+def hutton_result(best_run: int, evidence_days: List[str], p: Dict[str, Any], rule: str = 'Hutton') -> Dict[str, Any]:
+    triggered = best_run >= p['consecutive_days']
+    return {
+        'rule': rule,
+        'triggered': bool(triggered),
+        'details': {
+            'consecutive_true_max': int(best_run),
+            'required_consecutive_days': int(p['consecutive_days']),
+            'days_meeting_criteria': evidence_days,
+        }
+    }
+
+def local_andes_result(best_run: int, evidence_days: List[str], p: Dict[str, Any], rule: str = 'LocalAndes') -> Dict[str, Any]:
+    risk = 'Low'
+    if best_run >= p['consecutive_days_high']:
+        risk = 'High'
+    elif best_run >= p['consecutive_days_mod']:
+        risk = 'Moderate'
+    return {
+        'rule': rule,
+        'triggered': risk in ('Moderate','High'),
+        'risk_label': risk,
+        'details': {
+            'consecutive_true_max': int(best_run),
+            'days_meeting_criteria': evidence_days,
+            'thresholds': {
+                'rh_threshold': int(p['rh_threshold']),
+                'min_temp_c': float(p['min_temp_c']),
+                'min_hours_per_day': int(p['min_hours_per_day'])
+            }
+        }
+    }
+
+def declarative_result(rule: CompiledRule, best_run: int, evidence_days: List[str]) -> Dict[str, Any]:
+    details = {'consecutive_true_max': int(best_run)}
+    if rule.tiers:
+        label = rule.label_for(best_run)
+        out = {'rule': rule.name, 'triggered': label != rule.base_label, 'risk_label': label}
+        details['tiers'] = dict(rule.tiers)
+    else:
+        out = {'rule': rule.name, 'triggered': bool(best_run >= rule.consecutive_days)}
+        details['required_consecutive_days'] = int(rule.consecutive_days)
+    details['days_meeting_criteria'] = evidence_days
+    details['conditions'] = [str(c) for c in rule.conditions]
+    out['details'] = details
+    return out
+
+# --- Built-in kinds: parameters -> compiled rule ---
+def _hutton(name: str, p: Dict[str, Any]) -> CompiledRule:
+    # Hutton criteria; Smith uses the same day test with the legacy Smith Period thresholds
+    return CompiledRule(
+        name,
+        (Condition('min_temp_c', '>=', p['min_temp_c']),
+         Condition(hours_rh_col(p.get('rh_threshold', 90)), '>=', p['min_hours_per_day'])),
+        consecutive_days=int(p['consecutive_days']),
+        build=lambda rule, best_run, evidence: hutton_result(best_run, evidence, p, name))
+
+def _local_andes(name: str, p: Dict[str, Any]) -> CompiledRule:
+    # Day is positive if >= threshold RH hours AND mean temp during those hours >= min_temp_c
+    rh = p['rh_threshold']
+    return CompiledRule(
+        name,
+        (Condition(hours_rh_col(rh), '>=', p['min_hours_per_day']),
+         Condition(mean_temp_col(rh), '>=', p['min_temp_c'])),
+        tiers=(('High', int(p['consecutive_days_high'])), ('Moderate', int(p['consecutive_days_mod']))),
+        build=lambda rule, best_run, evidence: local_andes_result(best_run, evidence, p, name))
+
+BUILTIN_RULES = {
+    'Hutton': _hutton,
+    'Smith': _hutton,
+    'LocalAndes': _local_andes,
+}
+
+def _check_column(column: str, rule_set: str) -> None:
+    if column in DAILY_STATS or column == 'n_records' or HOURS_RH_RE.match(column) or MEAN_TEMP_RE.match(column):
+        return
+    raise ValueError(f"Rule set {rule_set}: unknown daily aggregate '{column}'")
+
+def parse_condition(text: str, rule_set: str = '?') -> Condition:
+    m = CONDITION_RE.match(str(text))
+    if not m:
+        raise ValueError(f"Rule set {rule_set}: cannot parse condition '{text}' (expected e.g. 'hours_rh_ge_90 >= 6')")
+    column, op, value = m.groups()
+    _check_column(column, rule_set)
+    return Condition(column, op, float(value))
+
+def _declarative(name: str, p: Dict[str, Any]) -> CompiledRule:
+    days = p['days']
+    if isinstance(days, str):
+        days = [days]
+    if not days:
+        raise ValueError(f'Rule set {name}: `days` needs at least one condition')
+    conditions = tuple(parse_condition(c, name) for c in days)
+    if 'tiers' in p:
+        tiers = tuple(sorted(((str(label), int(n)) for label, n in p['tiers'].items()), key=lambda t: -t[1]))
+        return CompiledRule(name, conditions, tiers=tiers, base_label=str(p.get('base_label', BASE_LABEL)))
+    if 'consecutive_days' in p:
+        return CompiledRule(name, conditions, consecutive_days=int(p['consecutive_days']))
+    raise ValueError(f'Rule set {name}: declare `consecutive_days` or `tiers`')
+
+def is_rule_set(rules: Dict[str, Any], name: str) -> bool:
+    p = rules.get(name)
+    return isinstance(p, dict) and ('days' in p or p.get('evaluator', name) in BUILTIN_RULES)
+
+def configured_rule_sets(rules: Dict[str, Any]) -> List[str]:
+    return [name for name in rules if is_rule_set(rules, name)]
+
+def compile_rule(rules: Dict[str, Any], rule_set: str) -> CompiledRule:
+    if not is_rule_set(rules, rule_set):
+        raise ValueError(f'Unknown rule_set: {rule_set}')
+    p = rules[rule_set]
+    rule = _declarative(rule_set, p) if 'days' in p else BUILTIN_RULES[p.get('evaluator', rule_set)](rule_set, p)
+    if p.get('min_hours_observed') is not None:
+        rule = replace(rule, min_hours_observed=float(p['min_hours_observed']))
+    return rule
+
+@lru_cache(maxsize=64)
+def _compile_cached(rules_json: str, rule_sets: Tuple[str, ...]) -> Dict[str, CompiledRule]:
+    rules = json.loads(rules_json)
+    return {rs: compile_rule(rules, rs) for rs in rule_sets}
+
+def compile_rules(rules: Dict[str, Any], rule_sets: Optional[List[str]] = None) -> Dict[str, CompiledRule]:
+    """
+    Compiles the given rule sets (default: every configured one), in order.
+    Compilation is cached per rules content, so repeated evaluations don't re-parse.
+    """
+    rule_sets = tuple(rule_sets) if rule_sets else tuple(configured_rule_sets(rules))
+    return dict(_compile_cached(json.dumps(rules, sort_keys=True, default=str), rule_sets))
+
+def aggregates_for(compiled: Dict[str, CompiledRule]) -> Dict[str, List]:
+    """daily_aggregates() arguments covering exactly the columns the compiled rules read."""
+    rh, mean_temp, stats = [], [], []
+    for rule in compiled.values():
+        for column in rule.columns:
+            if column in DAILY_STATS:
+                stats.append(column)
+            elif HOURS_RH_RE.match(column):
+                rh.append(float(HOURS_RH_RE.match(column).group(1)))
+            elif MEAN_TEMP_RE.match(column):
+                mean_temp.append(float(MEAN_TEMP_RE.match(column).group(1)))
+        if rule.min_hours_observed is not None:
+            stats.append('hours_observed')
+    return {'rh_thresholds': list(dict.fromkeys(rh)), 'mean_temp_thresholds': list(dict.fromkeys(mean_temp)),
+            'stats': list(dict.fromkeys(stats))}
@@ -0,0 +1,174 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Iterable
+import numpy as np
+import pandas as pd
+
+# One raw little-endian file per column, per station, per calendar month (UTC):
+#   <root>/<station>/<YYYY-MM>/<column>.bin
+# Files are append-only and read back with np.memmap, so slicing a date range
+# touches only the partitions (and pages) that overlap it.
+COLUMNS = {
+    'timestamp': np.dtype('<i8'),   # ns since epoch, UTC
+    'temp_c': np.dtype('<f4'),
+    'rh': np.dtype('<f4'),
+    'rain_mm': np.dtype('<f4'),
+}
+
+def _to_utc_ns(values) -> np.ndarray:
+    # Naive timestamps are taken as UTC, matching read_weather_csv
+    ts = pd.to_datetime(pd.Series(values), utc=True)
+    return ts.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+def _month_key(ns: np.ndarray) -> np.ndarray:
+    return ns.astype('datetime64[ns]').astype('datetime64[M]')
+
+class WeatherStore:
+    """
+    Typed, month-partitioned columnar store for hourly station/field weather.
+
+    Writes are append-only: records at or before the last stored timestamp of a
+    station are dropped, so re-fetching an overlapping window is safe.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _station_dir(self, station: str) -> Path:
+        if not station or os.sep in station or '/' in station or station.startswith('.'):
+            raise ValueError(f'Invalid station name: {station!r}')
+        return self.root / station
+
+    def stations(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def partitions(self, station: str) -> List[str]:
+        d = self._station_dir(station)
+        if not d.exists():
+            return []
+        return sorted(p.name for p in d.iterdir() if p.is_dir())
+
+    def _column(self, station: str, partition: str, column: str, n: Optional[int] = None) -> np.ndarray:
+        path = os.path.join(self._station_dir(station), partition, f'{column}.bin')
+        dtype = COLUMNS[column]
+        if n is None:
+            n = self._column_len(path, dtype)
+        if n == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(n,))
+
+    @staticmethod
+    def _column_len(path: str, dtype: np.dtype) -> int:
+        try:
+            return os.path.getsize(path) // dtype.itemsize
+        except FileNotFoundError:
+            return 0
+
+    def _partition_len(self, station: str, partition: str) -> int:
+        # Columns are appended one after another; a torn write leaves the shortest one authoritative
+        d = os.path.join(self._station_dir(station), partition)
+        return min(self._column_len(os.path.join(d, f'{c}.bin'), dtype) for c, dtype in COLUMNS.items())
+
+    def last_timestamp(self, station: str) -> Optional[pd.Timestamp]:
+        # Newest partition holding complete rows; a torn write can leave the newest one empty
+        for part in reversed(self.partitions(station)):
+            n = self._partition_len(station, part)
+            if n:
+                return pd.Timestamp(int(self._column(station, part, 'timestamp', n)[n - 1]), tz='UTC')
+        return None
+
+    # --- Writing ---
+    def append(self, station: str, weather_df: pd.DataFrame) -> int:
+        """Appends records newer than the station's last timestamp. Returns the number written."""
+        if weather_df.empty:
+            return 0
+        ns = _to_utc_ns(weather_df['timestamp'])
+        order = np.argsort(ns, kind='stable')
+        ns = ns[order]
+        last = self.last_timestamp(station)
+        keep = ns > (last.value if last is not None else np.iinfo(np.int64).min)
+        keep[1:] &= ns[1:] != ns[:-1]  # drop duplicate hours within the batch
+        if not keep.any():
+            return 0
+        cols = {'timestamp': ns[keep]}
+        for c in COLUMNS:
+            if c == 'timestamp':
+                continue
+            values = weather_df[c].to_numpy(dtype=np.float64)[order] if c in weather_df else np.full(len(ns), np.nan)
+            cols[c] = values[keep].astype(COLUMNS[c])
+
+        months = _month_key(cols['timestamp'])
+        bounds = np.flatnonzero(months[1:] != months[:-1]) + 1
+        for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(months)]):
+            part = self._station_dir(station) / str(months[start])
+            part.mkdir(parents=True, exist_ok=True)
+            self._truncate(part, self._partition_len(station, part.name))
+            # Timestamps last: until they land, a torn write leaves the new rows invisible to readers
+            for c in [c for c in cols if c != 'timestamp'] + ['timestamp']:
+                with open(part / f'{c}.bin', 'ab') as f:
+                    f.write(np.ascontiguousarray(cols[c][start:stop]).tobytes())
+        return int(keep.sum())
+
+    @staticmethod
+    def _truncate(part: Path, n: int) -> None:
+        # Drop rows a torn write left in some columns only, so appends stay aligned across columns
+        for c, dtype in COLUMNS.items():
+            path = part / f'{c}.bin'
+            if path.exists() and path.stat().st_size > n * dtype.itemsize:
+                os.truncate(path, n * dtype.itemsize)
+
+    # --- Reading ---
+    def arrays(self, station: str, start=None, end=None, columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Column arrays for [start, end) (either bound optional). Zero-copy memmap
+        views when the range falls in one partition.
+        """
+        columns = list(columns) if columns else list(COLUMNS)
+        if 'timestamp' not in columns:
+            columns = ['timestamp'] + columns
+        lo = _to_utc_ns([start])[0] if start is not None else None
+        hi = _to_utc_ns([end])[0] if end is not None else None
+        first_month = _month_key(np.array([lo]))[0] if lo is not None else None
+        last_month = _month_key(np.array([hi]))[0] if hi is not None else None
+
+        chunks: Dict[str, List[np.ndarray]] = {c: [] for c in columns}
+        for part in self.partitions(station):
+            month = np.datetime64(part, 'M')
+            if (first_month is not None and month < first_month) or (last_month is not None and month > last_month):
+                continue
+            n = self._partition_len(station, part)
+            if n == 0:
+                continue
+            ts = self._column(station, part, 'timestamp', n)
+            i = int(np.searchsorted(ts, lo, 'left')) if lo is not None else 0
+            j = int(np.searchsorted(ts, hi, 'left')) if hi is not None else n
+            if j <= i:
+                continue
+            for c in columns:
+                chunks[c].append(ts[i:j] if c == 'timestamp' else self._column(station, part, c, n)[i:j])
+        out = {}
+        for c in columns:
+            if not chunks[c]:
+                out[c] = np.empty(0, dtype=COLUMNS[c])
+            elif len(chunks[c]) == 1:
+                out[c] = chunks[c][0]
+            else:
+                out[c] = np.concatenate(chunks[c])
+        return out
+
+    def read(self, station: str, start=None, end=None, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Weather frame in the same shape as read_weather_csv (UTC timestamps, sorted)."""
+        arrs = self.arrays(station, start, end, columns)
+        df = pd.DataFrame({c: (np.asarray(v).astype(np.float64) if c != 'timestamp' else v) for c, v in arrs.items()})
+        df['timestamp'] = pd.Series(arrs['timestamp'].view('datetime64[ns]')).dt.tz_localize('UTC')
+        return df
+
+    def read_many(self, stations: Optional[Iterable[str]] = None, start=None, end=None, key: str = 'field_id') -> pd.DataFrame:
+        """Long-format frame (one series per station under `key`), as taken by evaluate_batch."""
+        frames = [self.read(s, start, end).assign(**{key: s}) for s in (stations or self.stations())]
+        if not frames:
+            return pd.DataFrame(columns=list(COLUMNS) + [key])
+        return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,228 @@
+from __future__ import annotations
+import hashlib, json, os
+from typing import Dict, Any, List, Optional
+import numpy as np
+import pandas as pd
+from .io import hours_rh_col, mean_temp_col, NS_PER_DAY, NS_PER_HOUR, MAX_RECORD_HOURS
+from .rules import compile_rules, aggregates_for
+
+STATE_VERSION = 4
+
+def _rules_fingerprint(rules: Dict[str, Any], rule_sets: List[str]) -> str:
+    # Only the parameters of the evaluated rule sets: editing another rule set keeps checkpoints valid
+    used = {rs: rules[rs] for rs in rule_sets}
+    return hashlib.sha256(json.dumps(used, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _day_str(day: int) -> str:
+    return str(np.datetime64(day, 'D'))
+
+class IncrementalEvaluator:
+    """
+    Stateful rule evaluation over an hourly feed.
+
+    Keeps, per field, the running aggregates of the current (open) day plus the
+    current/best consecutive-run counters of every rule over the closed days, so
+    appending new hours costs O(new records). `result()` returns the same shape
+    as `evaluate_rule_set` over the full history seen so far.
+
+    Records must arrive in time order per field: hours for the open day may be
+    appended in several batches, but a batch reaching back before the field's latest
+    record (or into an already closed day) is rejected.
+    """
+
+    def __init__(self, rules: Dict[str, Any], rule_sets: Optional[List[str]] = None, key: str = 'field_id'):
+        self.rules = rules
+        self.compiled = compile_rules(rules, rule_sets)
+        self.rule_sets = list(self.compiled)
+        needed = aggregates_for(self.compiled)
+        self.rh_thresholds = needed['rh_thresholds']
+        self.mean_temp_thresholds = needed['mean_temp_thresholds']
+        self.key = key
+        self.fields: Dict[str, Dict[str, Any]] = {}
+
+    # --- Feeding ---
+    def append(self, weather_df: pd.DataFrame, field_id: Optional[str] = None) -> List[str]:
+        """
+        Adds new hourly records. Pass `field_id` for a single-field frame, otherwise
+        the frame must carry the `key` column. Returns the field ids that were updated.
+        """
+        if weather_df.empty:
+            return []
+        if field_id is not None:
+            groups = [(field_id, weather_df)]
+        elif self.key in weather_df:
+            groups = weather_df.groupby(self.key, sort=False)
+        else:
+            raise ValueError(f"Weather frame must include a '{self.key}' column or pass field_id")
+        updated = []
+        for fid, g in groups:
+            self._append_field(str(fid), g)
+            updated.append(str(fid))
+        return updated
+
+    def _new_field(self, day: int) -> Dict[str, Any]:
+        return {
+            'first_day': day,
+            'last_ns': None,  # latest timestamp seen, for the hours the next record covers
+            'open': self._empty_day(day),
+            'runs': {rs: {'run': 0, 'best': 0, 'evidence': []} for rs in self.rule_sets},
+        }
+
+    def _empty_day(self, day: int) -> Dict[str, Any]:
+        return {
+            'day': day,
+            'min_temp_c': None,
+            'max_temp_c': None,
+            'temp_total': 0.0,
+            'temp_n': 0.0,
+            'rain_mm': 0.0,
+            'hours_observed': 0.0,
+            'hours': [0.0] * len(self.rh_thresholds),
+            'temp_sum': [0.0] * len(self.mean_temp_thresholds),
+            'temp_count': [0.0] * len(self.mean_temp_thresholds),
+            'n_records': 0,
+        }
+
+    def _append_field(self, fid: str, g: pd.DataFrame) -> None:
+        ts = g['timestamp']
+        if getattr(ts.dt, 'tz', None) is not None:
+            ts = ts.dt.tz_localize(None)
+        local = ts.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        order = np.argsort(local, kind='stable')
+        days = local[order] // NS_PER_DAY
+        temp = g['temp_c'].to_numpy(dtype=np.float64)[order]
+        rh = np.clip(g['rh'].to_numpy(dtype=np.float64)[order], 0, 100)
+        rain = np.nan_to_num(g['rain_mm'].to_numpy(dtype=np.float64)[order]) if 'rain_mm' in g else np.zeros(len(g))
+
+        state = self.fields.get(fid)
+        if state is None:
+            state = self.fields[fid] = self._new_field(int(days[0]))
+        if days[0] < state['open']['day']:
+            raise ValueError(f"Records for {fid} on {_day_str(int(days[0]))} arrive after that day was closed")
+        # Hours each record covers, as in io.record_hours: time since the previous record, capped
+        ns = g['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64)[order]
+        prev = state['last_ns']
+        if prev is not None and ns[0] < prev:
+            raise ValueError(f"Records for {fid} from {pd.Timestamp(int(ns[0]), tz='UTC')} arrive before "
+                             f"the latest record already seen ({pd.Timestamp(prev, tz='UTC')})")
+        if prev is None:
+            prev = ns[0] - (ns[1] - ns[0] if len(ns) > 1 else int(MAX_RECORD_HOURS * NS_PER_HOUR))
+        hours = np.minimum(np.diff(ns, prepend=prev) / NS_PER_HOUR, MAX_RECORD_HOURS)
+        state['last_ns'] = int(ns[-1])
+
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(days)]):
+            day = int(days[start])
+            while state['open']['day'] < day:
+                self._close_day(state)
+            self._merge(state['open'], temp[start:stop], rh[start:stop], rain[start:stop], hours[start:stop])
+
+    def _merge(self, acc: Dict[str, Any], temp: np.ndarray, rh: np.ndarray, rain: np.ndarray,
+               hours: np.ndarray) -> None:
+        valid = ~np.isnan(temp)
+        if valid.any():
+            lo, hi = float(temp[valid].min()), float(temp[valid].max())
+            acc['min_temp_c'] = lo if acc['min_temp_c'] is None else min(acc['min_temp_c'], lo)
+            acc['max_temp_c'] = hi if acc['max_temp_c'] is None else max(acc['max_temp_c'], hi)
+            acc['temp_total'] += float((hours * temp)[valid].sum())
+            acc['temp_n'] += float(hours[valid].sum())
+        acc['rain_mm'] += float(rain.sum())
+        acc['hours_observed'] += float(hours[valid & ~np.isnan(rh)].sum())
+        for i, t in enumerate(self.rh_thresholds):
+            acc['hours'][i] += float(hours[rh >= t].sum())
+        for i, t in enumerate(self.mean_temp_thresholds):
+            sel = (rh >= t) & valid
+            acc['temp_sum'][i] += float((hours * temp)[sel].sum())
+            acc['temp_count'][i] += float(hours[sel].sum())
+        acc['n_records'] += len(temp)
+
+    def _day_row(self, acc: Dict[str, Any]) -> Dict[str, float]:
+        temp_n = acc['temp_n']
+        row = {
+            'min_temp_c': np.nan if acc['min_temp_c'] is None else acc['min_temp_c'],
+            'max_temp_c': np.nan if acc['max_temp_c'] is None else acc['max_temp_c'],
+            'mean_temp_c': acc['temp_total'] / temp_n if temp_n else np.nan,
+            'rain_mm': acc['rain_mm'],
+            'hours_observed': acc['hours_observed'],
+            'n_records': acc['n_records'],
+        }
+        for i, t in enumerate(self.rh_thresholds):
+            row[hours_rh_col(t)] = acc['hours'][i]
+        for i, t in enumerate(self.mean_temp_thresholds):
+            count = acc['temp_count'][i]
+            row[mean_temp_col(t)] = acc['temp_sum'][i] / count if count else np.nan
+        return row
+
+    def _day_flags(self, acc: Dict[str, Any]) -> Dict[str, tuple]:
+        # Per rule set: (day meets the criteria, day is bridged as incomplete)
+        row = self._day_row(acc)
+        out = {}
+        for rs, rule in self.compiled.items():
+            flag = bool(rule.day_flags(row))
+            out[rs] = (flag, bool(rule.bridged(row, flag)))
+        return out
+
+    @staticmethod
+    def _next_run(run: int, flag: bool, bridged: bool) -> int:
+        return run + 1 if flag else (run if bridged else 0)
+
+    def _close_day(self, state: Dict[str, Any]) -> None:
+        acc = state['open']
+        for rs, (flag, bridged) in self._day_flags(acc).items():
+            r = state['runs'][rs]
+            r['run'] = self._next_run(r['run'], flag, bridged)
+            r['best'] = max(r['best'], r['run'])
+            if flag:
+                r['evidence'].append(_day_str(acc['day']))
+        state['open'] = self._empty_day(acc['day'] + 1)
+
+    # --- Reading ---
+    def result(self, field_id: str) -> Dict[str, Dict[str, Any]]:
+        """Current evaluation per rule set, counting the open day as it stands."""
+        state = self.fields[field_id]
+        acc = state['open']
+        flags = self._day_flags(acc)
+        out = {}
+        for rs in self.rule_sets:
+            r = state['runs'][rs]
+            flag, bridged = flags[rs]
+            run = self._next_run(r['run'], flag, bridged)
+            evidence = r['evidence'] + [_day_str(acc['day'])] if flag else list(r['evidence'])
+            out[rs] = {
+                'rule_set': rs,
+                'days': acc['day'] - state['first_day'] + 1,
+                'result': self.compiled[rs].result(max(r['best'], run), evidence),
+            }
+        return out
+
+    # --- Checkpointing ---
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            'version': STATE_VERSION,
+            'rules_fingerprint': _rules_fingerprint(self.rules, self.rule_sets),
+            'rule_sets': self.rule_sets,
+            'key': self.key,
+            'fields': self.fields,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], rules: Dict[str, Any]) -> 'IncrementalEvaluator':
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {state.get('version')}")
+        if any(rs not in rules for rs in state['rule_sets']) or \
+                state['rules_fingerprint'] != _rules_fingerprint(rules, state['rule_sets']):
+            raise ValueError('Checkpoint was written with different rules; replay the history instead')
+        ev = cls(rules, state['rule_sets'], state['key'])
+        ev.fields = state['fields']
+        return ev
+
+    def save(self, path: str) -> None:
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.to_state(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, rules: Dict[str, Any]) -> 'IncrementalEvaluator':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_state(json.load(f), rules)
@@ -1,12 +1,38 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 from datetime import datetime
+from epirules.store import WeatherStore
+from metrics import span, propagate
 
-def fetch_open_meteo_data(latitude, longitude, start_date, end_date):
+WEATHER_STORE_PATH = "weather_store"
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+VISUAL_CROSSING_URL = "https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline"
+
+# Per-provider limits for bulk fetching: at most this many requests in flight at once
+PROVIDER_CONCURRENCY = {"open_meteo": 8, "visual_crossing": 4}
+# Jobs whose coordinates round to the same cell share one request (~11 km, about the Open-Meteo model grid)
+GRID_DEGREES = 0.1
+REQUEST_TIMEOUT_S = 10
+
+def make_session(pool_size=10):
+    """
+    Returns a requests.Session with a connection pool sized for `pool_size` concurrent requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_open_meteo_data(latitude, longitude, start_date, end_date, session=None, timeout=None, verbose=True):
     """
     Fetches hourly weather data from Open-Meteo and returns a clean DataFrame.
     """
-    API_URL = "https://api.open-meteo.com/v1/forecast"
+    API_URL = OPEN_METEO_URL
     params = {
         "latitude": latitude,
         "longitude": longitude,
@@ -15,11 +41,14 @@ def fetch_open_meteo_data(latitude, longitude, start_date, end_date):
         "hourly": "temperature_2m,relative_humidity_2m,precipitation",
         "timezone": "auto"
     }
-    print("Fetching data from Open-Meteo...")
-    response = requests.get(API_URL, params=params)
-    response.raise_for_status()
-    data = response.json()
-    print("Data fetched successfully!")
+    if verbose:
+        print("Fetching data from Open-Meteo...")
+    with span("http.open_meteo"):
+        response = (session or requests).get(API_URL, params=params, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+    if verbose:
+        print("Data fetched successfully!")
     hourly_data = data['hourly']
     df = pd.DataFrame(hourly_data)
     df = df.rename(columns={
@@ -31,27 +60,31 @@ def fetch_open_meteo_data(latitude, longitude, start_date, end_date):
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     return df
 
-def fetch_visual_crossing_data(latitude, longitude, start_date, end_date, api_key):
+def fetch_visual_crossing_data(latitude, longitude, start_date, end_date, api_key, session=None, timeout=None, verbose=True):
     """
     Fetches hourly weather data from Visual Crossing as a backup.
     """
-    API_URL = f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{latitude},{longitude}/{start_date}/{end_date}"
+    API_URL = f"{VISUAL_CROSSING_URL}/{latitude},{longitude}/{start_date}/{end_date}"
     params = {
         "unitGroup": "metric",
         "include": "hours",
         "key": api_key,
         "contentType": "json"
     }
-    print("Fetching data from Visual Crossing (backup)...")
-    response = requests.get(API_URL, params=params)
-    response.raise_for_status()
-    data = response.json()
-    print("Data fetched successfully from backup!")
+    if verbose:
+        print("Fetching data from Visual Crossing (backup)...")
+    with span("http.visual_crossing"):
+        response = (session or requests).get(API_URL, params=params, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+    if verbose:
+        print("Data fetched successfully from backup!")
     all_hours = []
     for day in data['days']:
-        all_hours.extend(day['hours'])
+        # Hours carry only a time of day; stamp each with its own date
+        all_hours.extend({**hour, 'datetime': f"{day['datetime']} {hour['datetime']}"} for hour in day['hours'])
     df = pd.DataFrame(all_hours)
-    df['timestamp'] = pd.to_datetime(data['days'][0]['datetime'] + ' ' + df['datetime'])
+    df['timestamp'] = pd.to_datetime(df['datetime'])
     df = df.rename(columns={
         "temp": "temp_c",
         "humidity": "rh",
@@ -59,22 +92,106 @@ def fetch_visual_crossing_data(latitude, longitude, start_date, end_date, api_ke
     })
     return df[['timestamp', 'temp_c', 'rh', 'rain_mm']]
 
-def get_weather_data(latitude, longitude, start_date, end_date, vc_api_key):
+def get_weather_data(latitude, longitude, start_date, end_date, vc_api_key, timeout=REQUEST_TIMEOUT_S, cache=None):
     """
     Tries to fetch data from the primary source, failing over to the backup.
+    With a weather_cache.WeatherCache, cached days are reused and only missing/stale ones are fetched.
     """
     try:
         print("--- Attempting Primary API (Open-Meteo) ---")
-        weather_df = fetch_open_meteo_data(latitude, longitude, start_date, end_date)
+        weather_df = _through_cache(cache, "open_meteo",
+                                    lambda la, lo, s, e: fetch_open_meteo_data(la, lo, s, e, timeout=timeout),
+                                    latitude, longitude, start_date, end_date)
         if weather_df is not None:
             return weather_df
     except Exception as e:
         print(f"Primary API failed: {e}. Trying backup.")
     
     print("\n--- Attempting Backup API (Visual Crossing) ---")
-    weather_df = fetch_visual_crossing_data(latitude, longitude, start_date, end_date, vc_api_key)
+    weather_df = _through_cache(cache, "visual_crossing",
+                                lambda la, lo, s, e: fetch_visual_crossing_data(la, lo, s, e, vc_api_key, timeout=timeout),
+                                latitude, longitude, start_date, end_date)
     return weather_df
 
+def _grid_key(latitude, longitude, start_date, end_date, grid):
+    # Snap to the centre of the grid cell so every job in the cell requests the same point
+    lat = round(round(latitude / grid) * grid, 4)
+    lon = round(round(longitude / grid) * grid, 4)
+    return (lat, lon, str(start_date), str(end_date))
+
+def _through_cache(cache, provider, fetch_fn, latitude, longitude, start_date, end_date):
+    if cache is None:
+        return fetch_fn(latitude, longitude, start_date, end_date)
+    return cache.get_range(provider, fetch_fn, latitude, longitude, start_date, end_date)
+
+def fetch_weather_bulk(jobs, vc_api_key=None, grid=GRID_DEGREES, timeout=REQUEST_TIMEOUT_S, concurrency=None, cache=None):
+    """
+    Fetches hourly weather for many (latitude, longitude, start_date, end_date) jobs concurrently.
+
+    Jobs that fall in the same grid cell and date range are coalesced into one request.
+    Each request tries Open-Meteo first and fails over to Visual Crossing on its own,
+    with at most `concurrency[provider]` requests in flight per provider over pooled sessions.
+
+    Args:
+        jobs: Iterable of (latitude, longitude, start_date, end_date) tuples.
+        vc_api_key: Visual Crossing key; without it there is no failover.
+        grid: Cell size in degrees used to coalesce nearby coordinates (0 disables coalescing).
+        timeout: Per-request timeout in seconds.
+        concurrency: Optional overrides for PROVIDER_CONCURRENCY.
+        cache: Optional weather_cache.WeatherCache; only missing or stale days are requested.
+
+    Returns:
+        A list aligned with `jobs`: a DataFrame per job, or None if both providers failed.
+    """
+    jobs = list(jobs)
+    limits = {**PROVIDER_CONCURRENCY, **(concurrency or {})}
+    sessions = {name: make_session(limit) for name, limit in limits.items()}
+    slots = {name: threading.BoundedSemaphore(limit) for name, limit in limits.items()}
+
+    keys = [_grid_key(*job, grid) if grid else (job[0], job[1], str(job[2]), str(job[3])) for job in jobs]
+    unique = list(dict.fromkeys(keys))
+
+    def fetch_one(key):
+        lat, lon, start_date, end_date = key
+        try:
+            def primary(la, lo, s, e):
+                with slots["open_meteo"]:
+                    return fetch_open_meteo_data(la, lo, s, e, session=sessions["open_meteo"], timeout=timeout, verbose=False)
+            return _through_cache(cache, "open_meteo", primary, lat, lon, start_date, end_date)
+        except Exception as e:
+            if not vc_api_key:
+                print(f"Open-Meteo failed for {key}: {e}. No backup key configured.")
+                return None
+            print(f"Open-Meteo failed for {key}: {e}. Trying backup.")
+        try:
+            def backup(la, lo, s, e):
+                with slots["visual_crossing"]:
+                    return fetch_visual_crossing_data(la, lo, s, e, vc_api_key, session=sessions["visual_crossing"],
+                                                      timeout=timeout, verbose=False)
+            return _through_cache(cache, "visual_crossing", backup, lat, lon, start_date, end_date)
+        except Exception as e:
+            print(f"Visual Crossing failed for {key}: {e}")
+            return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, sum(limits.values()))) as pool:
+            results = dict(zip(unique, pool.map(propagate(fetch_one), unique)))
+    finally:
+        for session in sessions.values():
+            session.close()
+    print(f"Fetched {len(jobs)} weather jobs with {len(unique)} requests "
+          f"({sum(r is None for r in results.values())} failed).")
+    return [results[k].copy() if results[k] is not None else None for k in keys]
+
+def store_weather_data(weather_df, station, store_path=WEATHER_STORE_PATH):
+    """
+    Appends fetched hours to the columnar weather store for a station/field.
+    Hours already in the store are skipped, so overlapping fetches are safe.
+    """
+    written = WeatherStore(store_path).append(station, weather_df)
+    print(f"Stored {written} new hourly records for '{station}' in '{store_path}'")
+    return written
+
 # --- Main part of the script ---
 if __name__ == "__main__":
     # Location: Summerside, PEI
@@ -96,5 +213,6 @@ if __name__ == "__main__":
         output_filename = "summerside_weather_failover.csv"
         weather_df.to_csv(output_filename, index=False)
         print(f"\nData saved to '{output_filename}'")
+        store_weather_data(weather_df, "summerside")
     else:
         print("\nCould not fetch weather data from any source.")
\ No newline at end of file
@@ -1,36 +1,295 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
 import pandas as pd
-from datetime import datetime
 
-# Load the entire CSV into a pandas DataFrame when the script starts.
-# This is efficient as we only read the file from disk once.
-try:
-    FARM_DATA = pd.read_csv("farm_data.csv")
-except FileNotFoundError:
-    print("Error: farm_data.csv not found. Please ensure it's in the correct directory.")
-    FARM_DATA = None
+# A .csv path uses the in-memory indexed CSV store; a .sqlite/.db path uses SQLiteFieldStore.
+FARM_DATA_PATH = "farm_data.csv"
+
+# Columns with a secondary index (value -> fields), when present in the table
+INDEXED_COLUMNS = ("farm_name", "potato_variety", "is_organic_compliant")
+# How often (seconds) a lookup re-checks the CSV for changes on disk
+REFRESH_INTERVAL_S = 5.0
+
+def _clean(value):
+    # numpy/pandas scalars -> plain Python values (NaN -> None) so records serialize cleanly
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+def _spray_window(min_days_since_spray, max_days_since_spray, today):
+    # days_since_spray in [min, max]  <=>  last_spray in [today - max, today - min]
+    today = today or date.today()
+    earliest = today - timedelta(days=max_days_since_spray) if max_days_since_spray is not None else None
+    latest = today - timedelta(days=min_days_since_spray) if min_days_since_spray is not None else None
+    return earliest, latest
+
+def days_since_spray(record: dict, today=None):
+    """Whole days between the field's last spray and `today` (default: now), or None if never sprayed."""
+    if record.get("last_spray") is None:
+        return None
+    return ((today or date.today()) - record["last_spray"]).days
+
+class _FieldTable:
+    """One loaded version of the CSV and its indexes. Never mutated once built."""
+
+    def __init__(self, signature, frame=None, records=(), by_id=None, indexes=None,
+                 spray_days=np.empty(0, dtype=np.int64), spray_order=np.empty(0, dtype=np.intp)):
+        self.signature = signature
+        self.frame = frame
+        self.records = records
+        self.by_id = by_id or {}
+        self.indexes = indexes or {}
+        self.spray_days = spray_days
+        self.spray_order = spray_order
+
+def _load_table(path, signature):
+    frame = pd.read_csv(path, dtype={"field_id": str})
+    spray = pd.to_datetime(frame["last_spray_date"], format="%Y-%m-%d", errors="coerce") \
+        if "last_spray_date" in frame else pd.Series(pd.NaT, index=frame.index)
+    records = []
+    for row, when in zip(frame.to_dict("records"), spray):
+        record = {k: _clean(v) for k, v in row.items()}
+        record["last_spray"] = None if pd.isna(when) else when.date()
+        records.append(record)
+    by_id = {r["field_id"]: i for i, r in enumerate(records)}
+    indexes = {}
+    for column in INDEXED_COLUMNS:
+        if column in frame:
+            index = indexes[column] = {}
+            for i, r in enumerate(records):
+                index.setdefault(r[column], []).append(i)
+    has_spray = np.flatnonzero(spray.notna().to_numpy())
+    spray_days = spray.to_numpy(dtype="datetime64[D]").astype(np.int64)[has_spray]
+    order = np.argsort(spray_days, kind="stable")
+    frame = frame.assign(last_spray_date=spray) if "last_spray_date" in frame else frame
+    return _FieldTable(signature, frame, records, by_id, indexes, spray_days[order], has_spray[order])
+
+class FieldStore:
+    """
+    Field table loaded from a CSV with a hash index on field_id, secondary indexes on
+    INDEXED_COLUMNS and a sorted last-spray-date index for days-since-spray ranges.
+
+    Records keep the CSV's columns and add `last_spray` (a datetime.date).
+    The CSV is reloaded automatically when it changes on disk (checked at most every
+    `refresh_interval_s` seconds). A reload builds a new table and swaps it in whole,
+    so concurrent lookups see either the old rows or the new ones, never a mix.
+    """
+
+    def __init__(self, path=FARM_DATA_PATH, refresh_interval_s=REFRESH_INTERVAL_S):
+        self.path = path
+        self.refresh_interval_s = refresh_interval_s
+        self._table = _FieldTable(None)
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.refresh_if_changed()
+
+    @property
+    def frame(self):
+        return self._table.frame
+
+    def refresh_if_changed(self):
+        """Reloads the CSV if it changed on disk and the last check is older than refresh_interval_s."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.refresh_interval_s:
+            return self._table
+        with self._lock:
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                if self._table.signature is not False:
+                    print(f"Error: {self.path} not found. Please ensure it's in the correct directory.")
+                    self._table = _FieldTable(False)
+                return self._table
+            signature = (st.st_mtime_ns, st.st_size)
+            if signature != self._table.signature:
+                self._table = _load_table(self.path, signature)
+            return self._table
+
+    # --- Lookups ---
+    def get(self, field_id):
+        table = self.refresh_if_changed()
+        i = table.by_id.get(field_id)
+        return dict(table.records[i]) if i is not None else None
+
+    def get_many(self, field_ids):
+        table = self.refresh_if_changed()
+        return {fid: (dict(table.records[table.by_id[fid]]) if fid in table.by_id else None) for fid in field_ids}
+
+    def find(self, farm=None, variety=None, organic=None, min_days_since_spray=None, max_days_since_spray=None, today=None):
+        table = self.refresh_if_changed()
+        selected = None
+        for column, value in (("farm_name", farm), ("potato_variety", variety), ("is_organic_compliant", organic)):
+            if value is None:
+                continue
+            hits = set(table.indexes.get(column, {}).get(value, ()))
+            selected = hits if selected is None else selected & hits
+        if min_days_since_spray is not None or max_days_since_spray is not None:
+            earliest, latest = _spray_window(min_days_since_spray, max_days_since_spray, today)
+            lo = np.searchsorted(table.spray_days, np.datetime64(earliest, "D").astype(np.int64), "left") if earliest else 0
+            hi = np.searchsorted(table.spray_days, np.datetime64(latest, "D").astype(np.int64), "right") if latest else len(table.spray_days)
+            hits = set(table.spray_order[lo:hi].tolist())
+            selected = hits if selected is None else selected & hits
+        positions = range(len(table.records)) if selected is None else sorted(selected)
+        return [dict(table.records[i]) for i in positions]
+
+class SQLiteFieldStore:
+    """
+    Same interface as FieldStore, backed by a local SQLite table (`fields`) with
+    indexes on field_id, INDEXED_COLUMNS and last_spray_date.
+
+    Lookups always query the live database. `frame` is built from the table on
+    first use and rebuilt after another connection commits a change.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._frame = None
+        self._data_version = None
+
+    @classmethod
+    def from_csv(cls, csv_path, path):
+        """Creates (or replaces) the SQLite store from a farm_data CSV."""
+        frame = pd.read_csv(csv_path, dtype={"field_id": str})
+        with sqlite3.connect(path) as db:
+            frame.to_sql("fields", db, if_exists="replace", index=False)
+            db.execute("CREATE UNIQUE INDEX IF NOT EXISTS fields_id ON fields (field_id)")
+            for column in (*INDEXED_COLUMNS, "last_spray_date"):
+                if column in frame:
+                    db.execute(f"CREATE INDEX IF NOT EXISTS fields_{column} ON fields ({column})")
+        return cls(path)
+
+    @property
+    def frame(self):
+        self.refresh_if_changed()
+        with self._lock:
+            if self._frame is None:
+                self._frame = self._load_frame()
+            return self._frame
+
+    def refresh_if_changed(self):
+        """Drops the cached frame if another connection committed to the database since it was built."""
+        with self._lock:
+            version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._data_version = version
+                self._frame = None
+
+    def _load_frame(self):
+        try:
+            frame = pd.read_sql_query("SELECT * FROM fields ORDER BY rowid", self._db, dtype={"field_id": str})
+        except pd.errors.DatabaseError:
+            print(f"Error: no fields table in {self.path}.")
+            return None
+        if "is_organic_compliant" in frame and frame["is_organic_compliant"].notna().all():
+            frame["is_organic_compliant"] = frame["is_organic_compliant"].astype(bool)
+        if "last_spray_date" in frame:
+            frame["last_spray_date"] = pd.to_datetime(frame["last_spray_date"], format="%Y-%m-%d", errors="coerce")
+        return frame
+
+    def _record(self, row):
+        record = dict(row)
+        if "is_organic_compliant" in record and record["is_organic_compliant"] is not None:
+            record["is_organic_compliant"] = bool(record["is_organic_compliant"])
+        spray = record.get("last_spray_date")
+        record["last_spray"] = datetime.strptime(spray, "%Y-%m-%d").date() if spray else None
+        return record
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [self._record(r) for r in self._db.execute(sql, params).fetchall()]
+
+    def get(self, field_id):
+        rows = self._query("SELECT * FROM fields WHERE field_id = ?", (field_id,))
+        return rows[0] if rows else None
+
+    def get_many(self, field_ids):
+        field_ids = list(field_ids)
+        found = {}
+        for start in range(0, len(field_ids), 500):  # stay under SQLite's bound-parameter limit
+            chunk = field_ids[start:start + 500]
+            for r in self._query(f"SELECT * FROM fields WHERE field_id IN ({','.join('?' * len(chunk))})", chunk):
+                found[r["field_id"]] = r
+        return {fid: found.get(fid) for fid in field_ids}
+
+    def find(self, farm=None, variety=None, organic=None, min_days_since_spray=None, max_days_since_spray=None, today=None):
+        where, params = [], []
+        for column, value in (("farm_name", farm), ("potato_variety", variety), ("is_organic_compliant", organic)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(int(value) if isinstance(value, bool) else value)
+        earliest, latest = _spray_window(min_days_since_spray, max_days_since_spray, today)
+        if earliest:
+            where.append("last_spray_date >= ?")
+            params.append(earliest.isoformat())
+        if latest:
+            where.append("last_spray_date <= ?")
+            params.append(latest.isoformat())
+        sql = "SELECT * FROM fields" + (f" WHERE {' AND '.join(where)}" if where else "") + " ORDER BY rowid"
+        return self._query(sql, params)
+
+_STORE = None
+
+def get_field_store():
+    """
+    Returns the shared field store for FARM_DATA_PATH, opening it on first use.
+    """
+    global _STORE
+    if _STORE is None or _STORE.path != FARM_DATA_PATH:
+        if str(FARM_DATA_PATH).endswith((".sqlite", ".db")):
+            _STORE = SQLiteFieldStore(FARM_DATA_PATH)
+        else:
+            _STORE = FieldStore(FARM_DATA_PATH)
+    return _STORE
+
+def get_farm_data():
+    """
+    Returns the field table as a DataFrame (typed last_spray_date), or None if it is missing.
+    """
+    store = get_field_store()
+    store.refresh_if_changed()
+    return store.frame
 
 def query_field_details(field_id: str) -> dict:
     """
-    Finds and returns the details for a specific field_id from the CSV.
-    
+    Finds and returns the details for a specific field_id.
+
     Args:
         field_id: The unique identifier for the field (e.g., "FIELD_001").
 
     Returns:
-        A dictionary containing the field's details, or None if not found.
+        A dictionary containing the field's details (plus `last_spray` as a date),
+        or None if not found.
     """
-    if FARM_DATA is None:
-        return None
-        
-    # Find the row that matches the field_id
-    field_record = FARM_DATA[FARM_DATA['field_id'] == field_id]
-    
-    # If we found a record, convert it to a dictionary and return it
-    if not field_record.empty:
-        return field_record.to_dict('records')[0]
-    
-    # Otherwise, return None
-    return None
+    return get_field_store().get(field_id)
+
+def query_fields(field_ids) -> dict:
+    """
+    Bulk lookup: returns {field_id: details or None} for every requested id.
+    """
+    return get_field_store().get_many(field_ids)
+
+def find_fields(farm=None, variety=None, organic=None, min_days_since_spray=None, max_days_since_spray=None, today=None) -> list:
+    """
+    Returns the details of every field matching all the given filters.
+
+    Args:
+        farm: Exact farm_name.
+        variety: Exact potato_variety.
+        organic: True/False for is_organic_compliant.
+        min_days_since_spray, max_days_since_spray: Inclusive range of days since last_spray_date.
+        today: Reference date for the spray range (default: today).
+    """
+    return get_field_store().find(farm, variety, organic, min_days_since_spray, max_days_since_spray, today)
 
 # --- Main part of the script to demonstrate its use ---
 if __name__ == "__main__":
@@ -39,12 +298,9 @@ if __name__ == "__main__":
     details_002 = query_field_details("FIELD_002")
     if details_002:
         # Calculate days since last spray for context
-        last_spray = datetime.strptime(details_002['last_spray_date'], '%Y-%m-%d')
-        days_since_spray = (datetime.now() - last_spray).days
-        
         print(f"Found details: {details_002}")
         print(f"Potato Variety: {details_002['potato_variety']}")
-        print(f"Days since last spray: {days_since_spray}")
+        print(f"Days since last spray: {days_since_spray(details_002)}")
     else:
         print("Field ID FIELD_002 not found.")
 
@@ -56,4 +312,11 @@ if __name__ == "__main__":
     if details_999:
         print(f"Found details: {details_999}")
     else:
-        print("Field ID FIELD_999 not found.")
\ No newline at end of file
+        print("Field ID FIELD_999 not found.")
+
+    print("\n" + "-"*30 + "\n")
+
+    # Example 3: Organic fields on one farm
+    print("--- Organic fields at Green Valley ---")
+    for field in find_fields(farm="Green Valley", organic=True):
+        print(f"  {field['field_id']}: {field['potato_variety']}")
@@ -1,34 +1,446 @@
+import bisect
+import functools
+import hashlib
+import math
 import os
+import pickle
+import re
+import threading
+import time
 from pathlib import Path
+import numpy as np
+from literature_vectors import embed_texts, IVFIndex, EMBEDDING_DIM
+from metrics import span
 
 # NOTE: The folder is named "Literature" with a capital L in your directory
 LITERATURE_PATH = Path("Literature")
+# Persistent chunk index; rebuilt incrementally when files under LITERATURE_PATH change
+INDEX_PATH = Path("literature_index.pkl")
+# How often (seconds) a query re-checks the folder for added/changed/removed files
+REFRESH_INTERVAL_S = 5.0
 
-def search_literature(query: str) -> list:
+# Weight of the vector similarity in "hybrid" mode (the rest goes to normalized BM25)
+HYBRID_ALPHA = 0.5
+SEARCH_MODES = ("lexical", "semantic", "hybrid")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+TOKEN_RE = re.compile(r"[^\W_]+")  # words; "late_blight" -> "late", "blight"
+SPLIT_RE = re.compile(r"([^\W_]+)")  # [gap, word, gap, word, ..., gap]
+# Bumped when the pickled layout changes; an older index file is rebuilt from the folder
+INDEX_VERSION = 2
+# Query words ("blight" -> blight, blighted, ...) whose matching terms are remembered per index
+EXPANSION_CACHE_SIZE = 1024
+
+def tokenize(text: str) -> list:
+    return TOKEN_RE.findall(text.lower())
+
+class LiteratureIndex:
+    """
+    Positional index over the paragraph chunks of the literature .txt files, ranked with BM25.
+
+    Files are tracked by mtime/size and content hash, so a refresh only
+    re-reads and re-indexes files that actually changed. Each chunk is stored as
+    term ids plus the text between them, so phrase and substring queries are
+    answered from the index without rescanning chunk text. Each chunk is also
+    embedded once, at index time, into a row of `vectors` for semantic search.
+    """
+
+    def __init__(self, folder=LITERATURE_PATH):
+        self.version = INDEX_VERSION
+        self.folder = Path(folder)
+        self.files = {}       # file name -> {"mtime", "size", "hash", "chunk_ids"}
+        self.chunks = {}      # chunk id -> {"citation", "content", "terms", "gaps"}
+        self.term_ids = {}    # lowercased word -> term id (ids are never reused)
+        self.gap_ids = {"": 0}  # lowercased text between words -> gap id
+        self.next_id = 0
+        self.last_refresh = 0.0
+        self.vector_ids = []  # chunk id of each row in `vectors`
+        self.vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._ann = None
+        self._arrays = _IndexArrays(self)
+
+    # --- Building ---
+    def refresh(self) -> bool:
+        """Re-indexes added/changed files and drops removed ones. Returns True if anything changed."""
+        changed = False
+        seen = set()
+        added = []
+        for file_path in sorted(self.folder.glob("*.txt")):
+            name = file_path.name
+            seen.add(name)
+            st = file_path.stat()
+            known = self.files.get(name)
+            if known and known["mtime"] == st.st_mtime and known["size"] == st.st_size:
+                continue
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+            if known and known["hash"] == digest:
+                known.update(mtime=st.st_mtime, size=st.st_size)
+                continue
+            if known:
+                self._remove_file(name)
+            added.extend(self._add_file(name, content, st, digest))
+            changed = True
+        for name in set(self.files) - seen:
+            self._remove_file(name)
+            changed = True
+        if changed:
+            self._update_vectors(added)
+            self._arrays = _IndexArrays(self)
+        self.last_refresh = time.monotonic()
+        return changed
+
+    def needs_refresh(self) -> bool:
+        """True if a file was added, removed or touched since the last refresh (stats only, no reads)."""
+        seen = set()
+        for file_path in self.folder.glob("*.txt"):
+            st = file_path.stat()
+            known = self.files.get(file_path.name)
+            if not known or known["mtime"] != st.st_mtime or known["size"] != st.st_size:
+                return True
+            seen.add(file_path.name)
+        return seen != set(self.files)
+
+    def copy(self) -> "LiteratureIndex":
+        """A copy that can be refreshed while searches keep reading this one (chunks are never mutated)."""
+        other = LiteratureIndex(self.folder)
+        other.__dict__.update(self.__dict__)
+        other.files = {name: dict(info) for name, info in self.files.items()}
+        other.chunks = dict(self.chunks)
+        other.term_ids = dict(self.term_ids)
+        other.gap_ids = dict(self.gap_ids)
+        other.vector_ids = list(self.vector_ids)
+        return other
+
+    def _add_file(self, name, content, st, digest):
+        chunk_ids = []
+        for chunk in content.split('\n\n'):
+            text = chunk.strip()
+            if not text:
+                continue
+            parts = SPLIT_RE.split(text.lower())
+            terms = [self.term_ids.setdefault(w, len(self.term_ids)) for w in parts[1::2]]
+            gaps = [self.gap_ids.setdefault(g, len(self.gap_ids)) for g in parts[0::2]]
+            cid = self.next_id
+            self.next_id += 1
+            self.chunks[cid] = {"citation": name, "content": text,
+                                "terms": np.asarray(terms, dtype=np.int32), "gaps": np.asarray(gaps, dtype=np.int32)}
+            chunk_ids.append(cid)
+        self.files[name] = {"mtime": st.st_mtime, "size": st.st_size, "hash": digest, "chunk_ids": chunk_ids}
+        return chunk_ids
+
+    def _remove_file(self, name):
+        for cid in self.files.pop(name)["chunk_ids"]:
+            del self.chunks[cid]
+
+    def _update_vectors(self, added):
+        # Keep rows of surviving chunks and embed only the new ones, in one batch
+        keep = [i for i, cid in enumerate(self.vector_ids) if cid in self.chunks]
+        new = embed_texts([self.chunks[cid]["content"] for cid in added])
+        self.vectors = np.vstack([np.asarray(self.vectors[keep]), new])
+        self.vector_ids = [self.vector_ids[i] for i in keep] + list(added)
+        self._ann = None
+
+    # --- Persistence ---
+    def save(self, path=INDEX_PATH):
+        state = {k: v for k, v in self.__dict__.items() if k not in ("vectors", "_ann", "_arrays")}
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        np.save(f"{tmp}.npy", np.asarray(self.vectors))
+        os.replace(f"{tmp}.npy", _vectors_path(path))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, folder=LITERATURE_PATH):
+        index = cls(folder)
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return index
+        if Path(state.get("folder", "")) == index.folder and state.get("version") == INDEX_VERSION:
+            index.__dict__.update(state)
+            index.last_refresh = 0.0
+            try:
+                # Memory-mapped: rows are paged in only as queries touch them
+                index.vectors = np.load(_vectors_path(path), mmap_mode='r')
+            except (FileNotFoundError, ValueError):
+                index.vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+            if index.vectors.shape != (len(index.vector_ids), EMBEDDING_DIM):
+                index.vector_ids = []
+                index.vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+                index._update_vectors(list(index.chunks))
+            index._arrays = _IndexArrays(index)
+        return index
+
+    # --- Querying ---
+    def _results(self, rows, top_k, scores=None):
+        a = self._arrays
+        rows = np.asarray(rows, dtype=np.intp)
+        if scores is None:
+            ranked = rows[:top_k]
+        else:
+            if top_k is not None and top_k < len(rows):
+                # Keep everything scoring at least the k-th best, then order that short list
+                kth = np.partition(-scores, top_k - 1)[top_k - 1]
+                keep = -scores <= kth
+                rows, scores = rows[keep], scores[keep]
+            ranked = rows[np.lexsort((rows, -scores))][:top_k]
+        chunks = [self.chunks[cid] for cid in a.row_cids[ranked].tolist()]
+        return [{"citation": c["citation"], "content": c["content"]} for c in chunks]
+
+    def search(self, query: str, top_k=None, mode="lexical", alpha=HYBRID_ALPHA) -> list:
+        """
+        "lexical": chunks containing the query text (case-insensitive, as a plain substring
+        search would find it), best BM25 score first.
+        "semantic": nearest chunks by embedding similarity.
+        "hybrid": semantic neighbours plus lexical matches, scored
+        alpha * cosine + (1 - alpha) * BM25 normalized to the best match.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if mode != "lexical":
+            return self._search_vectors(query, top_k, alpha if mode == "hybrid" else 1.0)
+        a = self._arrays
+        phrase = query.lower()
+        words = [(m.group(), m.start(), m.end()) for m in TOKEN_RE.finditer(phrase)]
+        if not a.n_rows:
+            return []
+        if not words:
+            # Only separators: they must sit inside the text between two words
+            gaps = [g for g, text in enumerate(a.gap_texts) if phrase in text]
+            rows = _unique_sorted(a.stream_row[np.isin(a.stream_gaps, gaps)])
+            return self._results(rows[rows >= 0], top_k)
+        # A word with query text on both sides must be a whole term; the first and last
+        # words may be the end/start of a longer one (a lone word: any part of one)
+        term_sets = []
+        for i, (word, start, end) in enumerate(words):
+            term_sets.append(a.expand(word, start > 0, end < len(phrase)))
+            if not len(term_sets[-1]):
+                return []
+        if phrase == words[0][0]:
+            # A lone word with nothing around it: any chunk with a matching term
+            rows = a.rows_with(term_sets[0])
+            return self._results(rows, top_k, a.bm25(term_sets, rows))
+        # Anchor on the rarest word, then check its neighbours and the text between them
+        anchor = min(range(len(words)), key=lambda i: a.count(term_sets[i]))
+        starts = a.positions(term_sets[anchor]) - anchor
+        starts = starts[(starts > 0) & (starts + len(words) <= len(a.stream_terms))]
+        for i, terms in enumerate(term_sets):
+            keep = a.has_term(starts + i, terms) if i != anchor else np.ones(len(starts), dtype=bool)
+            if i + 1 < len(words):
+                gap = a.gap_id.get(phrase[words[i][2]:words[i + 1][1]])
+                keep &= a.stream_gaps[starts + i] == gap if gap is not None else False
+            starts = starts[keep]
+        if words[0][1] > 0:
+            lead = phrase[:words[0][1]]
+            starts = starts[np.isin(a.stream_gaps[starts - 1], a.gaps_where(lambda text: text.endswith(lead)))]
+        if words[-1][2] < len(phrase):
+            trail = phrase[words[-1][2]:]
+            last = starts + len(words) - 1
+            starts = starts[np.isin(a.stream_gaps[last], a.gaps_where(lambda text: text.startswith(trail)))]
+        # One anchor term's positions are ascending, so their rows are too
+        rows = _unique_sorted(a.stream_row[starts], presorted=len(term_sets[anchor]) == 1)
+        if not len(rows):
+            return []
+        return self._results(rows, top_k, a.bm25(term_sets, rows))
+
+    def _search_vectors(self, query, top_k, alpha):
+        if not self.vector_ids:
+            return []
+        a = self._arrays
+        if self._ann is None:
+            self._ann = IVFIndex(self.vectors)
+        k = top_k if top_k is not None else len(self.vector_ids)
+        qvec = embed_texts([query])[0]
+        vec_rows, cos = self._ann.search(qvec, max(k, 10))
+        rows = a.row_of([self.vector_ids[r] for r in vec_rows])
+        cos = np.asarray(cos, dtype=np.float64)
+        scores = alpha * cos
+        if alpha < 1.0:
+            term_sets = [np.asarray([a.term_id[t]], dtype=np.int64)
+                         for t in dict.fromkeys(tokenize(query)) if t in a.term_id]
+            lexical = _unique_sorted(np.concatenate([a.rows_with(t) for t in term_sets])) \
+                if term_sets else np.empty(0, dtype=np.intp)
+            extra = np.setdiff1d(lexical, rows)
+            if len(extra):
+                vec_row_of = {cid: i for i, cid in enumerate(self.vector_ids)}
+                extra_vecs = np.asarray(self.vectors[[vec_row_of[cid] for cid in a.row_cids[extra].tolist()]])
+                rows = np.concatenate([rows, extra])
+                scores = np.concatenate([scores, alpha * (extra_vecs @ qvec).astype(np.float64)])
+            if term_sets:
+                bm25 = a.bm25(term_sets, rows)
+                best = bm25.max() if len(bm25) else 0.0
+                scores = scores + (1 - alpha) * bm25 / (best or 1.0)
+        return self._results(rows, k, scores)
+
+class _IndexArrays:
     """
-    Searches all .txt files in the literature folder for a given query.
+    The index flattened into numpy arrays for querying; rebuilt whenever the chunks change.
+
+    Every chunk becomes a sentinel (-1) followed by its term ids in `stream_terms`;
+    `stream_gaps` holds the text after each position (before the first word, for a sentinel).
+    `order` lists stream positions grouped by term, so a term's positions (and the rows
+    they fall in, ascending) are one slice.
+    """
+
+    def __init__(self, index):
+        cids = sorted(index.chunks)
+        chunks = [index.chunks[cid] for cid in cids]
+        self.n_rows = len(cids)
+        self.row_cids = np.asarray(cids, dtype=np.int64)
+        self.term_id = dict(index.term_ids)
+        self.terms = sorted(self.term_id, key=self.term_id.get)
+        self.gap_id = dict(index.gap_ids)
+        self.gap_texts = sorted(self.gap_id, key=self.gap_id.get)
+        self.lengths = np.asarray([len(c["terms"]) for c in chunks], dtype=np.float64)
+        self.avg_length = float(self.lengths.mean()) if self.n_rows else 0.0
+        sentinel = np.full(1, -1, dtype=np.int32)
+        self.stream_terms = np.concatenate([x for c in chunks for x in (sentinel, c["terms"])] + [sentinel])
+        self.stream_gaps = np.concatenate([c["gaps"] for c in chunks] + [np.zeros(1, dtype=np.int32)])
+        self.stream_row = np.append(np.repeat(np.arange(self.n_rows, dtype=np.int32),
+                                              self.lengths.astype(np.intp) + 1), np.int32(-1))
+        self.order = np.argsort(self.stream_terms, kind="stable").astype(np.int32)
+        self.term_start = np.searchsorted(self.stream_terms[self.order], np.arange(len(self.terms) + 1))
+        self.order_rows = self.stream_row[self.order]
+        # Chunk postings: for each term, the rows it occurs in (ascending) and how often
+        first = np.ones(len(self.order), dtype=bool)
+        first[1:] = self.order_rows[1:] != self.order_rows[:-1]
+        first[self.term_start[:-1][self.term_start[:-1] < len(first)]] = True
+        starts = np.flatnonzero(first)
+        self.post_rows = self.order_rows[starts]
+        self.post_tf = np.diff(np.append(starts, len(self.order))).astype(np.float64)
+        self.post_start = np.searchsorted(starts, self.term_start)
+        live = [t for t in range(len(self.terms)) if self.term_start[t + 1] > self.term_start[t]]
+        self.by_prefix = sorted(self.terms[t] for t in live)
+        self.by_suffix = sorted(self.terms[t][::-1] for t in live)
+        self.trigrams = {}
+        for t in live:
+            term = self.terms[t]
+            for gram in {term[i:i + 3] for i in range(len(term) - 2)}:
+                self.trigrams.setdefault(gram, []).append(t)
+        self.expand = functools.lru_cache(maxsize=EXPANSION_CACHE_SIZE)(self._expand)
+
+    def _expand(self, word, whole_start, whole_end):
+        # Term ids a query word can match: whole term, term starting/ending with it, or containing it
+        if whole_start and whole_end:
+            ids = [self.term_id[word]] if word in self.term_id else []
+        elif whole_start or whole_end:
+            keys = self.by_prefix if whole_start else self.by_suffix
+            key = word if whole_start else word[::-1]
+            lo = bisect.bisect_left(keys, key)
+            hi = bisect.bisect_left(keys, key + "\U0010ffff", lo)
+            ids = [self.term_id[k if whole_start else k[::-1]] for k in keys[lo:hi]]
+        elif len(word) >= 3:
+            grams = [self.trigrams.get(word[i:i + 3], ()) for i in range(len(word) - 2)]
+            ids = [t for t in min(grams, key=len) if word in self.terms[t]]
+        else:
+            ids = [self.term_id[k] for k in self.by_prefix if word in k]
+        return np.asarray(sorted(ids), dtype=np.int64)
+
+    def count(self, terms):
+        return int((self.term_start[terms + 1] - self.term_start[terms]).sum())
+
+    def positions(self, terms):
+        if len(terms) == 1:
+            return self.order[self.term_start[terms[0]]:self.term_start[terms[0] + 1]]
+        return np.concatenate([self.order[self.term_start[t]:self.term_start[t + 1]] for t in terms])
+
+    def has_term(self, positions, terms):
+        found = self.stream_terms[positions]
+        return found == terms[0] if len(terms) == 1 else np.isin(found, terms)
+
+    def gaps_where(self, test):
+        return [g for g, text in enumerate(self.gap_texts) if test(text)]
+
+    def row_of(self, cids):
+        return np.searchsorted(self.row_cids, np.asarray(cids, dtype=np.int64))
+
+    def rows_with(self, terms):
+        """Rows containing any of `terms`, ascending."""
+        if len(terms) == 1:
+            return self.post_rows[self.post_start[terms[0]]:self.post_start[terms[0] + 1]]
+        return _unique_sorted(np.concatenate([self.post_rows[self.post_start[t]:self.post_start[t + 1]]
+                                              for t in terms.tolist()]))
+
+    def bm25(self, term_sets, rows):
+        """BM25 of each row (ascending row numbers) with one term set per query word."""
+        rows = np.asarray(rows)
+        scores = np.zeros(len(rows))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[rows] / self.avg_length)
+        for terms in term_sets:
+            tf = np.zeros(len(rows))
+            for t in terms.tolist():
+                lo, hi = self.post_start[t], self.post_start[t + 1]
+                at = np.minimum(np.searchsorted(self.post_rows[lo:hi], rows), hi - lo - 1) + lo
+                tf += np.where(self.post_rows[at] == rows, self.post_tf[at], 0.0)
+            df = len(self.rows_with(terms))
+            idf = math.log(1 + (self.n_rows - df + 0.5) / (df + 0.5))
+            scores += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+def _unique_sorted(values, presorted=False):
+    if not presorted:
+        values = np.sort(values)
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return values[keep]
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def get_literature_index() -> LiteratureIndex:
+    """
+    Returns the shared index, loading it from INDEX_PATH on first use and
+    refreshing it from LITERATURE_PATH at most every REFRESH_INTERVAL_S seconds.
+
+    Safe to call from many threads: changes are applied to a copy that then
+    replaces the shared index, so searches in flight never see a half-updated one.
+    """
+    global _INDEX
+    index = _INDEX
+    if index is not None and time.monotonic() - index.last_refresh < REFRESH_INTERVAL_S:
+        return index
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            loaded = LiteratureIndex.load(INDEX_PATH, LITERATURE_PATH)
+            if loaded.refresh():
+                loaded.save(INDEX_PATH)
+            _INDEX = loaded
+        elif time.monotonic() - _INDEX.last_refresh >= REFRESH_INTERVAL_S:
+            if _INDEX.needs_refresh():
+                fresh = _INDEX.copy()
+                fresh.refresh()
+                fresh.save(INDEX_PATH)
+                _INDEX = fresh
+            else:
+                _INDEX.last_refresh = time.monotonic()
+        return _INDEX
+
+def _vectors_path(path):
+    return f"{path}.vectors.npy"
+
+def search_literature(query: str, top_k=None, mode="lexical") -> list:
+    """
+    Searches the literature chunks for a given query.
+
+    Args:
+        query: Free text. In "lexical" mode a chunk matches if it contains the query (case-insensitive).
+        top_k: Maximum number of results (best first). None returns every match
+            (every chunk, ranked, in "semantic"/"hybrid" mode).
+        mode: "lexical" (BM25), "semantic" (embedding similarity) or "hybrid" (both).
+
+    Returns:
+        A list of {"citation": file name, "content": chunk text} dictionaries.
     """
     if not LITERATURE_PATH.exists():
         print(f"Error: Literature directory not found at '{LITERATURE_PATH}'")
         return []
-    
-    found_results = []
-    search_query = query.lower()
-
-    for file_path in LITERATURE_PATH.glob("*.txt"):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            chunks = content.split('\n\n')
-            
-            for chunk in chunks:
-                if search_query in chunk.lower():
-                    result = {
-                        "citation": file_path.name,
-                        "content": chunk.strip()
-                    }
-                    found_results.append(result)
-                    
-    return found_results
+    with span("rag.search"):
+        return get_literature_index().search(query, top_k=top_k, mode=mode)
 
 # --- Main part of the script ---
 if __name__ == "__main__":
@@ -41,7 +453,7 @@ if __name__ == "__main__":
             print(f"    Content: \"{res['content']}\"")
     else:
         print("No information found.")
-        
+
     print("\n" + "-"*30 + "\n")
 
     print("--- Searching for information on 'tuber blight' ---")
@@ -52,4 +464,4 @@ if __name__ == "__main__":
             print(f"  - Citation: {res['citation']}")
             print(f"    Content: \"{res['content']}\"")
     else:
-        print("No information found.")
\ No newline at end of file
+        print("No information found.")
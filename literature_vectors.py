@@ -0,0 +1,95 @@
+import re
+import zlib
+from collections import Counter
+import numpy as np
+
+# Hashed bag-of-words + character n-gram embeddings: CPU-only, no model download,
+# and robust to spelling variants such as "late_blight" vs "late blight".
+EMBEDDING_DIM = 512
+CHAR_NGRAM = 4
+CHAR_NGRAM_WEIGHT = 0.5
+# Below this many chunks an exact scan is as fast as probing clusters
+MIN_CHUNKS_FOR_IVF = 512
+WORD_RE = re.compile(r"[^\W_]+")
+
+def _word_features(word):
+    padded = f" {word} "
+    grams = [padded[i:i + CHAR_NGRAM] for i in range(max(1, len(padded) - CHAR_NGRAM + 1))]
+    return [(word, 1.0)] + [(g, CHAR_NGRAM_WEIGHT) for g in grams]
+
+def embed_texts(texts, dim=EMBEDDING_DIM) -> np.ndarray:
+    """
+    Embeds a batch of texts into L2-normalized float32 rows (one per text).
+    """
+    # Each distinct word is hashed once per batch; a text is the count-weighted sum of its words
+    word_ids = {}
+    rows, wids, counts = [], [], []
+    for i, text in enumerate(texts):
+        for word, n in Counter(WORD_RE.findall(text.lower())).items():
+            rows.append(i)
+            wids.append(word_ids.setdefault(word, len(word_ids)))
+            counts.append(n)
+    feat_cols, feat_vals, n_feats = [], [], []
+    for word in word_ids:
+        feats = _word_features(word)
+        n_feats.append(len(feats))
+        for feat, weight in feats:
+            h = zlib.crc32(feat.encode("utf-8"))
+            feat_cols.append(h % dim)
+            feat_vals.append(weight if (h >> 31) & 1 else -weight)
+    n_feats = np.asarray(n_feats, dtype=np.intp)
+    wids = np.asarray(wids, dtype=np.intp)
+    per_pair = n_feats[wids]
+    # Feature slots of every (text, word) pair, flattened
+    offsets = np.concatenate([[0], np.cumsum(n_feats)])[wids]
+    slots = np.repeat(offsets - np.concatenate([[0], np.cumsum(per_pair)])[:-1], per_pair) + np.arange(per_pair.sum())
+    flat = np.repeat(np.asarray(rows, dtype=np.intp) * dim, per_pair) + np.asarray(feat_cols, dtype=np.intp)[slots]
+    weights = np.repeat(np.asarray(counts, dtype=np.float64), per_pair) * np.asarray(feat_vals)[slots]
+    matrix = np.bincount(flat, weights, minlength=len(texts) * dim).reshape(len(texts), dim).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest neighbour index over normalized rows:
+    spherical k-means clusters, searched by probing the `n_probe` closest centroids.
+    Small matrices use a single list, i.e. an exact scan.
+    """
+
+    def __init__(self, vectors: np.ndarray, n_lists=None, n_iter=10, seed=0):
+        self.vectors = vectors
+        n = len(vectors)
+        if n_lists is None:
+            n_lists = 1 if n < MIN_CHUNKS_FOR_IVF else int(np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+        if n_lists == 1:
+            self.centroids = np.zeros((1, vectors.shape[1] if n else EMBEDDING_DIM), dtype=np.float32)
+            self.lists = [np.arange(n)]
+            return
+        rng = np.random.default_rng(seed)
+        centroids = np.array(vectors[rng.choice(n, n_lists, replace=False)])
+        for _ in range(n_iter):
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = vectors[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            np.divide(centroids, norms, out=centroids, where=norms > 0)
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assign == c) for c in range(n_lists)]
+
+    def search(self, query: np.ndarray, k: int, n_probe: int = 8):
+        """Returns (row indices, cosine scores) of up to k nearest rows, best first."""
+        if len(self.lists) == 1:
+            rows = self.lists[0]
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:n_probe]
+            rows = np.concatenate([self.lists[c] for c in probe])
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        scores = self.vectors[rows] @ query
+        top = np.argsort(-scores, kind="stable")[:k]
+        return rows[top], scores[top]
@@ -0,0 +1,195 @@
+import contextvars
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+import numpy as np
+from epirules import set_span_hook
+
+# One JSON line per run (see "Metrics & Logging" in the README)
+METRICS_PATH = os.environ.get("AGRONOMIST_METRICS_PATH", "metrics.jsonl")
+# Opt-in profiling per run: "cprofile" writes PROFILE_DIR/<run_id>.prof, "sample" adds the hottest stacks to the record
+PROFILE_MODE = os.environ.get("AGRONOMIST_PROFILE", "")
+PROFILE_DIR = "profiles"
+SAMPLE_INTERVAL_S = 0.005
+PERCENTILES = (50, 90, 99)
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+class RunRecorder:
+    """Collects span timings, tools called and failures for one run. Thread-safe."""
+
+    def __init__(self, kind, **meta):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.meta = meta
+        self.spans = {}
+        self.tools_called = []
+        self.failures = {}
+        self.extra = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, ms):
+        with self._lock:
+            self.spans.setdefault(name, []).append(ms)
+
+    def tool(self, name, failure=None):
+        with self._lock:
+            if failure is None:
+                self.tools_called.append(name)
+            else:
+                self.failures[name] = failure
+
+    def to_record(self, latency_ms):
+        return {
+            "t": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "run_id": self.run_id,
+            "kind": self.kind,
+            "latency_ms": round(latency_ms, 1),
+            "tools": self.tools_called,
+            "failures": self.failures,
+            "spans": {name: summarize(values) for name, values in self.spans.items()},
+            **self.meta,
+            **self.extra,
+        }
+
+def summarize(values_ms):
+    """count/total/max plus PERCENTILES of a list of durations in ms."""
+    arr = np.asarray(values_ms, dtype=float)
+    out = {"count": int(arr.size), "total_ms": round(float(arr.sum()), 1), "max_ms": round(float(arr.max()), 1) if arr.size else 0.0}
+    if arr.size:
+        for p, v in zip(PERCENTILES, np.percentile(arr, PERCENTILES)):
+            out[f"p{p}_ms"] = round(float(v), 1)
+    return out
+
+def current_run():
+    return _current_run.get()
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times the enclosed block as `name` in the current run. A no-op outside a run.
+    """
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.add_span(name, (time.perf_counter() - t0) * 1000)
+
+# The rules engine times its stages through this hook; outside a run span() is a no-op
+set_span_hook(span)
+
+def propagate(fn):
+    """
+    Wraps `fn` to run in a copy of the caller's context, so spans recorded on
+    worker threads (thread pools don't inherit contextvars) land in the caller's run.
+    """
+    ctx = contextvars.copy_context()
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+class StackSampler:
+    """Low-overhead sampling profiler: counts the innermost frames of all threads every `interval` seconds."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL_S, depth=3):
+        self.interval = interval
+        self.depth = depth
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="stack-sampler")
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.depth:
+                    stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                self.counts[" <- ".join(stack)] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def top(self, n=10):
+        return [{"stack": stack, "samples": count} for stack, count in self.counts.most_common(n)]
+
+def write_record(record, path=None):
+    with open(path or METRICS_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+@contextmanager
+def record_run(kind, path=None, profile=None, **meta):
+    """
+    Starts a run: spans recorded inside it (on this thread, or on workers via propagate())
+    are collected, and one record is appended to metrics.jsonl when the block exits.
+
+    Args:
+        kind: Run type, e.g. "advisory" or "batch".
+        path: Output path (default METRICS_PATH).
+        profile: "cprofile" or "sample" to profile this run (default: AGRONOMIST_PROFILE).
+        **meta: Extra fields for the record (e.g. field_id).
+    """
+    run = RunRecorder(kind, **meta)
+    token = _current_run.set(run)
+    profile = PROFILE_MODE if profile is None else profile
+    profiler = cProfile.Profile() if profile == "cprofile" else None
+    sampler = StackSampler() if profile == "sample" else None
+    t0 = time.perf_counter()
+    try:
+        if profiler:
+            profiler.enable()
+        if sampler:
+            sampler.__enter__()
+        yield run
+    except BaseException as e:
+        run.failures["run"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        latency_ms = (time.perf_counter() - t0) * 1000
+        if profiler:
+            profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            run.extra["profile"] = os.path.join(PROFILE_DIR, f"{run.run_id}.prof")
+            profiler.dump_stats(run.extra["profile"])
+        if sampler:
+            sampler.__exit__(None, None, None)
+            run.extra["hot_stacks"] = sampler.top()
+        _current_run.reset(token)
+        write_record(run.to_record(latency_ms), path)
+
+def summarize_metrics(path=None):
+    """Latency percentiles per run kind over every record in metrics.jsonl."""
+    latencies = {}
+    with open(path or METRICS_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                latencies.setdefault(record.get("kind", "?"), []).append(record["latency_ms"])
+    return {kind: summarize(values) for kind, values in latencies.items()}
+
+# --- Main part of the script ---
+if __name__ == "__main__":
+    for kind, stats in summarize_metrics().items():
+        print(f"{kind}: {stats}")
@@ -0,0 +1,42 @@
+import pathlib
+import time
+import pytest
+import metrics
+
+SAMPLE = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+
+@pytest.fixture(autouse=True)
+def metrics_path(tmp_path, monkeypatch):
+    # Keep run records out of the working tree
+    path = tmp_path / 'metrics.jsonl'
+    monkeypatch.setattr(metrics, 'METRICS_PATH', str(path))
+    return path
+
+@pytest.fixture
+def result_cache_path(tmp_path, monkeypatch):
+    # For tests that run the planner or batch runner: keep memoized results out of the working tree
+    import agent_planner
+    path = tmp_path / 'result_cache.sqlite'
+    monkeypatch.setattr(agent_planner, 'RESULT_CACHE_PATH', str(path))
+    return path
+
+@pytest.fixture
+def offline_tools(monkeypatch, result_cache_path):
+    # The planner's tools replaced by slow local stand-ins (no network, model or literature)
+    import agent_planner
+    from epirules.io import read_weather_csv
+    weather = read_weather_csv(str(SAMPLE))
+
+    def slow(value, seconds=0.2):
+        def tool(*args, **kwargs):
+            time.sleep(seconds)
+            return value
+        return tool
+
+    monkeypatch.setattr(agent_planner, 'classify_leaf', slow({'diagnosis': 'late_blight', 'confidence': 0.9}))
+    monkeypatch.setattr(agent_planner, 'query_field_details',
+                        slow({'field_id': 'FIELD_002', 'potato_variety': 'Kennebec', 'last_spray': None,
+                              'last_spray_date': None, 'is_organic_compliant': False}))
+    monkeypatch.setattr(agent_planner, '_fetch_weather', slow(weather))
+    monkeypatch.setattr(agent_planner, 'search_literature', slow([{'citation': 'doc.txt', 'content': 'x'}], 0.05))
+    return monkeypatch
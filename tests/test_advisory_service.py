@@ -0,0 +1,141 @@
+import base64
+import http.client
+import io
+import json
+import pathlib
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from PIL import Image
+import advisory_service
+import vision_classifier
+from epirules.io import read_weather_csv
+
+SAMPLE = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+
+def _fake_batch(sizes):
+    def run(images):
+        sizes.append(len(images))
+        return [{'diagnosis': 'late_blight', 'confidence': 0.9} for _ in images]
+    return run
+
+def _jpeg_b64():
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 48), (40, 120, 40)).save(buf, format='JPEG')
+    return base64.b64encode(buf.getvalue()).decode('ascii')
+
+@pytest.fixture
+def server(offline_tools, tmp_path):
+    sizes = []
+    offline_tools.setattr(vision_classifier, 'classify_batch', _fake_batch(sizes))
+    offline_tools.setattr(advisory_service, 'search_literature',
+                          lambda query, top_k=None, mode='lexical': [{'citation': 'doc.txt', 'content': 'x'}])
+    image_dir = tmp_path / 'leaves'
+    image_dir.mkdir()
+    (image_dir / 'leaf.jpg').write_bytes(base64.b64decode(_jpeg_b64()))
+    (tmp_path / 'secret.jpg').write_bytes(base64.b64decode(_jpeg_b64()))
+    service = advisory_service.AdvisoryService(warm=False, max_wait_s=0.05, image_dir=str(image_dir))
+    httpd = advisory_service.make_server(service, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{httpd.server_address[1]}'
+
+    def call(path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode('utf-8')
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url + path, data=data), timeout=10) as resp:
+                return resp.status, json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    yield call, service, sizes
+    httpd.shutdown()
+    httpd.server_close()
+    service.batcher.close()
+
+def test_micro_batcher_groups_requests_and_rejects_when_full():
+    sizes = []
+    batcher = advisory_service.MicroBatcher(_fake_batch(sizes), max_batch=8, max_wait_s=0.1, max_queue=64)
+    futures = [batcher.submit(i) for i in range(5)]
+    assert all(f.result(timeout=2)['diagnosis'] == 'late_blight' for f in futures)
+    assert sizes == [5] and batcher.stats['batches'] == 1
+    batcher.close()
+
+    gate = threading.Event()
+    blocked = advisory_service.MicroBatcher(lambda items: gate.wait() and items, max_batch=1, max_queue=2)
+    blocked.submit(0)
+    time.sleep(0.05)  # the worker holds item 0, the queue takes two more
+    blocked.submit(1), blocked.submit(2)
+    with pytest.raises(advisory_service.Overloaded):
+        blocked.submit(3)
+    gate.set()
+    blocked.close()
+
+def test_lane_rejects_beyond_backlog():
+    lane = advisory_service.Lane('rules', concurrency=1, backlog=0)
+    with lane.enter():
+        with pytest.raises(advisory_service.Overloaded):
+            with lane.enter():
+                pass
+    assert lane.snapshot() == {'in_flight': 0, 'queued': 0, 'capacity': 1, 'rejected': 1}
+
+def test_endpoints(server):
+    call, service, sizes = server
+    status, body = call('/advisory', {'field_id': 'FIELD_002', 'image_b64': _jpeg_b64()})
+    assert status == 200 and body['risk']['label'] == 'High' and body['planner']['mode'] == 'full'
+    assert sizes == [1]
+
+    weather = read_weather_csv(str(SAMPLE))
+    records = weather.assign(timestamp=weather['timestamp'].astype(str)).to_dict('records')
+    status, body = call('/rules', {'rule_set': 'Hutton', 'weather': records})
+    assert status == 200 and body['rule_set'] == 'Hutton' and body['result']['triggered'] is True
+
+    status, body = call('/literature', {'query': 'late blight', 'top_k': 1})
+    assert status == 200 and body == [{'citation': 'doc.txt', 'content': 'x'}]
+
+    assert call('/classify', {'image_path': 'leaf.jpg'}) == (200, {'diagnosis': 'late_blight', 'confidence': 0.9})
+    assert call('/classify', {'image_path': '../secret.jpg'})[0] == 403
+    assert call('/classify', {'image_path': str(service.image_dir) + '/../secret.jpg'})[0] == 403
+    assert call('/advisory', {'image_b64': _jpeg_b64()}) == (400, {'error': "Missing field 'field_id'"})
+    assert call('/classify', {'image_path': 'missing.jpg'})[0] == 404
+    assert call('/classify', {'image_b64': 'not an image'})[0] == 400
+    assert call('/rules', {'rule_set': 'Nowhere'})[0] == 404
+    assert call('/rules', {'weather': [{'timestamp': '2025-03-01T00:00'}]})[0] == 400
+    assert call('/literature', {'query': 'blight', 'mode': 'fuzzy'})[0] == 400
+    assert call('/nowhere', {})[0] == 404
+    status, health = call('/health')
+    assert status == 200 and health['queues']['image_batches']['items'] == 2
+    assert health['latency_ms']['advisory']['count'] == 2  # the 400 is timed too
+    assert health['latency_ms']['classify']['count'] == 5
+
+def test_image_paths_are_refused_without_an_image_dir():
+    service = advisory_service.AdvisoryService(warm=False)
+    with pytest.raises(advisory_service.Forbidden):
+        service._image_source({'image_path': 'rules.yaml'})
+    assert service._image_source({'image_b64': _jpeg_b64()}).read(2) == b'\xff\xd8'
+    service.batcher.close()
+
+def test_unexpected_errors_are_500_and_oversized_bodies_are_drained(monkeypatch, capsys):
+    def broken(query, top_k=None, mode='lexical'):
+        return [][0]
+    monkeypatch.setattr(advisory_service, 'search_literature', broken)
+    monkeypatch.setattr(advisory_service, 'MAX_BODY_BYTES', 64)
+    service = advisory_service.AdvisoryService(warm=False)
+    httpd = advisory_service.make_server(service, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=10)
+    try:
+        conn.request('POST', '/literature', json.dumps({'query': 'x' * 100}))
+        resp = conn.getresponse()
+        assert resp.status == 413 and 'over 64 bytes' in json.loads(resp.read())['error']
+        # Same connection: the next request is read from where the oversized body ended
+        conn.request('POST', '/literature', json.dumps({'query': 'blight'}))
+        resp = conn.getresponse()
+        assert (resp.status, json.loads(resp.read())) == (500, {'error': 'Internal error: IndexError'})
+        assert 'IndexError' in capsys.readouterr().err
+    finally:
+        conn.close()
+        httpd.shutdown()
+        httpd.server_close()
+        service.batcher.close()
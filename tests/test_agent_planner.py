@@ -0,0 +1,29 @@
+import threading
+import time
+import agent_planner
+
+def test_tools_run_concurrently(offline_tools):
+    started = time.perf_counter()
+    record = agent_planner.run_agent('FIELD_002', 'leaf.jpg')
+    elapsed = time.perf_counter() - started
+    assert elapsed < 0.5  # three 0.2 s tools plus dependents, not their sum
+    assert record['planner']['mode'] == 'full' and record['planner']['failures'] == {}
+    assert record['risk']['label'] == 'High' and len(record['rag']) == 2
+
+def test_blown_budget_falls_back_to_weather_rules(offline_tools):
+    offline_tools.setattr(agent_planner, 'classify_leaf', lambda path: time.sleep(2))
+    budgets = dict(agent_planner.TOOL_BUDGETS_S, vision=0.3)
+    started = time.perf_counter()
+    record = agent_planner.run_agent('FIELD_002', 'leaf.jpg', budgets=budgets)
+    assert time.perf_counter() - started < 1.0
+    assert record['planner']['mode'] == 'degraded'
+    assert record['planner']['failures']['vision'].startswith('timeout')
+    assert record['planner']['failures']['rag_disease'] == 'skipped: vision failed'
+    assert record['risk']['label'] == 'Medium' and record['vision'] is None
+
+def test_runs_share_the_worker_pools(offline_tools):
+    agent_planner.run_agent('FIELD_002', 'leaf.jpg', verbose=False)
+    threads = threading.active_count()
+    for _ in range(3):
+        agent_planner.run_agent('FIELD_002', 'leaf.jpg', verbose=False)
+    assert threading.active_count() == threads  # no new pools (or workers) per run
@@ -0,0 +1,40 @@
+import json
+import pathlib
+import batch_runner
+from epirules.io import read_weather_csv
+
+SAMPLE = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+RULES = pathlib.Path(__file__).parent.parent / 'rules.yaml'
+
+def test_run_region_shares_weather_and_queries(tmp_path, monkeypatch, result_cache_path):
+    weather = read_weather_csv(str(SAMPLE))
+    fetched, searched = [], []
+
+    def fetch_cells(cells, start, end):
+        fetched.extend(cells)
+        return {c: (weather if c[0] > 0 else None) for c in cells}
+
+    def search(query):
+        searched.append(query)
+        return [{'citation': 'doc.txt', 'content': query}]
+
+    monkeypatch.setattr(batch_runner, 'search_literature', search)
+    fields = [
+        {'field_id': 'F1', 'potato_variety': 'Kennebec', 'latitude': 46.401, 'longitude': -63.79, 'last_spray': None},
+        {'field_id': 'F2', 'potato_variety': 'Kennebec', 'latitude': 46.398, 'longitude': -63.79, 'last_spray': None},
+        {'field_id': 'F3', 'potato_variety': 'Yukon Gold', 'latitude': 47.2, 'longitude': -63.1, 'last_spray': None},
+        {'field_id': 'F4', 'potato_variety': 'Yukon Gold', 'latitude': -13.5, 'longitude': -71.9, 'last_spray': None},
+    ]
+    out = tmp_path / 'advisories.jsonl'
+    rules = batch_runner.load_rules(RULES)
+    summary = batch_runner.run_region(fields, str(out), rules=rules, fetch_cells=fetch_cells, workers=2)
+
+    assert len(fetched) == 3 and summary['weather_cells'] == 3
+    assert sorted(searched) == ['Kennebec', 'Yukon Gold']
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [r['field_id'] for r in records] == ['F1', 'F2', 'F3'] and summary['skipped_no_weather'] == 1
+    assert records[0]['risk']['triggered'] is True and records[0]['risk']['label'] == 'Medium'
+    assert records[0]['planner']['weather_cell'] == records[1]['planner']['weather_cell']
+    # Every configured rule set is evaluated; Hutton still drives the risk and the advice
+    assert list(records[0]['rule_sets']) == list(rules) and summary['rule_sets'] == len(rules) > 1
+    assert records[0]['rule_sets']['Hutton']['triggered'] == records[0]['risk']['triggered']
@@ -0,0 +1,14 @@
+from benchmarks import run_benchmarks
+
+def test_quick_suite_and_regression_flags():
+    report = run_benchmarks.run_suite('quick', only=['rules.daily_aggregates', 'kg.'], repeat=1)
+    assert set(report['results']) == {'rules.daily_aggregates', 'kg.query_field_details'}
+    timing = report['results']['rules.daily_aggregates']
+    assert timing['n'] > 0 and timing['median_ms'] > 0 and timing['unit'] == 'rows'
+
+    slower = {**report, 'results': {name: {**res, 'median_ms': res['median_ms'] * 3 + 10}
+                                    for name, res in report['results'].items()}}
+    assert {row['status'] for row in run_benchmarks.compare(slower, report)} == {'regression'}
+    assert {row['status'] for row in run_benchmarks.compare(report, slower)} == {'improved'}
+    assert {row['status'] for row in run_benchmarks.compare(report, report)} == {'ok'}
+    assert run_benchmarks.compare(report, {**report, 'scale': 'full'}) == []
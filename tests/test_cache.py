@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+from epirules.io import read_weather_csv
+from epirules.engine import evaluate_rule_set
+from epirules.cache import ResultCache, code_version, weather_digest
+import yaml, pathlib
+
+def test_result_cache_tiers_and_invalidation(tmp_path):
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    rules = yaml.safe_load((pathlib.Path(__file__).parent.parent / 'rules.yaml').read_text())
+    cache = ResultCache(str(tmp_path / 'results.sqlite'), max_entries=2)
+
+    first = evaluate_rule_set(df, rules, 'Hutton', cache=cache)
+    assert first == evaluate_rule_set(df, rules, 'Hutton')
+    first['result']['triggered'] = 'mutated'
+    again = evaluate_rule_set(df, rules, 'Hutton', cache=cache)
+    assert again == evaluate_rule_set(df, rules, 'Hutton')
+    assert cache.stats == {'memory_hits': 1, 'disk_hits': 0, 'misses': 1, 'evictions': 0}
+
+    # Editing this rule set's parameters, or the weather, is a different key; other rule sets are irrelevant
+    evaluate_rule_set(df, {**rules, 'Smith': {**rules['Smith'], 'min_hours_per_day': 1}}, 'Hutton', cache=cache)
+    assert cache.stats['memory_hits'] == 2
+    changed = evaluate_rule_set(df, {**rules, 'Hutton': {**rules['Hutton'], 'min_hours_per_day': 24}}, 'Hutton', cache=cache)
+    assert changed['result']['triggered'] is False and cache.stats['misses'] == 2
+    assert weather_digest(df) != weather_digest(df.assign(rh=df['rh'] - 1))
+    assert weather_digest(df) == weather_digest(df.assign(timestamp=df['timestamp'].dt.tz_convert('UTC')))
+
+    cache.close()
+    reopened = ResultCache(str(tmp_path / 'results.sqlite'))
+    assert evaluate_rule_set(df, rules, 'Hutton', cache=reopened) == again
+    assert reopened.stats['disk_hits'] == 1
+
+    source = tmp_path / 'engine.py'
+    source.write_text('A = 1')
+    before = code_version([str(source)])
+    source.write_text('A = 22')
+    assert code_version([str(source)]) != before
+
+def test_shared_result_cache_is_opened_once(result_cache_path):
+    import agent_planner
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        caches = list(pool.map(lambda _: agent_planner.get_result_cache(), range(32)))
+    assert all(c is caches[0] for c in caches) and caches[0].path == str(result_cache_path)
@@ -0,0 +1,32 @@
+from epirules.io import read_weather_csv
+from epirules.engine import risk_series, run_lengths
+from epirules.calibrate import calibrate, agreement
+import yaml, pathlib
+import pytest
+import numpy as np
+import pandas as pd
+
+def test_calibration_sweep_recovers_labels(tmp_path):
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    rules = yaml.safe_load((pathlib.Path(__file__).parent.parent / 'rules.yaml').read_text())
+    assert run_lengths([1, 1, 1, 0, 1], starts=[1, 0, 1, 0, 1]).tolist() == [1, 2, 1, 0, 1]
+    m = agreement(np.array([True, True, False, False]), np.array([True, False, False, False]))
+    assert (m['tp'], m['fp'], m['fn'], m['tn'], m['accuracy'], m['kappa']) == (1, 1, 0, 2, 0.75, 0.5)
+
+    # Label the days the stock Hutton rule triggers on; the sweep should rank those thresholds first
+    series = risk_series(df, rules, ['Hutton'])
+    outbreaks = series.loc[series['triggered'], 'day']
+    fields = pd.concat([df.assign(field_id='A'), df.assign(field_id='B', rh=50)], ignore_index=True)
+    labels = pd.DataFrame({'field_id': 'A', 'date': outbreaks.dt.strftime('%Y-%m-%d')})
+    grid = {'min_hours_per_day': [4, 6, 11], 'min_temp_c': [5, 10]}
+    table = calibrate(fields, labels, rules, 'Hutton', grid, lead_days=0, workers=1)
+    assert len(table) == 6 and table.loc[0, 'accuracy'] == 1.0 and table.loc[0, 'n'] == 8
+    assert table.loc[0, 'min_hours_per_day'] in (4, 6)
+    parallel = calibrate(fields, labels, rules, 'Hutton', grid, lead_days=0, workers=2)
+    pd.testing.assert_frame_equal(table, parallel)
+
+    scored = calibrate(fields, labels.assign(outbreak=1), rules, 'Hutton', grid, workers=1)
+    assert scored['n'].eq(len(labels)).all()
+    with pytest.raises(ValueError):
+        calibrate(fields, labels, rules, 'Hutton', {'no_such_param': [1]}, workers=1)
@@ -1,6 +1,11 @@
 from epirules.io import read_weather_csv, daily_aggregates
-from epirules.engine import evaluate_rule_set
+import epirules.engine
+from epirules.engine import evaluate_rule_set, evaluate_batch, risk_series, run_lengths, set_span_hook
+from epirules.rules import configured_rule_sets
 import yaml, pathlib
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
 
 def test_hutton_triggers(tmp_path):
     weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
@@ -26,3 +31,73 @@ def test_local_andes_labels(tmp_path):
     out = evaluate_rule_set(df, rules, 'LocalAndes')
     assert out['result']['rule'] == 'LocalAndes'
     assert out['result']['risk_label'] in ('Low','Moderate','High')
+
+def test_daily_aggregates_gaps_and_thresholds(tmp_path):
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    df = df[df['timestamp'].dt.day != 11]
+    daily = daily_aggregates(df, rh_thresholds=(90, 80, 85), mean_temp_thresholds=(80, 90))
+    assert list(daily.columns) == ['day', 'min_temp_c', 'hours_rh_ge_90', 'hours_rh_ge_80', 'hours_rh_ge_85',
+                                   'mean_temp_when_rh_ge_80', 'mean_temp_when_rh_ge_90', 'n_records']
+    assert daily['day'].dt.strftime('%Y-%m-%d').tolist() == ['2025-03-10', '2025-03-11', '2025-03-12', '2025-03-13']
+    gap = daily.iloc[1]
+    assert gap['n_records'] == 0 and gap['hours_rh_ge_90'] == 0 and gap['min_temp_c'] != gap['min_temp_c']
+    day = df[df['timestamp'].dt.day == 10]
+    assert daily.iloc[0]['hours_rh_ge_85'] == (day['rh'] >= 85).sum()
+    assert abs(daily.iloc[0]['mean_temp_when_rh_ge_80'] - day.loc[day['rh'] >= 80, 'temp_c'].mean()) < 1e-9
+
+def test_evaluate_batch_matches_single(tmp_path):
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    rules = yaml.safe_load((pathlib.Path(__file__).parent.parent / 'rules.yaml').read_text())
+    dry = df.assign(rh=50)
+    long = pd.concat([df.assign(field_id='F1'), dry.assign(field_id='F2')], ignore_index=True)
+    table = evaluate_batch(long, rules)
+    assert len(table) == 2 * len(configured_rule_sets(rules))
+    for row in table.itertuples():
+        single = evaluate_rule_set(df if row.field_id == 'F1' else dry, rules, row.rule_set)['result']
+        assert row.triggered == single['triggered']
+        assert row.consecutive_true_max == single['details']['consecutive_true_max']
+    assert not table.loc[table['field_id'] == 'F2', 'triggered'].any()
+
+def test_run_lengths_and_risk_series(tmp_path):
+    flags = np.random.default_rng(0).random(500) < 0.6
+    expected, run = [], 0
+    for f in flags:
+        run = run + 1 if f else 0
+        expected.append(run)
+    assert run_lengths(flags).tolist() == expected
+    assert run_lengths([]).tolist() == []
+
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    rules = yaml.safe_load((pathlib.Path(__file__).parent.parent / 'rules.yaml').read_text())
+    series = risk_series(df, rules, ['Hutton', 'LocalAndes'])
+    hutton = series[series['rule_set'] == 'Hutton']
+    assert hutton['run_length'].tolist() == [0, 1, 2, 0]
+    assert hutton['triggered'].tolist() == [False, False, True, False]
+    assert hutton['days_since_trigger'].tolist() == [pd.NA, pd.NA, 0, 1]
+    assert set(series.loc[series['rule_set'] == 'LocalAndes', 'risk_label']) <= {'Low', 'Moderate', 'High'}
+
+    # Every trailing window's verdict is the series' verdict as of its last day
+    for end in range(1, 5):
+        window = df[df['timestamp'] < df['timestamp'].dt.normalize().min() + pd.Timedelta(days=end)]
+        verdict = evaluate_rule_set(window, rules, 'Hutton')['result']
+        assert verdict['triggered'] == bool(hutton['triggered'].iloc[:end].any())
+        assert verdict['details']['consecutive_true_max'] == hutton['run_length'].iloc[:end].max()
+
+    fields = pd.concat([df.assign(field_id='A'), df.assign(field_id='B')], ignore_index=True)
+    by_field = risk_series(fields, rules, ['Hutton'], key='field_id')
+    assert list(by_field.columns[:2]) == ['field_id', 'rule_set'] and len(by_field) == 8
+    assert by_field.loc[by_field['field_id'] == 'B', 'run_length'].tolist() == [0, 1, 2, 0]
+
+def test_span_hook_times_stages(tmp_path, monkeypatch):
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    rules = yaml.safe_load((pathlib.Path(__file__).parent.parent / 'rules.yaml').read_text())
+    monkeypatch.setattr(epirules.engine, '_span_hook', None)  # restored after the test
+    evaluate_rule_set(df, rules, 'Hutton')
+    names = []
+    set_span_hook(lambda name: names.append(name) or nullcontext())
+    evaluate_rule_set(df, rules, 'Hutton')
+    assert names == ['rules.aggregate', 'rules.evaluate']
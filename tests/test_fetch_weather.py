@@ -0,0 +1,79 @@
+import json, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import pytest
+import fetch_weather
+from weather_cache import WeatherCache
+
+HOURS = [f"2025-08-01T{h:02d}:00" for h in range(24)]
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        StubWeatherHandler.requests_seen.append(url.path)
+        if url.path == '/om/v1/forecast':
+            lat = float(parse_qs(url.query)['latitude'][0])
+            if lat < 0:  # southern hemisphere jobs simulate a primary outage
+                self.send_response(500); self.end_headers(); return
+            body = {'hourly': {'time': HOURS, 'temperature_2m': [12.0] * 24,
+                               'relative_humidity_2m': [95] * 24, 'precipitation': [0.0] * 24}}
+        elif url.path.startswith('/vc/'):
+            _, _, _, start, end = url.path.split('/')
+            body = {'days': [{'datetime': day.strftime('%Y-%m-%d'),
+                              'hours': [{'datetime': f'{h:02d}:00:00', 'temp': 8.0 + i, 'humidity': 70.0, 'precip': 0.0}
+                                        for h in range(24)]}
+                             for i, day in enumerate(pd.date_range(start, end, freq='D'))]}
+        else:
+            self.send_response(404); self.end_headers(); return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubWeatherHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    monkeypatch.setattr(fetch_weather, 'OPEN_METEO_URL', f'{base}/om/v1/forecast')
+    monkeypatch.setattr(fetch_weather, 'VISUAL_CROSSING_URL', f'{base}/vc')
+    StubWeatherHandler.requests_seen = []
+    yield StubWeatherHandler
+    server.shutdown()
+    server.server_close()
+
+def test_bulk_fetch_coalesces_and_fails_over(stub_server):
+    jobs = [
+        (46.401, -63.792, '2025-08-01', '2025-08-01'),
+        (46.398, -63.788, '2025-08-01', '2025-08-01'),  # same grid cell as the first job
+        (47.200, -63.100, '2025-08-01', '2025-08-01'),
+        (-13.52, -71.97, '2025-08-01', '2025-08-01'),   # primary fails -> Visual Crossing
+    ]
+    results = fetch_weather.fetch_weather_bulk(jobs, vc_api_key='stub-key', timeout=5)
+    assert len(results) == 4 and all(r is not None for r in results)
+    assert stub_server.requests_seen.count('/om/v1/forecast') == 3
+    assert sum(p.startswith('/vc/') for p in stub_server.requests_seen) == 1
+    assert results[0]['rh'].tolist() == [95] * 24 and results[0] is not results[1]
+    assert results[3]['temp_c'].tolist() == [8.0] * 24
+
+def test_bulk_fetch_without_backup_returns_none(stub_server):
+    results = fetch_weather.fetch_weather_bulk([(-13.52, -71.97, '2025-08-01', '2025-08-01')], timeout=5)
+    assert results == [None]
+
+def test_backup_days_keep_their_own_dates(stub_server, tmp_path):
+    cache = WeatherCache(str(tmp_path / 'cache.sqlite'))
+    job = (-13.52, -71.97, '2025-08-01', '2025-08-02')  # primary fails -> Visual Crossing, two days
+    for _ in range(2):  # second pass is served from the per-day cache
+        [df] = fetch_weather.fetch_weather_bulk([job], vc_api_key='stub-key', timeout=5, cache=cache)
+        assert len(df) == 48 and df['timestamp'].is_unique
+        assert df.groupby(df['timestamp'].dt.strftime('%Y-%m-%d'))['temp_c'].first().to_dict() == \
+            {'2025-08-01': 8.0, '2025-08-02': 9.0}
+    assert sum(p.startswith('/vc/') for p in stub_server.requests_seen) == 1
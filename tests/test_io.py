@@ -0,0 +1,55 @@
+from epirules.io import read_weather_csv, daily_aggregates, parse_timestamps
+from epirules.engine import evaluate_rule_set, risk_series
+from epirules.stream import IncrementalEvaluator
+import yaml, pathlib
+import pytest
+import numpy as np
+import pandas as pd
+
+def test_read_weather_csv_parses_fixed_layouts_in_chunks(tmp_path):
+    for text in (['2025-03-10T00:00:00+00:00', '2025-03-10T05:30:00-03:00'], ['2025-03-10 01:00', '2025-03-10 02:00'],
+                 ['2025-03-10T00:00:00Z', '2025-03-10T01:00:00Z'], ['2025-03-10T00:00:00+0530', '2025-03-10T00:00:00+0000'],
+                 ['2025-03-10T00:00:00', '2025-03-10 01:00']):  # last one mixes layouts: general parser
+        assert parse_timestamps(text).equals(pd.to_datetime(text, utc=True, format='mixed').as_unit('ns'))
+    with pytest.raises(ValueError):
+        parse_timestamps(['2025-03-10T00:00:00', 'not a time'])
+
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    long = pd.concat([df.assign(field_id='007'), df.assign(field_id='010')]).sample(frac=1, random_state=0)
+    long.to_csv(tmp_path / 'long.csv', index=False)
+    chunked = read_weather_csv(str(tmp_path / 'long.csv'), chunksize=7)
+    assert set(chunked['field_id']) == {'007', '010'} and chunked['rh'].dtype == np.float64
+    assert chunked['timestamp'].is_monotonic_increasing
+    pd.testing.assert_frame_equal(chunked, read_weather_csv(str(tmp_path / 'long.csv')))
+
+def test_sub_hourly_records_and_incomplete_days(tmp_path):
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    rules = yaml.safe_load((pathlib.Path(__file__).parent.parent / 'rules.yaml').read_text())
+    # Every hour repeated as six 10-minute readings: same hours, six times the records
+    fine = df.loc[df.index.repeat(6)].reset_index(drop=True)
+    fine['timestamp'] += pd.to_timedelta(np.tile(np.arange(6) * 10, len(df)), unit='min')
+    hourly, sub = (daily_aggregates(d, stats=('min_temp_c', 'mean_temp_c', 'hours_observed')) for d in (df, fine))
+    pd.testing.assert_frame_equal(hourly.drop(columns='n_records'), sub.drop(columns='n_records'))
+    assert (sub['n_records'] == 6 * hourly['n_records']).all() and (hourly['hours_observed'] == 24).all()
+    assert evaluate_rule_set(fine, rules, 'Smith') == evaluate_rule_set(df, rules, 'Smith')
+    ev = IncrementalEvaluator(rules)
+    for _, g in fine.groupby(fine['timestamp'].dt.day):
+        ev.append(g, field_id='F1')
+    assert all(r == evaluate_rule_set(df, rules, rs) for rs, r in ev.result('F1').items())
+
+    # 2025-03-11..13 humid; 2025-03-12 mostly missing, so strict Hutton sees its run broken
+    humid = df.assign(rh=np.where(df['timestamp'].dt.day == 13, df['rh'].shift(24), df['rh']))
+    gappy = humid[(humid['timestamp'].dt.day != 12) | (humid['timestamp'].dt.hour < 6)]
+    assert daily_aggregates(gappy, stats=('hours_observed',))['hours_observed'].tolist() == [24, 24, 6, 24]
+    bridging = {'Hutton': dict(rules['Hutton'], min_hours_observed=20)}
+    strict, bridged = evaluate_rule_set(gappy, rules, 'Hutton'), evaluate_rule_set(gappy, bridging, 'Hutton')
+    assert strict['result']['triggered'] is False and bridged['result']['triggered'] is True
+    assert bridged['result']['details']['days_meeting_criteria'] == ['2025-03-11', '2025-03-13']
+    assert risk_series(gappy, bridging)['run_length'].tolist() == [0, 1, 1, 2]
+
+    ev = IncrementalEvaluator(bridging)
+    for _, g in gappy.groupby(gappy['timestamp'].dt.day):
+        ev.append(g, field_id='F1')
+    assert ev.result('F1')['Hutton'] == bridged
@@ -0,0 +1,73 @@
+import os
+import sqlite3
+from datetime import date
+import pytest
+from knowledge_querier import FieldStore, SQLiteFieldStore, days_since_spray
+
+CSV = """field_id,farm_name,potato_variety,last_spray_date,fungicide_sprayed,is_organic_compliant
+FIELD_001,North Ridge Farm,Russet Burbank,2025-08-15,Copper Hydroxide,True
+FIELD_002,Green Valley,Kennebec,2025-08-25,Mancozeb,False
+FIELD_003,North Ridge Farm,Yukon Gold,2025-08-22,Chlorothalonil,False
+FIELD_004,Green Valley,Ranger Russet,2025-08-18,Copper Hydroxide,True
+"""
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def store(request, tmp_path):
+    csv_path = tmp_path / 'farm_data.csv'
+    csv_path.write_text(CSV)
+    if request.param == 'csv':
+        return FieldStore(str(csv_path))
+    return SQLiteFieldStore.from_csv(str(csv_path), str(tmp_path / 'fields.sqlite'))
+
+def test_lookups_and_filters(store):
+    record = store.get('FIELD_002')
+    assert record['potato_variety'] == 'Kennebec' and record['last_spray_date'] == '2025-08-25'
+    assert record['last_spray'] == date(2025, 8, 25) and record['is_organic_compliant'] is False
+    assert days_since_spray(record, today=date(2025, 9, 1)) == 7
+    assert store.get('FIELD_999') is None
+    bulk = store.get_many(['FIELD_004', 'FIELD_999'])
+    assert bulk['FIELD_004']['farm_name'] == 'Green Valley' and bulk['FIELD_999'] is None
+
+    ids = lambda rows: [r['field_id'] for r in rows]
+    assert ids(store.find(farm='Green Valley', organic=True)) == ['FIELD_004']
+    assert ids(store.find(variety='Yukon Gold')) == ['FIELD_003']
+    today = date(2025, 9, 1)
+    assert ids(store.find(min_days_since_spray=10, max_days_since_spray=14, today=today)) == ['FIELD_003', 'FIELD_004']
+    assert ids(store.find(farm='North Ridge Farm', min_days_since_spray=15, today=today)) == ['FIELD_001']
+
+def test_csv_store_hot_reloads(tmp_path):
+    csv_path = tmp_path / 'farm_data.csv'
+    csv_path.write_text(CSV)
+    store = FieldStore(str(csv_path), refresh_interval_s=0)
+    before = store.frame
+    assert store.get('FIELD_005') is None
+    csv_path.write_text(CSV + "FIELD_005,Hilltop,Amarilis,2025-08-30,Copper Hydroxide,True\n")
+    os.utime(csv_path, ns=(1, 1))
+    assert store.get('FIELD_005')['potato_variety'] == 'Amarilis'
+    assert len(before) == 4 and len(store.frame) == 5  # a reload swaps in a new table
+
+def test_csv_store_throttles_change_checks(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'farm_data.csv'
+    csv_path.write_text(CSV)
+    store = FieldStore(str(csv_path), refresh_interval_s=60)
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, 'stat', lambda path, *a, **k: stats.append(path) or real_stat(path, *a, **k))
+    for _ in range(100):
+        store.get('FIELD_001')
+    assert stats == []
+    store._checked_at -= 61
+    csv_path.write_text(CSV + "FIELD_005,Hilltop,Amarilis,2025-08-30,Copper Hydroxide,True\n")
+    assert store.get('FIELD_005')['farm_name'] == 'Hilltop' and len(stats) == 1
+
+def test_sqlite_store_frame_matches_csv_and_tracks_writes(tmp_path):
+    csv_path = tmp_path / 'farm_data.csv'
+    csv_path.write_text(CSV)
+    csv_frame = FieldStore(str(csv_path)).frame
+    store = SQLiteFieldStore.from_csv(str(csv_path), str(tmp_path / 'fields.sqlite'))
+    assert store.frame.equals(csv_frame)
+    assert store.frame is store.frame  # cached until the database changes
+
+    with sqlite3.connect(tmp_path / 'fields.sqlite') as db:
+        db.execute("INSERT INTO fields (field_id, farm_name) VALUES ('FIELD_005', 'Hilltop')")
+    assert store.frame['field_id'].tolist()[-1] == 'FIELD_005' and len(store.frame) == 5
@@ -0,0 +1,78 @@
+import os
+import numpy as np
+import literature_searcher
+from literature_searcher import LiteratureIndex
+
+def test_index_ranks_and_refreshes_incrementally(tmp_path):
+    (tmp_path / 'a.txt').write_text("Late blight spreads in wet weather.\n\nCopper is allowed for organic use.", encoding='utf-8')
+    (tmp_path / 'b.txt').write_text("Tuber blight follows blight on late foliage.", encoding='utf-8')
+    (tmp_path / 'c.txt').write_text("Blighted haulms were removed.", encoding='utf-8')
+    index = LiteratureIndex(tmp_path)
+    assert index.refresh() is True
+    # Lexical matches are substring matches, as before: the query must appear as written
+    assert index.search('late blight') == [{'citation': 'a.txt', 'content': 'Late blight spreads in wet weather.'}]
+    blight = [r['citation'] for r in index.search('blight')]
+    assert blight[0] == 'b.txt' and sorted(blight) == ['a.txt', 'b.txt', 'c.txt']  # "blight" matches "Blighted"
+    assert [r['citation'] for r in index.search('ight follows bli')] == ['b.txt']
+    assert index.search('blight follows late') == []
+    assert index.search('organic use') == [{'citation': 'a.txt', 'content': 'Copper is allowed for organic use.'}]
+
+    assert index.refresh() is False
+    b_chunks = index.files['b.txt']['chunk_ids']
+    (tmp_path / 'a.txt').write_text("Mancozeb interval is 7 days.", encoding='utf-8')
+    os.utime(tmp_path / 'a.txt', (1, 1))
+    assert index.refresh() is True
+    assert index.files['b.txt']['chunk_ids'] == b_chunks  # untouched file is not re-indexed
+    assert index.search('organic') == [] and len(index.search('mancozeb')) == 1
+
+    index.save(tmp_path / 'index.pkl')
+    loaded = LiteratureIndex.load(tmp_path / 'index.pkl', tmp_path)
+    assert loaded.search('mancozeb') == index.search('mancozeb')
+    (tmp_path / 'b.txt').unlink()
+    assert loaded.refresh() is True and loaded.search('tuber') == []
+
+def test_phrase_queries_match_a_plain_substring_scan(tmp_path, monkeypatch):
+    (tmp_path / 'a.txt').write_text("Late blight, then tuber rot.\n\nLate_blight spreads.\n\nCopper (organic) - 7 days.", encoding='utf-8')
+    (tmp_path / 'b.txt').write_text("Blight: late. Tuber-rot follows late  blight.", encoding='utf-8')
+    index = LiteratureIndex(tmp_path)
+    index.refresh()
+    contents = [c['content'] for c in index.chunks.values()]
+    for query in ('late blight', 'blight, then', 'e_b', 'ght:', ': late.', '(organic) -', ' ', 'tuber-r',
+                  'late  blight', 'rot.', '7 days', 'ate bli', 'zz', ''):
+        expected = sorted(c for c in contents if query.lower() in c.lower())
+        assert sorted(r['content'] for r in index.search(query)) == expected, query
+
+    # An index pickled in an older layout is ignored and rebuilt from the folder
+    index.save(tmp_path / 'index.pkl')
+    assert set(LiteratureIndex.load(tmp_path / 'index.pkl', tmp_path).chunks) == set(index.chunks)
+    monkeypatch.setattr(literature_searcher, 'INDEX_VERSION', literature_searcher.INDEX_VERSION + 1)
+    assert LiteratureIndex.load(tmp_path / 'index.pkl', tmp_path).chunks == {}
+
+def test_shared_index_is_swapped_not_mutated(tmp_path, monkeypatch):
+    (tmp_path / 'a.txt').write_text("Late blight spreads in wet weather.", encoding='utf-8')
+    monkeypatch.setattr(literature_searcher, 'LITERATURE_PATH', tmp_path)
+    monkeypatch.setattr(literature_searcher, 'INDEX_PATH', tmp_path / 'index.pkl')
+    monkeypatch.setattr(literature_searcher, 'REFRESH_INTERVAL_S', 0.0)
+    monkeypatch.setattr(literature_searcher, '_INDEX', None)
+    first = literature_searcher.get_literature_index()
+    assert literature_searcher.get_literature_index() is first  # nothing changed on disk
+
+    (tmp_path / 'b.txt').write_text("Tuber blight follows late rain.", encoding='utf-8')
+    second = literature_searcher.get_literature_index()
+    assert second is not first and len(second.search('blight')) == 2
+    assert len(first.search('blight')) == 1  # searches holding the old index are unaffected
+
+def test_semantic_and_hybrid_modes(tmp_path):
+    (tmp_path / 'a.txt').write_text("Late blight lesions spread fast in humid weather.\n\nCopper is allowed for organic use.", encoding='utf-8')
+    (tmp_path / 'b.txt').write_text("Early blight causes target-spot lesions on older leaves.", encoding='utf-8')
+    index = LiteratureIndex(tmp_path)
+    index.refresh()
+    assert index.vectors.shape[0] == 3
+    assert index.search('late_blight', top_k=1, mode='semantic')[0]['citation'] == 'a.txt'
+    hybrid = index.search('organic copper', top_k=2, mode='hybrid')
+    assert hybrid[0]['content'] == 'Copper is allowed for organic use.'
+
+    index.save(tmp_path / 'index.pkl')
+    loaded = LiteratureIndex.load(tmp_path / 'index.pkl', tmp_path)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.search('late_blight', mode='semantic') == index.search('late_blight', mode='semantic')
@@ -0,0 +1,41 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import metrics
+import agent_planner
+
+def test_record_run_collects_spans_across_threads(metrics_path):
+    def work(seconds):
+        with metrics.span('work'):
+            time.sleep(seconds)
+
+    with metrics.record_run('batch', job='demo') as run:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(metrics.propagate(work), [0.01] * 8))
+        run.tool('weather')
+    with metrics.span('outside'):
+        pass
+
+    record, = [json.loads(line) for line in metrics_path.read_text().splitlines()]
+    assert record['kind'] == 'batch' and record['job'] == 'demo' and record['tools'] == ['weather']
+    assert set(record['spans']) == {'work'}
+    work_stats = record['spans']['work']
+    assert work_stats['count'] == 8 and 10 <= work_stats['p50_ms'] <= work_stats['p99_ms'] <= work_stats['max_ms']
+    assert record['latency_ms'] >= work_stats['max_ms']
+
+def test_failed_run_is_still_recorded(metrics_path):
+    with pytest.raises(RuntimeError):
+        with metrics.record_run('advisory'):
+            raise RuntimeError('boom')
+    record = json.loads(metrics_path.read_text())
+    assert record['failures'] == {'run': 'RuntimeError: boom'}
+
+def test_advisory_run_emits_tool_spans(offline_tools, metrics_path):
+    agent_planner.run_agent('FIELD_002', 'leaf.jpg', budgets={**agent_planner.TOOL_BUDGETS_S, 'vision': 0.05})
+
+    record = json.loads(metrics_path.read_text())
+    assert record['kind'] == 'advisory' and record['field_id'] == 'FIELD_002'
+    assert 'vision' in record['failures'] and 'weather' in record['tools']
+    assert {'tool.weather', 'tool.rules', 'rules.aggregate', 'rules.evaluate', 'planner.synthesize'} <= set(record['spans'])
+    assert metrics.summarize_metrics(metrics_path)['advisory']['count'] == 1
@@ -0,0 +1,45 @@
+from epirules.io import read_weather_csv
+from epirules.engine import evaluate_rule_set, risk_series
+from epirules.rules import compile_rules, aggregates_for, configured_rule_sets
+from epirules.stream import IncrementalEvaluator
+import yaml, pathlib
+import pytest
+
+def test_declarative_rules_compile_to_minimal_aggregates(tmp_path):
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    rules = yaml.safe_load((pathlib.Path(__file__).parent.parent / 'rules.yaml').read_text())
+    rules['HuttonDeclared'] = {'days': ['min_temp_c >= 10', 'hours_rh_ge_90 >= 6'], 'consecutive_days': 2}
+    rules['Wet'] = {'days': ['hours_rh_ge_85 >= 6', 'max_temp_c < 40', 'rain_mm >= 0'], 'tiers': {'High': 2, 'Moderate': 1},
+                    'base_label': 'None'}
+    rules['HuttonPEI'] = {'evaluator': 'Hutton', 'min_temp_c': 10, 'rh_threshold': 85,
+                          'min_hours_per_day': 6, 'consecutive_days': 2}
+    rules['EarlyBlight'] = {'days': ['mean_temp_c >= 15', 'hours_rh_ge_90 >= 10'], 'tiers': {'High': 3, 'Moderate': 2}}
+
+    declared = evaluate_rule_set(df, rules, 'HuttonDeclared')['result']
+    builtin = evaluate_rule_set(df, rules, 'Hutton')['result']
+    assert declared['triggered'] == builtin['triggered']
+    assert declared['details']['days_meeting_criteria'] == builtin['details']['days_meeting_criteria']
+    assert declared['details']['conditions'] == ['min_temp_c >= 10', 'hours_rh_ge_90 >= 6']
+    wet = evaluate_rule_set(df, rules, 'Wet')['result']
+    assert wet['risk_label'] in ('None', 'Moderate', 'High') and wet['triggered'] == (wet['risk_label'] != 'None')
+
+    compiled = compile_rules(rules, ['HuttonDeclared', 'Wet', 'HuttonPEI'])
+    assert aggregates_for(compiled) == {'rh_thresholds': [90.0, 85.0], 'mean_temp_thresholds': [],
+                                        'stats': ['min_temp_c', 'max_temp_c', 'rain_mm']}
+    series = risk_series(df, rules, ['Wet', 'LocalAndes'])
+    assert list(series['risk_label'].cat.categories) == ['None', 'Moderate', 'High', 'Low']
+
+    ev = IncrementalEvaluator(rules, ['HuttonDeclared', 'Wet', 'EarlyBlight'])
+    ev.append(df, field_id='F1')
+    for rule_set, got in ev.result('F1').items():
+        assert got == evaluate_rule_set(df, rules, rule_set)
+
+    for bad in ({'days': ['dew_point >= 3'], 'consecutive_days': 1}, {'days': ['min_temp_c => 3'], 'consecutive_days': 1},
+                {'days': ['min_temp_c >= 3']}):
+        with pytest.raises(ValueError):
+            evaluate_rule_set(df, {'Bad': bad}, 'Bad')
+
+def test_shipped_rules_are_the_validated_sets():
+    rules = yaml.safe_load((pathlib.Path(__file__).parent.parent / 'rules.yaml').read_text())
+    assert configured_rule_sets(rules) == ['Hutton', 'Smith', 'LocalAndes']
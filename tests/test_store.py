@@ -0,0 +1,51 @@
+from epirules.io import read_weather_csv
+from epirules.engine import evaluate_rule_set
+from epirules.store import WeatherStore
+import yaml, pathlib
+import numpy as np
+
+def test_weather_store_roundtrip(tmp_path):
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    rules = yaml.safe_load((pathlib.Path(__file__).parent.parent / 'rules.yaml').read_text())
+    store = WeatherStore(str(tmp_path / 'store'))
+    assert store.append('F1', df.iloc[:50]) == 50
+    assert store.append('F1', df.iloc[40:]) == len(df) - 50  # overlap is dropped
+    back = store.read('F1')
+    assert back['timestamp'].equals(df['timestamp'].astype(back['timestamp'].dtype))
+    assert evaluate_rule_set(back, rules, 'Hutton') == evaluate_rule_set(df, rules, 'Hutton')
+    window = store.read('F1', start='2025-03-11', end='2025-03-12')
+    assert len(window) == 24 and window['timestamp'].dt.day.unique().tolist() == [11]
+
+def test_append_after_torn_write_keeps_columns_aligned(tmp_path):
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    store = WeatherStore(str(tmp_path / 'store'))
+    store.append('F1', df.iloc[:3])
+    # A crash mid-append: two rows reached timestamp.bin but no other column
+    part = tmp_path / 'store' / 'F1' / '2025-03'
+    with open(part / 'timestamp.bin', 'ab') as f:
+        f.write(df['timestamp'].iloc[3:5].to_numpy(dtype='datetime64[ns]').astype('<i8').tobytes())
+    assert len(store.read('F1')) == 3
+
+    assert store.append('F1', df.iloc[3:6]) == 3
+    back = store.read('F1')
+    assert back['timestamp'].equals(df['timestamp'].iloc[:6].astype(back['timestamp'].dtype))
+    assert np.allclose(back['temp_c'], df['temp_c'].iloc[:6]) and np.allclose(back['rh'], df['rh'].iloc[:6])
+    sizes = {p.name: p.stat().st_size // (8 if p.name == 'timestamp.bin' else 4) for p in part.iterdir()}
+    assert set(sizes.values()) == {6}
+
+def test_torn_newest_partition_does_not_hide_history(tmp_path):
+    weather = pathlib.Path(__file__).parent.parent / 'sample_data' / 'sample_weather.csv'
+    df = read_weather_csv(str(weather))
+    store = WeatherStore(str(tmp_path / 'store'))
+    store.append('F1', df.iloc[:48])
+    # A crash while starting the next month: only one column file was created
+    torn = tmp_path / 'store' / 'F1' / '2025-04'
+    torn.mkdir()
+    (torn / 'temp_c.bin').write_bytes(np.float32(12.5).tobytes())
+    assert store.last_timestamp('F1') == df['timestamp'].iloc[47]
+
+    assert store.append('F1', df.iloc[:60]) == 12  # history already stored is not re-appended
+    ts = store.arrays('F1')['timestamp']
+    assert len(ts) == 60 and (np.diff(ts) > 0).all()
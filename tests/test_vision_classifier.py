@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageOps
+import vision_classifier
+
+class StubInterpreter:
+    """Stands in for the TFLite Interpreter: class 1 when an image is brighter than mid-grey."""
+    fixed_batch = False
+    invokes = []
+
+    def __init__(self, model_path, num_threads):
+        self.shape = [1, *vision_classifier.IMAGE_SIZE, 3]
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self):
+        return [{'index': 0}]
+
+    def get_output_details(self):
+        return [{'index': 1}]
+
+    def resize_tensor_input(self, index, shape):
+        if self.fixed_batch and shape[0] != 1:
+            raise ValueError('Cannot resize a fixed batch dimension')
+        self.shape = list(shape)
+
+    def set_tensor(self, index, value):
+        assert list(value.shape) == self.shape
+        self.input = value
+
+    def invoke(self):
+        StubInterpreter.invokes.append(len(self.input))
+        bright = self.input.mean(axis=(1, 2, 3)) > 0
+        self.output = np.stack([~bright, bright], axis=1).astype(np.float32)
+
+    def get_tensor(self, index):
+        return self.output
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    StubInterpreter.invokes = []
+    monkeypatch.setattr(StubInterpreter, 'fixed_batch', False)
+    monkeypatch.setattr(vision_classifier, 'load_interpreter_class', lambda: StubInterpreter)
+    monkeypatch.setattr(vision_classifier, '_class_names', ['0 healthy', '1 late_blight'])
+    return monkeypatch
+
+def _leaf(path, value):
+    Image.new('RGB', (640, 480), (value, value, value)).save(path, format='JPEG')
+    return str(path)
+
+def test_pool_batches_and_falls_back_to_single_invokes(stub_model):
+    pool = vision_classifier.InterpreterPool(size=2)
+    interp = pool.acquire()
+    assert pool._free.qsize() == 1
+    pool.release(interp)
+
+    images = [np.full((*vision_classifier.IMAGE_SIZE, 3), v, dtype=np.float32) for v in (0.5, -0.5, 0.5)]
+    results = vision_classifier.classify_batch(images, pool)
+    assert [r['diagnosis'] for r in results] == ['late_blight', 'healthy', 'late_blight']
+    assert StubInterpreter.invokes == [3]
+
+    stub_model.setattr(StubInterpreter, 'fixed_batch', True)
+    StubInterpreter.invokes = []
+    fixed = vision_classifier.InterpreterPool(size=1)
+    assert vision_classifier.classify_batch(images, fixed) == results
+    assert StubInterpreter.invokes == [1, 1, 1]
+
+def test_classify_leaves_streams_results_and_errors(stub_model, tmp_path):
+    paths = [_leaf(tmp_path / f'{i}.jpg', 230 if i % 2 else 20) for i in range(5)]
+    missing = str(tmp_path / 'missing.jpg')
+    pool = vision_classifier.InterpreterPool(size=2)
+    results = {r['image']: r for r in vision_classifier.classify_leaves(paths + [missing], batch_size=2,
+                                                                           workers=2, pool=pool)}
+    assert set(results) == set(paths) | {missing}
+    assert 'error' in results[missing]
+    assert [results[p]['diagnosis'] for p in paths] == ['healthy', 'late_blight'] * 2 + ['healthy']
+    assert sorted(StubInterpreter.invokes) == [1, 2, 2]
+
+def test_single_image_path_decodes_at_full_size(tmp_path):
+    path = _leaf(tmp_path / 'leaf.jpg', 120)
+    classic = ImageOps.fit(Image.open(path).convert('RGB'), vision_classifier.IMAGE_SIZE, Image.Resampling.LANCZOS)
+    expected = np.asarray(classic).astype(np.float32) / 127.5 - 1
+    assert np.array_equal(vision_classifier.preprocess_image(path), expected)
+    assert vision_classifier.preprocess_image(path, fast_decode=True).shape == expected.shape
@@ -0,0 +1,56 @@
+import pandas as pd
+from weather_cache import WeatherCache
+
+class FakeProvider:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, lat, lon, start_date, end_date):
+        self.calls.append((start_date, end_date))
+        ts = pd.date_range(start_date, pd.Timestamp(end_date) + pd.Timedelta(hours=23), freq='h')
+        return pd.DataFrame({'timestamp': ts, 'temp_c': 12.0, 'rh': 90.0, 'rain_mm': 0.0})
+
+def test_partial_overlap_fetches_only_missing_days(tmp_path):
+    now = [pd.Timestamp('2025-09-30').timestamp()]
+    cache = WeatherCache(str(tmp_path / 'cache.sqlite'), clock=lambda: now[0])
+    fetch = FakeProvider()
+    first = cache.get_range('open_meteo', fetch, 46.40, -63.79, '2025-08-25', '2025-08-31')
+    assert len(first) == 7 * 24 and fetch.calls == [('2025-08-25', '2025-08-31')]
+
+    # Neighbouring point in the same cell, range extending two days past the cached one
+    second = cache.get_range('open_meteo', fetch, 46.41, -63.78, '2025-08-27', '2025-09-02')
+    assert fetch.calls[-1] == ('2025-09-01', '2025-09-02')
+    assert second['timestamp'].iloc[0] == pd.Timestamp('2025-08-27') and len(second) == 7 * 24
+    assert cache.stats['hits'] == 5 and cache.stats['misses'] == 9
+
+def test_recent_days_expire_and_lru_eviction(tmp_path):
+    now = [pd.Timestamp('2025-09-02 12:00').timestamp()]
+    cache = WeatherCache(str(tmp_path / 'cache.sqlite'), ttl_s=600, clock=lambda: now[0])
+    fetch = FakeProvider()
+    cache.get_range('open_meteo', fetch, 46.40, -63.79, '2025-08-20', '2025-09-02')
+    now[0] += 3600
+    cache.get_range('open_meteo', fetch, 46.40, -63.79, '2025-08-20', '2025-09-02')
+    # Old days are immutable; only the last few days inside the window are refetched
+    assert fetch.calls[-1] == ('2025-08-29', '2025-09-02')
+
+    cache.max_bytes = cache.size_bytes() // 2
+    cache.get_range('open_meteo', fetch, 10.0, 10.0, '2025-08-01', '2025-08-01')
+    assert cache.stats['evictions'] > 0 and cache.size_bytes() <= cache.max_bytes
+
+def test_dst_days_become_immutable(tmp_path):
+    calls = []
+    def halifax(lat, lon, start_date, end_date, naive=True):
+        calls.append((start_date, end_date))
+        ts = pd.date_range(start_date, pd.Timestamp(end_date) + pd.Timedelta(hours=23), freq='h', tz='America/Halifax')
+        # Open-Meteo returns naive local times; 2025-03-09 02:00 does not exist there
+        return pd.DataFrame({'timestamp': ts.tz_localize(None) if naive else ts, 'temp_c': 2.0, 'rh': 80.0, 'rain_mm': 0.0})
+
+    now = [pd.Timestamp('2025-11-20').timestamp()]
+    cache = WeatherCache(str(tmp_path / 'cache.sqlite'), ttl_s=600, clock=lambda: now[0])
+    assert len(cache.get_range('naive', halifax, 46.40, -63.79, '2025-03-08', '2025-03-10')) == 24 + 23 + 24
+    aware = lambda *a: halifax(*a, naive=False)
+    assert len(cache.get_range('aware', aware, 46.40, -63.79, '2025-11-01', '2025-11-03')) == 24 + 25 + 24
+    now[0] += 3600
+    cache.get_range('naive', halifax, 46.40, -63.79, '2025-03-08', '2025-03-10')
+    cache.get_range('aware', aware, 46.40, -63.79, '2025-11-01', '2025-11-03')
+    assert len(calls) == 2  # both DST days were complete and old enough to be final
@@ -1,55 +1,221 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PIL import Image, ImageOps
-import tensorflow as tf # <-- CORRECT IMPORT
+from metrics import span, propagate
 
-# --- 1. SETUP: Load the TFLite model and labels ---
-# Load the TFLite model and allocate tensors.
-# This uses the interpreter from the main TensorFlow package.
-interpreter = tf.lite.Interpreter(model_path="model.tflite")
-interpreter.allocate_tensors()
+MODEL_PATH = "model.tflite"
+LABELS_PATH = "labels.txt"
+IMAGE_SIZE = (224, 224) # The size the model expects
+# Interpreters are not thread-safe, so concurrent callers each borrow one from a pool
+DEFAULT_INTERPRETERS = max(1, min(4, (os.cpu_count() or 1) // 2))
+DEFAULT_BATCH_SIZE = 16
 
-# Get input and output tensor details.
-input_details = interpreter.get_input_details()
-output_details = interpreter.get_output_details()
+# --- 1. SETUP: Interpreter pool and labels (loaded on first use) ---
+def load_interpreter_class():
+    """
+    Returns the TFLite Interpreter class, preferring the light `tflite_runtime`
+    package and only importing full TensorFlow (multi-second import) as a fallback.
+    """
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+class InterpreterPool:
+    """
+    A fixed set of TFLite interpreters for the same model. `acquire()`/`release()`
+    hand out one interpreter per concurrent caller.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, size=DEFAULT_INTERPRETERS, num_threads=1):
+        self.model_path = model_path
+        self.size = size
+        self._free = queue.Queue()
+        for _ in range(size):
+            self._free.put(_PooledInterpreter(model_path, num_threads))
+
+    def acquire(self):
+        return self._free.get()
+
+    def release(self, interp):
+        self._free.put(interp)
+
+class _PooledInterpreter:
+    def __init__(self, model_path, num_threads):
+        self.interpreter = load_interpreter_class()(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = 1
+        self.can_batch = True
+
+    def predict(self, batch):
+        """Runs a (n, 224, 224, 3) batch, resizing the input tensor when the model allows it."""
+        n = len(batch)
+        if n != self.batch_size and self.can_batch:
+            try:
+                self.interpreter.resize_tensor_input(self.input_index, [n, *IMAGE_SIZE, 3])
+                self.interpreter.allocate_tensors()
+                self.batch_size = n
+            except Exception:
+                # Fixed batch dimension: fall back to one invoke per image
+                self.can_batch = False
+                self.interpreter.resize_tensor_input(self.input_index, [1, *IMAGE_SIZE, 3])
+                self.interpreter.allocate_tensors()
+                self.batch_size = 1
+        if self.batch_size == n:
+            self.interpreter.set_tensor(self.input_index, batch)
+            self.interpreter.invoke()
+            return np.array(self.interpreter.get_tensor(self.output_index))
+        outputs = []
+        for image in batch:
+            self.interpreter.set_tensor(self.input_index, image[np.newaxis])
+            self.interpreter.invoke()
+            outputs.append(np.array(self.interpreter.get_tensor(self.output_index))[0])
+        return np.stack(outputs)
+
+_interpreter_pool = None
+_class_names = None
+_init_lock = threading.Lock()
+
+def get_interpreter_pool() -> InterpreterPool:
+    """Returns the shared interpreter pool, building it on first use."""
+    global _interpreter_pool
+    if _interpreter_pool is None:
+        with _init_lock:
+            if _interpreter_pool is None:
+                _interpreter_pool = InterpreterPool(MODEL_PATH)
+    return _interpreter_pool
+
+def get_class_names() -> list:
+    """Returns the model labels, reading labels.txt on first use."""
+    global _class_names
+    if _class_names is None:
+        with open(LABELS_PATH, "r") as f:
+            _class_names = [line.strip() for line in f.readlines()]
+    return _class_names
+
+
+# --- 2. THE CLASSIFIER FUNCTIONS ---
+def preprocess_image(image_path: str, fast_decode=False) -> np.ndarray:
+    """
+    Decodes, crops/resizes and normalizes one image to the model's (224, 224, 3) float input.
+    With `fast_decode`, JPEGs are downscaled while decoding (faster, slightly different pixels).
+    """
+    with span("vision.preprocess"):
+        return _preprocess(image_path, fast_decode)
+
+def _preprocess(image_path, fast_decode=False):
+    image = Image.open(image_path)
+    if fast_decode:
+        # Let the JPEG decoder downscale while decoding; the LANCZOS fit below does the rest
+        image.draft("RGB", (IMAGE_SIZE[0] * 2, IMAGE_SIZE[1] * 2))
+    image = image.convert("RGB")
+    image = ImageOps.fit(image, IMAGE_SIZE, Image.Resampling.LANCZOS)
+    image_array = np.asarray(image)
 
-# Load the labels
-with open("labels.txt", "r") as f:
-    class_names = [line.strip() for line in f.readlines()]
+    # Normalize the image
+    return (image_array.astype(np.float32) / 127.5) - 1
 
+def _to_result(prediction) -> dict:
+    index = int(np.argmax(prediction))
+    class_name = get_class_names()[index]
+    return {"diagnosis": class_name[2:], "confidence": float(prediction[index])}
+
+def _predict(batch: np.ndarray, pool: InterpreterPool) -> np.ndarray:
+    interp = pool.acquire()
+    try:
+        with span("vision.inference"):
+            return interp.predict(batch)
+    finally:
+        pool.release(interp)
 
-# --- 2. THE CLASSIFIER FUNCTION ---
 def classify_leaf(image_path: str) -> dict:
     """
     Takes an image path, runs it through the TFLite model,
     and returns the diagnosis and confidence.
     """
-    image = Image.open(image_path).convert("RGB")
-    size = (224, 224) # The size the model expects
-    image = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
-    image_array = np.asarray(image)
-    
-    # Normalize the image
-    normalized_image_array = (image_array.astype(np.float32) / 127.5) - 1
-    
     # The model expects a batch of images, so we add a dimension
-    data = np.expand_dims(normalized_image_array, axis=0)
+    data = np.expand_dims(preprocess_image(image_path), axis=0)
 
     # --- 3. MAKE PREDICTION ---
-    interpreter.set_tensor(input_details[0]['index'], data)
-    interpreter.invoke()
-    
-    prediction = interpreter.get_tensor(output_details[0]['index'])
-    index = np.argmax(prediction)
-    class_name = class_names[index]
-    confidence_score = prediction[0][index]
+    prediction = _predict(data, get_interpreter_pool())
+    return _to_result(prediction[0])
 
-    return {"diagnosis": class_name[2:], "confidence": float(confidence_score)}
+def classify_batch(images, pool=None) -> list:
+    """
+    Classifies already preprocessed images (see preprocess_image) in one inference call.
+    Returns one {"diagnosis", "confidence"} dict per image.
+    """
+    predictions = _predict(np.stack(images), pool or get_interpreter_pool())
+    return [_to_result(p) for p in predictions]
+
+def classify_leaves(image_paths, batch_size=DEFAULT_BATCH_SIZE, workers=None, pool=None):
+    """
+    Classifies many images, yielding one result per image as its batch finishes.
+
+    Images are decoded (with `fast_decode`) and preprocessed in a thread pool, grouped
+    into batches and run on the interpreter pool, so several batches are in flight at once.
+
+    Args:
+        image_paths: Iterable of image file paths.
+        batch_size: Images per inference call.
+        workers: Preprocessing threads (default: CPU count).
+        pool: InterpreterPool to use (default: the module's shared pool).
+
+    Yields:
+        {"image": path, "diagnosis": ..., "confidence": ...}, or
+        {"image": path, "error": message} if the image could not be read.
+    """
+    pool = pool or get_interpreter_pool()
+    image_paths = list(image_paths)
+    workers = workers or os.cpu_count() or 1
+
+    def load(path):
+        try:
+            return path, preprocess_image(path, fast_decode=True), None
+        except Exception as e:
+            return path, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as decode_pool, \
+         ThreadPoolExecutor(max_workers=pool.size) as infer_pool:
+        pending = []
+
+        def submit(batch):
+            paths = [p for p, _ in batch]
+            data = np.stack([a for _, a in batch])
+            pending.append((paths, infer_pool.submit(propagate(_predict), data, pool)))
+
+        batch = []
+        for path, array, error in decode_pool.map(propagate(load), image_paths):
+            if error is not None:
+                yield {"image": path, "error": error}
+                continue
+            batch.append((path, array))
+            if len(batch) == batch_size:
+                submit(batch)
+                batch = []
+            # Stream finished batches without waiting for the rest of the decode
+            while pending and pending[0][1].done():
+                paths, future = pending.pop(0)
+                for p, prediction in zip(paths, future.result()):
+                    yield {"image": p, **_to_result(prediction)}
+        if batch:
+            submit(batch)
+        for paths, future in pending:
+            for p, prediction in zip(paths, future.result()):
+                yield {"image": p, **_to_result(prediction)}
 
 
 # --- 4. DEMONSTRATION ---
 if __name__ == "__main__":
     image_to_test = "test_leaf.jpg"
-    
+
     print(f"--- Analyzing {image_to_test} ---")
     try:
         result = classify_leaf(image_to_test)
@@ -59,4 +225,4 @@ if __name__ == "__main__":
     except FileNotFoundError:
         print(f"Error: Make sure you have a test image named '{image_to_test}' in this folder.")
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
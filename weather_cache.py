@@ -0,0 +1,161 @@
+import pickle
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+import pandas as pd
+
+# Cells are ~11 km, about the Open-Meteo model grid (same as fetch_weather.GRID_DEGREES)
+CACHE_GRID_DEGREES = 0.1
+# Days this far in the past are treated as final and never refetched
+IMMUTABLE_AFTER_DAYS = 5
+# Recent days (incl. today's partial hours and forecasts) are refetched after this many seconds
+RECENT_TTL_S = 3600
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+class WeatherCache:
+    """
+    Persistent cache of normalized hourly weather frames, keyed by provider,
+    rounded coordinates and day.
+
+    Providers take whole dates, so hours are stored and looked up one day at a
+    time: a range request only fetches the days that are missing or stale, in
+    as few contiguous requests as possible. Least recently used days are
+    evicted once the cache grows beyond `max_bytes`.
+    """
+
+    def __init__(self, path="weather_cache.sqlite", grid=CACHE_GRID_DEGREES, ttl_s=RECENT_TTL_S,
+                 immutable_after_days=IMMUTABLE_AFTER_DAYS, max_bytes=MAX_CACHE_BYTES, clock=time.time):
+        self.path = path
+        self.grid = grid
+        self.ttl_s = ttl_s
+        self.immutable_after_days = immutable_after_days
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS days ("
+            " provider TEXT, lat REAL, lon REAL, day TEXT,"
+            " fetched_at REAL, last_access REAL, n_hours INTEGER, size INTEGER, payload BLOB,"
+            " PRIMARY KEY (provider, lat, lon, day))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS days_lru ON days (last_access)")
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def cell(self, latitude, longitude):
+        return (round(round(latitude / self.grid) * self.grid, 4),
+                round(round(longitude / self.grid) * self.grid, 4))
+
+    def _is_fresh(self, day, fetched_at, frame):
+        today = date.fromtimestamp(self.clock())
+        if day <= today - timedelta(days=self.immutable_after_days) and _is_whole_day(day, frame):
+            return True
+        return self.clock() - fetched_at < self.ttl_s
+
+    def get_range(self, provider, fetch_fn, latitude, longitude, start_date, end_date):
+        """
+        Returns hourly weather for [start_date, end_date] (inclusive dates) at the cell
+        containing (latitude, longitude), calling `fetch_fn(lat, lon, start, end)` only
+        for days that are not cached or no longer fresh.
+        """
+        lat, lon = self.cell(latitude, longitude)
+        days = [d.date() for d in pd.date_range(start_date, end_date, freq="D")]
+        cached = self._load(provider, lat, lon, days)
+
+        missing = []
+        counts = {"hits": 0, "misses": 0, "stale": 0}
+        for d in days:
+            entry = cached.get(d.isoformat())
+            if entry is None:
+                counts["misses"] += 1
+                missing.append(d)
+            elif not self._is_fresh(d, entry[0], entry[2]):
+                counts["stale"] += 1
+                missing.append(d)
+            else:
+                counts["hits"] += 1
+        with self._lock:  # fetch_weather_bulk shares one cache across threads
+            for k, v in counts.items():
+                self.stats[k] += v
+
+        frames = {d: cached[d.isoformat()][2] for d in days if d not in missing}
+        for first, last in _contiguous_runs(missing):
+            fetched = fetch_fn(lat, lon, first.isoformat(), last.isoformat())
+            if fetched is None:
+                raise RuntimeError(f"{provider} returned no data for {first}..{last}")
+            by_day = dict(tuple(fetched.groupby(pd.to_datetime(fetched["timestamp"]).dt.date)))
+            for d in pd.date_range(first, last, freq="D"):
+                d = d.date()
+                frames[d] = by_day.get(d, fetched.iloc[0:0]).reset_index(drop=True)
+            self._store(provider, lat, lon, {d: frames[d] for d in frames if first <= d <= last})
+
+        parts = [frames[d] for d in days if not frames[d].empty]
+        if not parts:
+            return next(iter(frames.values())) if frames else pd.DataFrame()
+        return pd.concat(parts, ignore_index=True)
+
+    def _load(self, provider, lat, lon, days):
+        keys = [d.isoformat() for d in days]
+        out = {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT day, fetched_at, n_hours, payload FROM days WHERE provider=? AND lat=? AND lon=?"
+                f" AND day IN ({','.join('?' * len(keys))})", (provider, lat, lon, *keys)).fetchall()
+            self._db.executemany("UPDATE days SET last_access=? WHERE provider=? AND lat=? AND lon=? AND day=?",
+                                 [(self.clock(), provider, lat, lon, r[0]) for r in rows])
+            self._db.commit()
+        for day, fetched_at, n_hours, payload in rows:
+            out[day] = (fetched_at, n_hours, pickle.loads(payload))
+        return out
+
+    def _store(self, provider, lat, lon, frames_by_day):
+        now = self.clock()
+        rows = []
+        for d, frame in frames_by_day.items():
+            payload = pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+            rows.append((provider, lat, lon, d.isoformat(), now, now, len(frame), len(payload), payload))
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO days VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM days").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for rowid, size in self._db.execute("SELECT rowid, size FROM days ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM days WHERE rowid=?", (rowid,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def size_bytes(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM days").fetchone()[0]
+
+def _is_whole_day(day, frame):
+    # Every hour of the day: 23 on a spring-forward day and 25 on a fall-back one, not always 24
+    if frame.empty:
+        return False
+    ts = pd.to_datetime(frame["timestamp"])
+    if ts.dt.tz is not None:
+        start = pd.Timestamp(day).tz_localize(ts.dt.tz, nonexistent="shift_forward")
+        return len(ts) >= (start + pd.DateOffset(days=1) - start) // pd.Timedelta(hours=1)
+    # Naive local times (Open-Meteo with timezone=auto): only the skipped DST hour may be absent
+    return ts.iloc[0].hour == 0 and ts.iloc[-1].hour == 23 and ts.dt.hour.nunique() >= 23
+
+def _contiguous_runs(days):
+    # [d1, d2, d3, d5] -> [(d1, d3), (d5, d5)]
+    runs = []
+    for d in days:
+        if runs and d == runs[-1][1] + timedelta(days=1):
+            runs[-1] = (runs[-1][0], d)
+        else:
+            runs.append((d, d))
+    return runs